@@ -0,0 +1,35 @@
+"""
+Ponto de entrada do servidor: `python -m app`.
+
+Sobe o uvicorn com `settings.WORKERS` processos. Com mais de um worker, apenas um
+deles atualiza os dados da ANP e os demais servem o snapshot compartilhado (ver
+`app.services.shared_snapshot`); as métricas de todos os workers são agregadas no
+modo multiprocesso do prometheus_client.
+"""
+import os
+import shutil
+import tempfile
+import uvicorn
+from app.core.config import settings
+
+def preparar_metricas_multiprocesso():
+    """
+    Cria um diretório vazio para as métricas dos workers, se `PROMETHEUS_MULTIPROC_DIR` não foi definido.
+
+    A variável precisa existir antes de os workers importarem o prometheus_client.
+    """
+    diretorio = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if diretorio:
+        # Arquivos de execuções anteriores distorceriam contadores e gauges
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.makedirs(diretorio, exist_ok=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="precogas-metricas-")
+
+def main():
+    if settings.WORKERS > 1:
+        preparar_metricas_multiprocesso()
+    uvicorn.run("app.main:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,103 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
-    # Redis
+    # Redis (cliente assíncrono criado sob demanda, com pool e circuit breaker)
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_ENABLED: bool = True
+    REDIS_MAX_CONNECTIONS: int = 20
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 1.0
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    REDIS_RETRIES: int = 2
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 3
+    REDIS_BREAKER_RESET_SECONDS: float = 5.0
+    REDIS_BREAKER_MAX_RESET_SECONDS: float = 60.0
+    # Cache em dois níveis: LRU em memória (L1) na frente do Redis (L2). Entradas por processo,
+    # validade no L1 de valores lidos do Redis (quando o chamador não informa o TTL), validade
+    # das ausências (entradas negativas) e canal pub/sub que invalida o L1 das outras réplicas
+    CACHE_L1_MAX_ENTRIES: int = 1024
+    CACHE_L1_TTL_SECONDS: float = 60.0
+    CACHE_NEGATIVE_TTL_SECONDS: float = 5.0
+    CACHE_INVALIDATION_CHANNEL: str = "precos:cache:invalidacao"
 
     # ANP
     ANP_BASE_URL: str = "https://www.gov.br/anp/pt-br/assuntos/precos-e-defesa-da-concorrencia/precos/arquivos-lpc"
     OUTPUT_DIR: Path = Path("./dados_anp/")
+    # Planilhas armazenadas por conteúdo (SHA-256) em OUTPUT_DIR/objetos; o nome de arquivo
+    # da URL é um hard link para o objeto. Após cada download, as menos usadas são removidas
+    # acima do orçamento em bytes, as sem acesso há ARTIFACT_MAX_AGE_DAYS são removidas e as
+    # sem acesso há ARTIFACT_COMPRESS_AFTER_DAYS são comprimidas (0 desativa cada política)
+    ARTIFACT_MAX_BYTES: int = 512 * 1024 * 1024
+    ARTIFACT_MAX_AGE_DAYS: float = 0
+    ARTIFACT_COMPRESS_AFTER_DAYS: float = 0
+    # URL da planilha mais recente em cache (Redis e memória) antes de revalidar a página
+    # de busca com ETag/Last-Modified; 0 desativa o cache e a revalidação condicional
+    SCRAPE_CACHE_SECONDS: int = 300
+    # Disjuntor do scraping/download: após falhas consecutivas, a ANP não é consultada
+    # (falha imediata) até a chamada de teste seguinte, com backoff exponencial
+    ANP_BREAKER_FAILURE_THRESHOLD: int = 3
+    ANP_BREAKER_RESET_SECONDS: float = 30.0
+    ANP_BREAKER_MAX_RESET_SECONDS: float = 600.0
+    # Sem snapshot, uma atualização que falhou não é repetida por requisições durante esta janela
+    NEGATIVE_CACHE_SECONDS: float = 30.0
+
+    # Cliente HTTP (pool de conexões keep-alive compartilhado)
+    HTTP_TIMEOUT_SECONDS: float = 15.0
+    HTTP_MAX_CONNECTIONS: int = 10
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 5
+
+    # Lock distribuído (Redis) para downloads entre réplicas
+    LOCK_LEASE_SECONDS: float = 30.0
+    LOCK_WAIT_TIMEOUT_SECONDS: float = 60.0
 
     # ETL Config
     ETL_CONFIG_PATH: Path = Path("config/etl_rules.yaml")
+    # Recarga a quente: alterações no YAML são verificadas (um stat) no máximo a cada intervalo; 0 desativa
+    ETL_CONFIG_RELOAD_SECONDS: float = 5.0
+    # Motor de extração: "streaming" (read-only, para no primeiro match) ou "pandas"
+    EXTRACTION_ENGINE: Literal["streaming", "pandas"] = "streaming"
+    # Converte cada planilha uma única vez para um formato colunar (NumPy, memory-mapped)
+    COLUMNAR_ENABLED: bool = True
+    # Conversões mantidas abertas (memory-mapped) por processo; as menos usadas são fechadas
+    COLUMNAR_MAX_OPEN_TABLES: int = 4
+
+    # Relógio sincronizado: offset NTP medido em segundo plano (sem I/O na leitura)
+    CLOCK_SYNC_ENABLED: bool = True
+    NTP_SERVER: str = "pool.ntp.org"
+    NTP_TIMEOUT_SECONDS: float = 5.0
+    NTP_SYNC_INTERVAL_SECONDS: int = 3600
+
+    # Health checks: resultado de /health/ready em cache e timeout de cada verificação
+    HEALTH_CACHE_SECONDS: float = 10.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 3.0
+
+    # Série histórica semanal (SQLite), alimentada a cada planilha ingerida
+    HISTORY_DB_PATH: Path = Path("./dados_anp/historico.sqlite3")
+
+    # Exportação (/precos/export): linhas serializadas por bloco enviado ao cliente
+    EXPORT_BATCH_ROWS: int = 5000
+
+    # Logging: escrita em thread de fundo (fila) e amostragem dos eventos de início/fim
+    # de cada requisição (1.0 registra todas; respostas 5xx são sempre registradas)
+    LOG_QUEUE_ENABLED: bool = True
+    LOG_REQUEST_SAMPLE_RATE: float = 1.0
+
+    # Atualização em segundo plano (scraping/download fora do caminho da requisição)
+    REFRESH_ENABLED: bool = True
+    REFRESH_INTERVAL_SECONDS: int = 900
+
+    # Servidor (`python -m app`). Com WORKERS > 1, um único worker atualiza os dados e os
+    # publica em um snapshot memory-mapped em SNAPSHOT_DIR, lido por todos os workers.
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 1
+    SNAPSHOT_DIR: Path = Path("./dados_anp/snapshot")
+    # Usa o snapshot compartilhado também com um único worker (ex: servir o último snapshot logo após um restart)
+    SNAPSHOT_SHARED_ENABLED: bool = False
+    SNAPSHOT_POLL_SECONDS: float = 2.0
+    # Tempo máximo que um worker seguidor sem snapshot (cold start) aguarda a publicação do líder
+    SNAPSHOT_WAIT_SECONDS: float = 30.0
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -1,16 +1,25 @@
+import asyncio
 import time
 import uuid
+from datetime import date
+from typing import Literal
 import structlog.contextvars
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, status, Request
-from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
-from app.services.downloader import baixar_arquivo, redis_client
-from app.services.extractor import extrair_dados
-from app.services.logger import setup_logger
+from fastapi import Body, FastAPI, Query, Response, status, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from app.services.downloader import cache_anp, iniciar_cliente_http, fechar_cliente_http
+from app.services.health import verificador
+from app.services.redis_client import cliente_redis
+from app.services.http_cache import aceita_gzip, responder
+from app.services.refresher import atualizador
+from app.services.time_sync import relogio
+from app.services.history import codificar_cursor, decodificar_cursor, historico
+from app.services.export import FORMATOS, exportar, formato_disponivel
+from app.services.extractor import CONJUNTO_PADRAO, abrir_tabela, normalizar_chave
+from app.services.batch import ConsultaLote, MAX_CONSULTAS_LOTE, resolver_lote
+from app.services.logger import amostrar_requisicao, setup_logger
+from app.services.metrics import CONTENT_TYPE, REQUESTS_TOTAL, RESPONSE_TIME_SECONDS, encerrar_processo, gerar_metricas, rotulo_rota
 from app.core.config import settings
-import requests
-import redis
-from prometheus_client import Counter, Histogram, generate_latest
 
 logger = setup_logger(__name__)
 
@@ -52,16 +61,27 @@ async def lifespan(app: FastAPI):
         raise RuntimeError(f"Falha no startup: Sem permissão de escrita em {settings.OUTPUT_DIR}")
 
     logger.info("Verificações de startup concluídas com sucesso.", status="startup_check_success")
+
+    # Cliente HTTP compartilhado (pool keep-alive), sincronização NTP e agendador que
+    # mantém o snapshot de preços atualizado fora do caminho da requisição. O cliente
+    # Redis é criado sob demanda e fechado no shutdown; o canal de invalidação mantém o
+    # cache em memória coerente entre réplicas.
+    await iniciar_cliente_http()
+    relogio.iniciar()
+    cache_anp.iniciar()
+    atualizador.iniciar()
     yield
     # Shutdown logic
     logger.info("Encerrando aplicação...", status="shutdown")
+    await atualizador.parar()
+    await cache_anp.parar()
+    await relogio.parar()
+    await cliente_redis.fechar()
+    await fechar_cliente_http()
+    encerrar_processo()
 
 app = FastAPI(lifespan=lifespan)
 
-# Métricas Prometheus
-REQUESTS_TOTAL = Counter("http_requests_total", "Total HTTP Requests", ["method", "endpoint", "status_code"])
-RESPONSE_TIME_SECONDS = Histogram("http_response_time_seconds", "HTTP Response Time", ["method", "endpoint"])
-
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """
@@ -69,8 +89,9 @@ async def add_process_time_header(request: Request, call_next):
 
     1. Gera um `trace_id` único para cada requisição.
     2. Calcula o tempo de processamento.
-    3. Registra logs estruturados (Início/Fim).
-    4. Coleta métricas para o Prometheus.
+    3. Registra logs estruturados (Início/Fim), para a fração `LOG_REQUEST_SAMPLE_RATE`
+       das requisições (respostas 5xx são sempre registradas).
+    4. Coleta métricas para o Prometheus, rotuladas pelo template da rota.
 
     Args:
         request (Request): Objeto da requisição HTTP.
@@ -84,19 +105,38 @@ async def add_process_time_header(request: Request, call_next):
     # Gerar e vincular um trace_id para a requisição
     trace_id = str(uuid.uuid4())
     structlog.contextvars.bind_contextvars(trace_id=trace_id)
-    logger.info("Iniciando requisição", method=request.method, endpoint=request.url.path, trace_id=trace_id)
+    registrar = amostrar_requisicao()
+    if registrar:
+        logger.info("Iniciando requisição", method=request.method, endpoint=request.url.path, trace_id=trace_id)
 
     response = await call_next(request)
     process_time = time.time() - start_time
 
-    # Registrar métricas
-    REQUESTS_TOTAL.labels(method=request.method, endpoint=request.url.path, status_code=response.status_code).inc()
-    RESPONSE_TIME_SECONDS.labels(method=request.method, endpoint=request.url.path).observe(process_time)
+    # Registrar métricas (rotuladas pelo template da rota, para manter a cardinalidade limitada)
+    endpoint = rotulo_rota(request)
+    REQUESTS_TOTAL.labels(method=request.method, endpoint=endpoint, status_code=response.status_code).inc()
+    RESPONSE_TIME_SECONDS.labels(method=request.method, endpoint=endpoint).observe(process_time)
 
-    logger.info("Finalizando requisição", method=request.method, endpoint=request.url.path, status_code=response.status_code, response_time_sec=process_time, trace_id=trace_id)
+    if registrar or response.status_code >= 500:
+        logger.info("Finalizando requisição", method=request.method, endpoint=request.url.path, status_code=response.status_code, response_time_sec=process_time, trace_id=trace_id)
 
     return response
 
+def resposta_indisponivel() -> JSONResponse:
+    """503 com o último erro de atualização e o `Retry-After` do cache negativo."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"erro": atualizador.ultimo_erro},
+        headers={"Retry-After": str(max(1, atualizador.tentar_novamente_em()))},
+    )
+
+def headers_snapshot() -> dict[str, str]:
+    """Idade do snapshot servido e se ele está defasado (ANP indisponível ou dado em disco)."""
+    return {
+        "X-Snapshot-Age": str(int(atualizador.idade_snapshot())),
+        "X-Snapshot-Stale": "true" if atualizador.defasado else "false",
+    }
+
 @app.get("/", include_in_schema=False)
 async def root():
     """
@@ -105,77 +145,217 @@ async def root():
     return RedirectResponse(url="/redoc")
 
 @app.get("/precos")
-async def obter_precos():
+async def obter_precos(request: Request, conjunto: str = CONJUNTO_PADRAO):
     """
     Endpoint principal para consulta de preços.
 
-    Processo:
-    1. Aciona o `baixar_arquivo` para obter a planilha mais recente (com cache).
-    2. Aciona o `extrair_dados` para ler e filtrar as informações do DF.
+    Lê, no snapshot publicado pelo agendador em segundo plano (`AtualizadorPrecos`),
+    o par (estado, produto) configurado em `etl_rules.yaml`, sem acessar a ANP. No
+    cold start, o último dado válido em disco é servido enquanto a atualização roda;
+    só sem nenhum dado válido a requisição aguarda um ciclo de atualização.
+    `X-Snapshot-Age`/`X-Snapshot-Stale` indicam a idade do dado e se ele está defasado.
+
+    O corpo é serializado uma vez por versão dos dados (hash da planilha + regras de
+    ETL), que também é a ETag: um `If-None-Match` correspondente recebe 304, e
+    `Cache-Control`/`Expires` apontam para a próxima publicação da ANP.
+
+    Args:
+        conjunto (str): Conjunto de regras nomeado de `etl_rules.yaml` (`anp.conjuntos`);
+            por padrão, o par de `anp.filters`.
 
     Returns:
-        JSONResponse: Dados formatados ou erro 503 se indisponível.
+        Response: Dados formatados, 304 se o cliente já tem a versão, 404 se o conjunto não
+                  existir (ou não for encontrado na planilha) ou erro 503 se indisponível.
     """
     logger.info("Processando requisição para /precos")
-    # Baixa o arquivo mais recente
-    url, data_inicio, data_fim, caminho_arquivo = baixar_arquivo()
-    if not caminho_arquivo:
-        logger.error("Arquivo da ANP não encontrado após tentativas de download.", status="download_failed")
-        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"erro": "Arquivo não encontrado no site da ANP"})
+    snapshot = await atualizador.obter_snapshot()
+    if snapshot is None:
+        return resposta_indisponivel()
+
+    resposta = snapshot.resposta if conjunto == CONJUNTO_PADRAO else snapshot.conjuntos.get(conjunto)
+    if resposta is None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"erro": f"Nenhum dado encontrado para o conjunto '{conjunto}'."})
+
+    logger.info("Dados servidos a partir do snapshot publicado.", status="data_served")
+    return responder(request, resposta, headers_snapshot(), defasado=atualizador.defasado)
+
+@app.post("/precos/batch")
+async def obter_precos_em_lote(consultas: list[ConsultaLote] = Body(..., min_length=1, max_length=MAX_CONSULTAS_LOTE)):
+    """
+    Resolve várias consultas (estado, produto, semana) em uma única requisição.
+
+    Todas as consultas são cruzadas de uma só vez (merge vetorizado) com a semana
+    atual do snapshot e com a série histórica. A resposta preserva a ordem do pedido
+    e traz um erro por item quando o par/semana não existe.
+
+    Args:
+        consultas (list[ConsultaLote]): Até `MAX_CONSULTAS_LOTE` consultas; `semana` é
+            qualquer data da semana desejada (ausente: semana mais recente).
+
+    Returns:
+        JSONResponse: Lista de resultados na ordem do pedido, ou 503 se indisponível.
+    """
+    snapshot = await atualizador.obter_snapshot()
+    if snapshot is None:
+        return resposta_indisponivel()
+    # pandas e SQLite são síncronos: o lote roda em thread, sem bloquear o event loop
+    return await asyncio.to_thread(resolver_lote, consultas, snapshot, historico)
+
+@app.get("/precos/export")
+async def exportar_precos(request: Request, formato: Literal["ndjson", "csv", "parquet"] = "ndjson"):
+    """
+    Exporta todos os estados e produtos da semana do snapshot (NDJSON, CSV ou Parquet).
+
+    A resposta é transmitida em blocos (`StreamingResponse`) gerados sob demanda a partir
+    da cópia colunar da planilha, sem montar a exportação inteira em memória; os blocos
+    são serializados em threads do pool, sem bloquear as demais requisições. NDJSON e CSV
+    são comprimidos com gzip quando o cliente aceita. Parquet exige o pyarrow instalado.
+
+    Args:
+        formato (str): "ndjson" (padrão), "csv" ou "parquet".
+
+    Returns:
+        StreamingResponse: Exportação como anexo, 501 se o formato não estiver disponível
+            ou 503 se não houver dados.
+    """
+    if not formato_disponivel(formato):
+        return JSONResponse(status_code=status.HTTP_501_NOT_IMPLEMENTED, content={"erro": f"Exportação em {formato} indisponível: instale o pyarrow."})
+
+    snapshot = await atualizador.obter_snapshot()
+    if snapshot is None:
+        return resposta_indisponivel()
+    aberta = await asyncio.to_thread(abrir_tabela, snapshot.caminho_arquivo)
+    if aberta is None:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"erro": "Planilha do snapshot indisponível para exportação."})
+
+    especificacao = FORMATOS[formato]
+    gzip = especificacao.comprimivel and aceita_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "Content-Disposition": f'attachment; filename="{snapshot.caminho_arquivo.stem}.{especificacao.extensao}"',
+        "Vary": "Accept-Encoding",
+        **headers_snapshot(),
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    logger.info(f"Exportando a planilha {snapshot.caminho_arquivo.name} em {formato}.", status="export_started", gzip=gzip)
+    return StreamingResponse(exportar(*aberta, formato, gzip=gzip), media_type=especificacao.media_type, headers=headers)
+
+@app.get("/precos/{estado}/{produto}")
+async def obter_precos_por_estado_produto(estado: str, produto: str, response: Response):
+    """
+    Consulta o preço de qualquer par (estado, produto) da planilha mais recente.
+
+    A resposta vem do índice montado uma vez por planilha e publicado no snapshot;
+    estado e produto são normalizados (maiúsculas, sem espaços nas bordas).
+
+    Args:
+        estado (str): Nome do estado (ex: DISTRITO FEDERAL).
+        produto (str): Nome do produto (ex: GASOLINA COMUM).
+
+    Returns:
+        JSONResponse: Dados do par, 404 se ele não existir na planilha ou 503 se indisponível.
+    """
+    snapshot = await atualizador.obter_snapshot()
+    if snapshot is None:
+        return resposta_indisponivel()
+
+    dados = snapshot.indice.get((normalizar_chave(estado), normalizar_chave(produto)))
+    if dados is None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"erro": f"Nenhum dado encontrado para {produto} em {estado}."})
+    response.headers.update(headers_snapshot())
+    return dict(dados)
+
+@app.get("/precos/historico")
+async def obter_historico(
+    inicio: date,
+    fim: date,
+    estado: str | None = None,
+    produto: str | None = None,
+    cursor: str | None = None,
+    tamanho_pagina: int = Query(100, ge=1, le=1000),
+):
+    """
+    Consulta a série histórica semanal de preços em um intervalo de datas.
+
+    As semanas são filtradas pela data inicial (intervalo inclusivo) e, opcionalmente,
+    por estado e produto. A consulta usa os índices da série histórica e não acessa a ANP;
+    ela roda em thread (SQLite é síncrono). A paginação é por cursor (keyset): cada página
+    traz o `proximoCursor`, que continua logo após o último item, sem OFFSET.
+
+    Args:
+        inicio (date): Data inicial do intervalo (AAAA-MM-DD).
+        fim (date): Data final do intervalo (AAAA-MM-DD).
+        estado (str | None): Filtro por estado (ex: DISTRITO FEDERAL).
+        produto (str | None): Filtro por produto (ex: GASOLINA COMUM).
+        cursor (str | None): `proximoCursor` da página anterior (ausente: primeira página).
+        tamanho_pagina (int): Itens por página (máximo 1000).
+
+    Returns:
+        JSONResponse: Itens da página e o cursor da próxima página (ou None).
+    """
+    if fim < inicio:
+        return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"erro": "'fim' deve ser posterior ou igual a 'inicio'."})
+
+    apos = decodificar_cursor(cursor) if cursor is not None else None
+    if cursor is not None and apos is None:
+        return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"erro": "'cursor' inválido."})
+
+    # Uma linha extra indica se existe próxima página sem exigir um COUNT(*)
+    itens = await asyncio.to_thread(
+        historico.consultar,
+        inicio,
+        fim,
+        estado=normalizar_chave(estado) if estado else None,
+        produto=normalizar_chave(produto) if produto else None,
+        limite=tamanho_pagina + 1,
+        apos=apos,
+    )
+    pagina = itens[:tamanho_pagina]
+    return {
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "tamanhoPagina": tamanho_pagina,
+        "proximoCursor": codificar_cursor(pagina[-1]) if len(itens) > tamanho_pagina else None,
+        "itens": pagina,
+    }
+
+@app.get("/health/live")
+async def health_live():
+    """
+    Liveness: indica apenas que o processo está respondendo (sem I/O).
+    """
+    return {"status": "UP"}
 
-    # Extrai os dados da planilha
-    resultado = extrair_dados(caminho_arquivo)
-    if not resultado:
-        logger.error("Não foi possível extrair os dados para o Distrito Federal do arquivo baixado.", status="extraction_failed")
-        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"erro": "Não foi possível extrair os dados para o Distrito Federal"})
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Readiness: verifica a conectividade com a ANP (`SEARCH_URL`) e com o Redis.
 
-    logger.info("Dados extraídos com sucesso para o Distrito Federal.", status="data_extracted")
-    return resultado
+    As verificações rodam em paralelo, de forma assíncrona, e o resultado fica em
+    cache por `HEALTH_CACHE_SECONDS`.
+    """
+    pronto, checks = await verificador.verificar()
+    overall_status = status.HTTP_200_OK if pronto else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=overall_status, content={"status": "UP" if pronto else "DOWN", "checks": checks})
 
 @app.get("/health")
 async def health_check():
     """
-    Endpoint para verificação de saúde da aplicação.
-    Verifica a conectividade com a internet e com o Redis.
-    """
-    logger.info("Processando requisição para /health")
-    status_checks = {}
-    overall_status = status.HTTP_200_OK
+    Health check legado, com o payload e os status anteriores à divisão em live/ready.
 
-    # 1. Verificar conectividade com a internet
-    try:
-        requests.head("https://www.google.com", timeout=5)
-        status_checks["internet_connection"] = "OK"
-        logger.info("Verificação de conectividade com a internet: OK", check="internet")
-    except requests.exceptions.RequestException as e:
-        status_checks["internet_connection"] = f"FAIL: {e}"
-        overall_status = status.HTTP_503_SERVICE_UNAVAILABLE
-        logger.error(f"Verificação de conectividade com a internet: FALHA - {e}", check="internet")
-
-    # 2. Verificar conexão com Redis
-    if redis_client:
-        try:
-            redis_client.ping()
-            status_checks["redis_connection"] = "OK"
-            logger.info("Verificação de conexão com Redis: OK", check="redis")
-        except redis.exceptions.ConnectionError as e:
-            status_checks["redis_connection"] = f"FAIL: {e}"
-            overall_status = status.HTTP_503_SERVICE_UNAVAILABLE
-            logger.error(f"Verificação de conexão com Redis: FALHA - {e}", check="redis")
-    else:
-        status_checks["redis_connection"] = "WARNING: Redis client not initialized (connection failed at startup)"
-        logger.warning("Verificação de conexão com Redis: Cliente Redis não inicializado.", check="redis")
-
-    # 3. Status do serviço principal (a API está de pé)
-    status_checks["api_service"] = "OK"
-    logger.info("Verificação do serviço da API: OK", check="api_service")
-
-    return JSONResponse(status_code=overall_status, content={"status": "UP" if overall_status == status.HTTP_200_OK else "DOWN", "checks": status_checks})
+    Usa as mesmas verificações (e o mesmo cache) de `/health/ready`, mas mantém a chave
+    `internet_connection` e responde 200 com aviso quando apenas o Redis está indisponível.
+    """
+    saudavel, checks = await verificador.verificar_legado()
+    overall_status = status.HTTP_200_OK if saudavel else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=overall_status, content={"status": "UP" if saudavel else "DOWN", "checks": checks})
 
 @app.get("/metrics", response_class=PlainTextResponse)
 async def metrics():
     """
     Endpoint para expor métricas no formato Prometheus.
+
+    Com `PROMETHEUS_MULTIPROC_DIR` definido (vários workers), agrega as métricas de todos os workers.
     """
     logger.info("Requisição recebida para /metrics", status="metrics_scrape")
-    return PlainTextResponse(generate_latest().decode("utf-8"))
+    return Response(content=gerar_metricas(), media_type=CONTENT_TYPE)
@@ -0,0 +1,318 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from app.core.config import settings
+from app.services.columnar import remover_conversao
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Objetos ficam em OUTPUT_DIR/objetos/<sha256>.xlsx (ou .xlsx.gz, se comprimidos por estarem frios)
+DIRETORIO_OBJETOS = "objetos"
+MANIFESTO = "manifesto.json"
+SUFIXO_METADADOS = ".meta.json"
+
+# Intervalo mínimo entre duas gravações do último acesso de um mesmo objeto no manifesto
+INTERVALO_REGISTRO_ACESSO = 60.0
+TAMANHO_BLOCO = 1024 * 1024
+
+def _sha256_arquivo(caminho: Path) -> str | None:
+    digest = hashlib.sha256()
+    try:
+        with caminho.open("rb") as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+                digest.update(bloco)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def _mesmo_arquivo(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+class ArmazemArtefatos:
+    """
+    Planilhas baixadas endereçadas pelo conteúdo (SHA-256), com deduplicação e orçamento de disco.
+
+    Cada conteúdo é gravado uma única vez em `objetos/<sha256>.xlsx`; o nome de arquivo da
+    URL (`OUTPUT_DIR/<nome>.xlsx`) é um alias: um hard link para o objeto (ou uma cópia, em
+    sistemas de arquivos sem hard links), descrito pelo `.meta.json` gravado no download.
+    Uma planilha republicada pela ANP com outro nome e o mesmo conteúdo não ocupa espaço novo.
+
+    O último acesso de cada objeto fica em `objetos/manifesto.json` e orienta a manutenção
+    (`manutencao`): objetos sem alias são removidos, os mais antigos e os menos usados acima
+    do orçamento são descartados e os frios podem ser comprimidos (gzip). Um objeto comprimido
+    perde seus aliases e é restaurado, com o SHA-256 conferido, no próximo acesso.
+
+    Args:
+        diretorio (Path): Diretório das planilhas (`OUTPUT_DIR`).
+    """
+
+    def __init__(self, diretorio: Path):
+        self.diretorio = Path(diretorio)
+        self.objetos = self.diretorio / DIRETORIO_OBJETOS
+
+    def _objeto(self, sha256: str) -> Path:
+        return self.objetos / f"{sha256}.xlsx"
+
+    def _comprimido(self, sha256: str) -> Path:
+        return self.objetos / f"{sha256}.xlsx.gz"
+
+    def _ler_manifesto(self) -> dict[str, float]:
+        try:
+            return json.loads((self.objetos / MANIFESTO).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar_manifesto(self, manifesto: dict[str, float]):
+        self.objetos.mkdir(parents=True, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=self.objetos, prefix=f".{MANIFESTO}.", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifesto, f)
+            os.replace(temporario, self.objetos / MANIFESTO)
+        except BaseException:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+
+    def _vincular(self, objeto: Path, destino: Path):
+        """Publica `destino` como hard link para `objeto` (cópia como alternativa), com rename atômico."""
+        if _mesmo_arquivo(objeto, destino):
+            return
+        temporario = destino.with_name(f".{destino.name}.{os.getpid()}.link")
+        temporario.unlink(missing_ok=True)
+        try:
+            try:
+                os.link(objeto, temporario)
+            except OSError:
+                shutil.copyfile(objeto, temporario)
+            os.replace(temporario, destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+
+    def publicar(self, temporario: Path, sha256: str, destino: Path):
+        """
+        Move um download já verificado para o armazém e publica `destino` como alias dele.
+
+        Se o conteúdo já estiver armazenado (e íntegro), o temporário é descartado e
+        `destino` passa a apontar para o objeto existente.
+
+        Args:
+            temporario (Path): Arquivo baixado, no mesmo sistema de arquivos de `diretorio`.
+            sha256 (str): SHA-256 do conteúdo de `temporario`.
+            destino (Path): Caminho do alias (nome de arquivo da URL).
+        """
+        self.objetos.mkdir(parents=True, exist_ok=True)
+        objeto = self._objeto(sha256)
+        if objeto.exists() and _sha256_arquivo(objeto) == sha256:
+            logger.info(f"[Armazém] Conteúdo de {destino.name} já armazenado; reutilizando {sha256[:12]}.", status="artifact_deduplicated")
+            Path(temporario).unlink(missing_ok=True)
+        else:
+            os.replace(temporario, objeto)
+            self._comprimido(sha256).unlink(missing_ok=True)
+        self._vincular(objeto, destino)
+        self.registrar_acesso(sha256)
+
+    def restaurar(self, sha256: str, destino: Path) -> bool:
+        """
+        Recria o alias `destino` de um objeto armazenado, descomprimindo-o se estiver frio.
+
+        A descompressão confere o SHA-256; um objeto corrompido é removido.
+
+        Returns:
+            bool: True se `destino` foi recriado.
+        """
+        objeto = self._objeto(sha256)
+        if not objeto.exists():
+            comprimido = self._comprimido(sha256)
+            if not comprimido.exists():
+                return False
+            fd, temporario = tempfile.mkstemp(dir=self.objetos, prefix=f".{sha256[:12]}.", suffix=".part")
+            try:
+                digest = hashlib.sha256()
+                with gzip.open(comprimido, "rb") as origem, os.fdopen(fd, "wb") as f:
+                    for bloco in iter(lambda: origem.read(TAMANHO_BLOCO), b""):
+                        f.write(bloco)
+                        digest.update(bloco)
+                if digest.hexdigest() != sha256:
+                    raise OSError("SHA-256 divergente")
+                os.replace(temporario, objeto)
+            except (OSError, EOFError) as e:
+                logger.error(f"[Armazém] Objeto comprimido {sha256[:12]} corrompido ({e}); descartado.", status="artifact_corrupted")
+                comprimido.unlink(missing_ok=True)
+                return False
+            finally:
+                Path(temporario).unlink(missing_ok=True)
+            comprimido.unlink(missing_ok=True)
+        self._vincular(objeto, destino)
+        return True
+
+    def descartar_corrompido(self, caminho: Path, sha256: str | None):
+        """
+        Remove um alias que não confere com seus metadados e, se também corrompido, o objeto.
+
+        Um objeto íntegro é mantido: o alias é recriado a partir dele no próximo acesso.
+        """
+        logger.error(f"[Armazém] {caminho.name} não confere com os metadados; descartada.", status="artifact_corrupted")
+        caminho.unlink(missing_ok=True)
+        if sha256:
+            objeto = self._objeto(sha256)
+            if objeto.exists() and _sha256_arquivo(objeto) != sha256:
+                objeto.unlink(missing_ok=True)
+
+    def registrar_acesso(self, sha256: str, alias: Path | None = None):
+        """
+        Registra o uso de um objeto (LRU) e adota no armazém um alias ainda sem objeto.
+
+        A adoção (um hard link do alias para `objetos/`) migra planilhas baixadas antes do
+        armazém, sem nova cópia.
+        """
+        if alias is not None and not self._objeto(sha256).exists() and not self._comprimido(sha256).exists():
+            try:
+                self.objetos.mkdir(parents=True, exist_ok=True)
+                os.link(alias, self._objeto(sha256))
+            except OSError:
+                pass
+        manifesto = self._ler_manifesto()
+        agora = time.time()
+        if agora - manifesto.get(sha256, 0.0) >= INTERVALO_REGISTRO_ACESSO:
+            manifesto[sha256] = agora
+            self._gravar_manifesto(manifesto)
+
+    def _aliases(self) -> dict[str, list[Path]]:
+        """SHA-256 -> aliases (planilhas com `.meta.json`) que apontam para ele."""
+        aliases: dict[str, list[Path]] = {}
+        for metadados in self.diretorio.glob(f"*{SUFIXO_METADADOS}"):
+            try:
+                sha256 = json.loads(metadados.read_text(encoding="utf-8")).get("sha256")
+            except (OSError, ValueError):
+                continue
+            if sha256:
+                aliases.setdefault(sha256, []).append(metadados.with_name(metadados.name[: -len(SUFIXO_METADADOS)]))
+        return aliases
+
+    def _armazenados(self) -> dict[str, Path]:
+        """SHA-256 -> arquivo do objeto (quente ou comprimido)."""
+        armazenados = {}
+        for caminho in self.objetos.glob("*.xlsx*"):
+            sha256, _, sufixo = caminho.name.partition(".")
+            if sufixo in ("xlsx", "xlsx.gz"):
+                armazenados[sha256] = caminho
+        return armazenados
+
+    def _ocupacao(self, objeto: Path, aliases: list[Path]) -> int:
+        """Bytes em disco de um objeto, incluindo aliases que são cópias (não hard links)."""
+        try:
+            total = objeto.stat().st_size
+        except OSError:
+            return 0
+        for alias in aliases:
+            if alias.exists() and not _mesmo_arquivo(alias, objeto):
+                total += alias.stat().st_size
+        return total
+
+    def _remover_derivados(self, alias: Path):
+        """Remove o alias e as conversões colunares derivadas dele."""
+        alias.unlink(missing_ok=True)
+        for derivado in alias.parent.glob(f"{alias.name}.*.colunas"):
+            remover_conversao(derivado)
+
+    def descartar(self, sha256: str, aliases: list[Path]):
+        """Remove um objeto, seus aliases, metadados e conversões derivadas."""
+        for alias in aliases:
+            self._remover_derivados(alias)
+            alias.with_name(alias.name + SUFIXO_METADADOS).unlink(missing_ok=True)
+        self._objeto(sha256).unlink(missing_ok=True)
+        self._comprimido(sha256).unlink(missing_ok=True)
+
+    def _comprimir(self, sha256: str, aliases: list[Path]):
+        """Comprime um objeto frio; seus aliases saem do diretório e os metadados são mantidos."""
+        objeto = self._objeto(sha256)
+        fd, temporario = tempfile.mkstemp(dir=self.objetos, prefix=f".{sha256[:12]}.", suffix=".part")
+        try:
+            with objeto.open("rb") as origem, os.fdopen(fd, "wb") as bruto, gzip.GzipFile(fileobj=bruto, mode="wb", mtime=0) as f:
+                shutil.copyfileobj(origem, f, TAMANHO_BLOCO)
+            os.replace(temporario, self._comprimido(sha256))
+        finally:
+            Path(temporario).unlink(missing_ok=True)
+        for alias in aliases:
+            self._remover_derivados(alias)
+        objeto.unlink()
+
+    def manutencao(self, protegidos: set[str] | frozenset[str] = frozenset()) -> int:
+        """
+        Aplica as políticas de retenção de `settings` ao armazém.
+
+        1. Objetos sem nenhum alias são removidos.
+        2. Objetos sem acesso há mais de `ARTIFACT_MAX_AGE_DAYS` são descartados.
+        3. Objetos sem acesso há mais de `ARTIFACT_COMPRESS_AFTER_DAYS` são comprimidos.
+        4. Acima de `ARTIFACT_MAX_BYTES`, os objetos menos usados recentemente são descartados.
+
+        Um limite 0 desativa a política correspondente.
+
+        Args:
+            protegidos (set[str]): SHA-256 que não podem ser descartados nem comprimidos
+                (ex: a planilha em uso).
+
+        Returns:
+            int: Bytes ocupados pelo armazém ao final.
+        """
+        manifesto = self._ler_manifesto()
+        aliases = self._aliases()
+        armazenados = self._armazenados()
+        agora = time.time()
+        dia = 86400
+
+        def ultimo_acesso(sha256: str) -> float:
+            if sha256 in manifesto:
+                return manifesto[sha256]
+            try:
+                return armazenados[sha256].stat().st_mtime
+            except OSError:
+                return 0.0
+
+        descartados = []
+        # Menos usados recentemente primeiro
+        for sha256 in sorted(armazenados, key=ultimo_acesso):
+            if sha256 in protegidos:
+                continue
+            ocioso = agora - ultimo_acesso(sha256)
+            if sha256 not in aliases or (settings.ARTIFACT_MAX_AGE_DAYS and ocioso > settings.ARTIFACT_MAX_AGE_DAYS * dia):
+                self.descartar(sha256, aliases.get(sha256, []))
+                descartados.append(sha256)
+            elif (
+                settings.ARTIFACT_COMPRESS_AFTER_DAYS
+                and ocioso > settings.ARTIFACT_COMPRESS_AFTER_DAYS * dia
+                and armazenados[sha256].suffix == ".xlsx"
+            ):
+                self._comprimir(sha256, aliases[sha256])
+                armazenados[sha256] = self._comprimido(sha256)
+                logger.info(f"[Armazém] Objeto {sha256[:12]} comprimido (sem acesso há {ocioso / dia:.0f} dias).", status="artifact_compressed")
+        for sha256 in descartados:
+            del armazenados[sha256]
+
+        ocupacao = {sha256: self._ocupacao(caminho, aliases.get(sha256, [])) for sha256, caminho in armazenados.items()}
+        total = sum(ocupacao.values())
+        if settings.ARTIFACT_MAX_BYTES:
+            for sha256 in sorted(armazenados, key=ultimo_acesso):
+                if total <= settings.ARTIFACT_MAX_BYTES:
+                    break
+                if sha256 in protegidos:
+                    continue
+                self.descartar(sha256, aliases.get(sha256, []))
+                descartados.append(sha256)
+                total -= ocupacao[sha256]
+
+        if descartados:
+            logger.info(f"[Armazém] {len(descartados)} objeto(s) removido(s); {total} bytes em uso.", status="artifact_evicted")
+            for sha256 in descartados:
+                manifesto.pop(sha256, None)
+            self._gravar_manifesto(manifesto)
+        return total
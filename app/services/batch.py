@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Mapping
+from pydantic import BaseModel
+from app.services.extractor import normalizar_chave
+from app.services.history import HistoricoPrecos
+from app.services.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# O pandas só é importado no primeiro lote (importar a aplicação continua rápido)
+if TYPE_CHECKING:
+    import pandas as pd
+    from app.services.refresher import SnapshotPrecos
+
+# Número máximo de consultas aceitas em um único lote
+MAX_CONSULTAS_LOTE = 1000
+
+COLUNAS_SEMANAS = ["estado", "produto", "data_inicial", "data_final", "preco_medio"]
+
+class ConsultaLote(BaseModel):
+    """
+    Uma consulta do lote: par (estado, produto) em uma semana.
+
+    Attributes:
+        estado (str): Nome do estado (normalizado na consulta).
+        produto (str): Nome do produto (normalizado na consulta).
+        semana (date | None): Qualquer data da semana desejada; ausente, usa a semana mais recente.
+    """
+    estado: str
+    produto: str
+    semana: date | None = None
+
+def _normalizar_semanas(semanas: "pd.DataFrame") -> "pd.DataFrame":
+    """Converte as colunas de data das semanas para datetime64 (NaT para valores inválidos)."""
+    import pandas as pd
+
+    semanas["data_inicial"] = pd.to_datetime(semanas["data_inicial"], errors="coerce")
+    semanas["data_final"] = pd.to_datetime(semanas["data_final"], errors="coerce")
+    return semanas
+
+def semanas_do_indice(indice: Mapping) -> "pd.DataFrame":
+    """
+    Converte o índice do snapshot (semana atual) em um DataFrame no formato das semanas.
+
+    Memoizado no próprio snapshot (`SnapshotPrecos.semanas`): a conversão é feita uma vez
+    por snapshot publicado e reaproveitada pelos lotes seguintes.
+    """
+    import pandas as pd
+
+    linhas = [
+        (estado, produto, dados.get("dataInicial"), dados.get("dataFinal"), dados.get("precoMedioRevenda"))
+        for (estado, produto), dados in indice.items()
+    ]
+    return _normalizar_semanas(pd.DataFrame(linhas, columns=COLUNAS_SEMANAS))
+
+def _sem_nulos(serie: "pd.Series") -> list:
+    """Converte a série para lista Python, trocando NaN/NaT por None."""
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+def resolver_lote(consultas: list[ConsultaLote], snapshot: "SnapshotPrecos", historico: HistoricoPrecos) -> list[dict]:
+    """
+    Resolve todas as consultas do lote em uma única passada vetorizada.
+
+    As semanas candidatas (semana atual, do índice do snapshot, mais a série histórica
+    dos estados/produtos pedidos, lida em uma única consulta) são cruzadas com as
+    consultas por um `merge_asof` agrupado por (estado, produto): cada consulta casa
+    com a última semana iniciada até a data pedida, e vale se a data estiver dentro dela.
+    É síncrono (pandas e SQLite): o endpoint o executa em thread.
+
+    Args:
+        consultas (list[ConsultaLote]): Consultas na ordem recebida.
+        snapshot (SnapshotPrecos): Snapshot publicado (semana atual, em `snapshot.semanas`).
+        historico (HistoricoPrecos): Série histórica semanal.
+
+    Returns:
+        list[dict]: Um item por consulta, na mesma ordem, com os dados ou a chave 'erro'.
+    """
+    if not consultas:
+        return []
+    import pandas as pd
+
+    semanas = snapshot.semanas
+    semana_atual = semanas["data_inicial"].max()
+
+    pedidos = pd.DataFrame({
+        "posicao": range(len(consultas)),
+        "estado": [normalizar_chave(c.estado) for c in consultas],
+        "produto": [normalizar_chave(c.produto) for c in consultas],
+        "semana": pd.to_datetime([c.semana for c in consultas]),
+    })
+    pedidos["semana"] = pedidos["semana"].fillna(semana_atual)
+
+    # A série histórica só é consultada se alguma data pedida estiver fora da semana atual
+    datas = pedidos["semana"].dropna()
+    fora_da_semana_atual = pd.isna(semana_atual) or not datas.between(semana_atual, semana_atual + pd.Timedelta(days=6)).all()
+    if not datas.empty and fora_da_semana_atual:
+        anteriores = historico.consultar_semanas(
+            set(pedidos["estado"]), set(pedidos["produto"]),
+            (datas.min() - timedelta(days=6)).date(), datas.max().date(),
+        )
+        if anteriores:
+            semanas = pd.concat([_normalizar_semanas(pd.DataFrame(anteriores, columns=COLUNAS_SEMANAS)), semanas], ignore_index=True)
+
+    semanas = (
+        semanas.dropna(subset=["data_inicial"])
+        .drop_duplicates(subset=["estado", "produto", "data_inicial"], keep="last")
+        .sort_values("data_inicial")
+    )
+    combinado = pd.merge_asof(
+        pedidos.dropna(subset=["semana"]).sort_values("semana"), semanas,
+        left_on="semana", right_on="data_inicial", by=["estado", "produto"], direction="backward",
+    )
+    fim_semana = combinado["data_final"].fillna(combinado["data_inicial"] + pd.Timedelta(days=6))
+    encontrado = combinado["preco_medio"].notna() & (combinado["semana"] <= fim_semana)
+    achados = combinado[encontrado].set_index("posicao").reindex(pedidos["posicao"])
+
+    resultados = []
+    for estado, produto, semana, data_inicial, data_final, preco in zip(
+        pedidos["estado"], pedidos["produto"], _sem_nulos(pedidos["semana"]),
+        _sem_nulos(achados["data_inicial"]), _sem_nulos(achados["data_final"]), _sem_nulos(achados["preco_medio"]),
+    ):
+        semana = semana.date().isoformat() if semana is not None else None
+        item = {"estado": estado, "produto": produto, "semana": semana}
+        if preco is None:
+            item["erro"] = f"Nenhum dado encontrado para {produto} em {estado} na semana {semana}."
+        else:
+            item.update({"dataInicial": data_inicial, "dataFinal": data_final, "precoMedioRevenda": preco})
+        resultados.append(item)
+
+    logger.info(f"[Lote] {len(consultas)} consultas resolvidas ({int(encontrado.sum())} encontradas).", status="batch_resolved")
+    return resultados
@@ -0,0 +1,82 @@
+import time
+from app.services.logger import setup_logger
+from app.services.metrics import CIRCUIT_REJECTED_TOTAL, CIRCUIT_STATE
+
+logger = setup_logger(__name__)
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+_VALOR_ESTADO = {FECHADO: 0, MEIO_ABERTO: 1, ABERTO: 2}
+
+class Disjuntor:
+    """
+    Circuit breaker genérico para dependências externas (Redis, ANP, ...).
+
+    Após `limite_falhas` falhas consecutivas o circuito abre e as chamadas são recusadas
+    sem tentativa. Passado o tempo de recuperação, uma chamada de teste é liberada
+    (meio aberto): se ela funcionar, o circuito fecha; se falhar, o circuito reabre com
+    o tempo de recuperação dobrado (backoff exponencial, limitado a `recuperacao_maxima`).
+
+    Args:
+        nome (str): Nome do circuito (rótulo das métricas e dos logs).
+        limite_falhas (int): Falhas consecutivas que abrem o circuito.
+        recuperacao (float): Segundos até a primeira chamada de teste.
+        recuperacao_maxima (float): Limite do backoff entre chamadas de teste.
+    """
+
+    def __init__(self, nome: str, limite_falhas: int = 3, recuperacao: float = 5.0, recuperacao_maxima: float = 60.0):
+        self.nome = nome
+        self._limite_falhas = limite_falhas
+        self._recuperacao_inicial = recuperacao
+        self._recuperacao_maxima = recuperacao_maxima
+        self._recuperacao = recuperacao
+        self._falhas = 0
+        self._estado = FECHADO
+        self._aberto_ate = 0.0
+        CIRCUIT_STATE.labels(circuito=nome).set(0)
+
+    @property
+    def estado(self) -> str:
+        """Estado atual: "fechado", "aberto" ou "meio_aberto"."""
+        return self._estado
+
+    def _mudar_estado(self, estado: str):
+        if estado != self._estado:
+            logger.warning(f"[Disjuntor] {self.nome}: {self._estado} -> {estado}", status="circuit_state_changed", circuito=self.nome)
+        self._estado = estado
+        CIRCUIT_STATE.labels(circuito=self.nome).set(_VALOR_ESTADO[estado])
+
+    def permite(self) -> bool:
+        """
+        Indica se uma chamada pode ser feita agora.
+
+        Passado o tempo de recuperação, libera uma única chamada de teste (meio aberto);
+        se ela não reportar o resultado dentro de outro intervalo, uma nova é liberada.
+        """
+        if self._estado == FECHADO:
+            return True
+        agora = time.monotonic()
+        if agora >= self._aberto_ate:
+            self._aberto_ate = agora + self._recuperacao
+            self._mudar_estado(MEIO_ABERTO)
+            return True
+        CIRCUIT_REJECTED_TOTAL.labels(circuito=self.nome).inc()
+        return False
+
+    def registrar_sucesso(self):
+        """Fecha o circuito e reinicia a contagem de falhas e o backoff."""
+        self._falhas = 0
+        self._recuperacao = self._recuperacao_inicial
+        self._mudar_estado(FECHADO)
+
+    def registrar_falha(self):
+        """Conta uma falha; abre (ou reabre, com backoff) o circuito quando necessário."""
+        self._falhas += 1
+        if self._estado == MEIO_ABERTO:
+            self._recuperacao = min(self._recuperacao * 2, self._recuperacao_maxima)
+        elif self._falhas < self._limite_falhas:
+            return
+        self._aberto_ate = time.monotonic() + self._recuperacao
+        self._mudar_estado(ABERTO)
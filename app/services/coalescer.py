@@ -0,0 +1,121 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Awaitable, Callable, TypeVar
+from app.services.logger import setup_logger
+from app.services.metrics import COALESCED_WAITERS, COALESCED_WAITERS_TOTAL
+
+logger = setup_logger(__name__)
+
+# O redis-py só é importado quando há um cliente (ver `redis_client.ClienteRedis.obter`)
+if TYPE_CHECKING:
+    import redis.asyncio
+
+T = TypeVar("T")
+
+class Coalescedor:
+    """
+    Single-flight em processo: uma única execução por chave, compartilhada entre chamadores.
+
+    A primeira chamada para uma chave inicia a operação; as chamadas concorrentes
+    seguintes aguardam o mesmo resultado (ou a mesma exceção). O cancelamento de um
+    chamador não cancela a operação em andamento para os demais.
+    """
+
+    def __init__(self, operacao: str):
+        self._operacao = operacao
+        self._em_andamento: dict[str, asyncio.Task] = {}
+
+    async def executar(self, chave: str, fabrica: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executa `fabrica()` para a chave, ou aguarda a execução já em andamento.
+
+        Args:
+            chave (str): Identificador da operação (ex: a cache key da planilha).
+            fabrica (Callable[[], Awaitable[T]]): Cria a corrotina a ser executada.
+
+        Returns:
+            T: Resultado da operação.
+        """
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is not None and not tarefa.done():
+            COALESCED_WAITERS_TOTAL.labels(operacao=self._operacao).inc()
+            COALESCED_WAITERS.labels(operacao=self._operacao).inc()
+            logger.info(f"[Coalescer] Aguardando {self._operacao} em andamento para {chave}", status="coalesced_wait")
+            try:
+                return await asyncio.shield(tarefa)
+            finally:
+                COALESCED_WAITERS.labels(operacao=self._operacao).dec()
+
+        tarefa = asyncio.ensure_future(fabrica())
+        self._em_andamento[chave] = tarefa
+        tarefa.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+        return await asyncio.shield(tarefa)
+
+def _erros_lock() -> tuple[type[Exception], ...]:
+    """Erros do Redis que não devem interromper a operação protegida pelo lock."""
+    import redis.exceptions
+
+    return (redis.exceptions.LockError, redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
+async def _renovar_lease(lock: "redis.asyncio.lock.Lock", intervalo: float):
+    """Renova periodicamente o lease do lock enquanto a operação protegida executa."""
+    erros = _erros_lock()
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await lock.reacquire()
+        except erros as e:
+            logger.warning(f"[Lock] Falha ao renovar lease de {lock.name}: {e}")
+            return
+
+@asynccontextmanager
+async def lock_distribuido(redis_client: "redis.asyncio.Redis | None", nome: str, lease: float, espera_maxima: float):
+    """
+    Lock distribuído (Redis) com renovação de lease, para coordenar réplicas.
+
+    Enquanto o bloco executa, o lease é renovado a cada terço do seu valor; se a
+    réplica morrer, o lock expira sozinho. Sem Redis, ou se o lock não for obtido
+    dentro de `espera_maxima`, o bloco executa mesmo assim (disponibilidade acima
+    de exclusividade) e o valor produzido é False.
+
+    Args:
+        redis_client (redis.asyncio.Redis | None): Cliente Redis assíncrono (None desabilita o lock).
+        nome (str): Nome da chave do lock.
+        lease (float): Duração do lease em segundos.
+        espera_maxima (float): Tempo máximo aguardando o lock, em segundos.
+
+    Yields:
+        bool: True se o lock foi adquirido por esta réplica.
+    """
+    if redis_client is None:
+        yield False
+        return
+
+    erros = _erros_lock()
+    lock = redis_client.lock(nome, timeout=lease, thread_local=False)
+    adquirido = False
+    limite = time.monotonic() + espera_maxima
+    try:
+        while True:
+            adquirido = await lock.acquire(blocking=False)
+            if adquirido or time.monotonic() >= limite:
+                break
+            await asyncio.sleep(min(0.25, lease / 10))
+    except erros as e:
+        logger.warning(f"[Lock] Redis indisponível ao adquirir {nome}: {e}. Prosseguindo sem lock.")
+
+    if not adquirido:
+        logger.warning(f"[Lock] Lock {nome} não adquirido em {espera_maxima}s. Prosseguindo sem lock.")
+        yield False
+        return
+
+    renovacao = asyncio.create_task(_renovar_lease(lock, lease / 3))
+    try:
+        yield True
+    finally:
+        renovacao.cancel()
+        try:
+            await lock.release()
+        except erros as e:
+            logger.warning(f"[Lock] Falha ao liberar {nome}: {e}")
@@ -0,0 +1,234 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+from app.core.config import settings
+from app.services.logger import setup_logger
+
+# NumPy e openpyxl são importados apenas quando uma conversão é feita ou lida
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = setup_logger(__name__)
+
+# Versão do layout em disco; alterá-la invalida todas as conversões existentes
+VERSAO_FORMATO = 1
+
+# Tabelas já abertas neste processo: diretório da conversão -> tabela (arrays memory-mapped),
+# da menos para a mais usada recentemente; limitado a `COLUMNAR_MAX_OPEN_TABLES` entradas
+_TABELAS_ABERTAS: "OrderedDict[Path, TabelaColunar]" = OrderedDict()
+_LOCK_TABELAS = threading.Lock()
+
+@dataclass(frozen=True)
+class TabelaColunar:
+    """
+    Aba da planilha convertida para colunas NumPy (carregadas com memory-mapping).
+
+    Attributes:
+        colunas (dict[str, np.ndarray]): Nome da coluna -> array tipado (somente leitura).
+        schema (dict): Conteúdo do `schema.json` (origem, aba, tipos das colunas).
+    """
+    colunas: dict[str, "np.ndarray"]
+    schema: dict
+
+    @property
+    def linhas(self) -> int:
+        return self.schema["linhas"]
+
+def diretorio_colunar(caminho_planilha: Path, hash_conteudo: str) -> Path:
+    """Diretório da conversão de uma planilha, identificado pelo hash do conteúdo de origem."""
+    return caminho_planilha.with_name(f"{caminho_planilha.name}.{hash_conteudo[:16]}.colunas")
+
+def remover_conversao(diretorio: Path):
+    """Remove uma conversão do disco e fecha sua tabela aberta neste processo, se houver."""
+    with _LOCK_TABELAS:
+        _TABELAS_ABERTAS.pop(diretorio, None)
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+def _inferir_coluna(valores: list) -> "np.ndarray":
+    """
+    Converte os valores de uma coluna em um array NumPy tipado.
+
+    Datas viram `datetime64[s]` (NaT para vazios), números viram `float64` (NaN para
+    vazios) e o restante vira texto de largura fixa (vazio para None), para que todas
+    as colunas possam ser abertas com memory-mapping.
+    """
+    import numpy as np
+
+    presentes = [v for v in valores if v is not None]
+    if presentes and all(isinstance(v, (datetime, date)) for v in presentes):
+        return np.array([np.datetime64(v, "s") if v is not None else np.datetime64("NaT", "s") for v in valores], dtype="datetime64[s]")
+    if presentes and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in presentes):
+        return np.array([v if v is not None else np.nan for v in valores], dtype=np.float64)
+    return np.array(["" if v is None else str(v) for v in valores], dtype=np.str_)
+
+def converter_linhas(cabecalho: Iterable, linhas: Iterable[tuple]) -> dict[str, "np.ndarray"]:
+    """
+    Converte o cabeçalho e as linhas de uma aba em colunas tipadas.
+
+    Nomes de coluna são normalizados com `strip()`; linhas totalmente vazias são
+    descartadas e colunas sem nome ou duplicadas são ignoradas.
+
+    Args:
+        cabecalho (Iterable): Valores da linha de cabeçalho.
+        linhas (Iterable[tuple]): Linhas de dados (valores das células).
+
+    Returns:
+        dict[str, np.ndarray]: Nome da coluna -> array tipado.
+    """
+    posicoes: dict[str, int] = {}
+    for indice, nome in enumerate(cabecalho):
+        if nome is not None and str(nome).strip():
+            posicoes.setdefault(str(nome).strip(), indice)
+
+    valores: dict[str, list] = {nome: [] for nome in posicoes}
+    for linha in linhas:
+        if all(v is None for v in linha):
+            continue
+        for nome, indice in posicoes.items():
+            valores[nome].append(linha[indice] if indice < len(linha) else None)
+
+    return {nome: _inferir_coluna(lista) for nome, lista in valores.items()}
+
+def converter_planilha(caminho_planilha: Path, hash_conteudo: str, sheet: str, header_row: int) -> Path | None:
+    """
+    Converte uma aba da planilha para o formato colunar, uma única vez por conteúdo.
+
+    A conversão é gravada em um diretório temporário e publicada com rename atômico;
+    conversões anteriores da mesma planilha (outro conteúdo) são removidas.
+
+    Args:
+        caminho_planilha (Path): Caminho da planilha .xlsx.
+        hash_conteudo (str): SHA-256 do conteúdo da planilha.
+        sheet (str): Nome da aba a converter.
+        header_row (int): Linhas a ignorar antes do cabeçalho (0-based).
+
+    Returns:
+        Path | None: Diretório da conversão, ou None se a aba não existir.
+    """
+    destino = diretorio_colunar(caminho_planilha, hash_conteudo)
+    if _schema_compativel(destino, sheet, header_row):
+        return destino
+
+    import numpy as np
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(caminho_planilha, read_only=True, data_only=True)
+    try:
+        if sheet not in workbook.sheetnames:
+            logger.error(f"[Colunar] A aba '{sheet}' não foi encontrada em {caminho_planilha.name}.")
+            return None
+        linhas = workbook[sheet].iter_rows(min_row=header_row + 1, values_only=True)
+        colunas = converter_linhas(next(linhas, ()), linhas)
+    finally:
+        workbook.close()
+
+    temporario = Path(tempfile.mkdtemp(dir=caminho_planilha.parent, prefix=f".{destino.name}."))
+    try:
+        schema_colunas = []
+        for indice, (nome, array) in enumerate(colunas.items()):
+            arquivo = f"c{indice:03d}.npy"
+            np.save(temporario / arquivo, array, allow_pickle=False)
+            schema_colunas.append({"nome": nome, "arquivo": arquivo, "dtype": array.dtype.str})
+
+        schema = {
+            "versao_formato": VERSAO_FORMATO,
+            "origem": {"nome": caminho_planilha.name, "sha256": hash_conteudo},
+            "sheet": sheet,
+            "header_row": header_row,
+            "linhas": len(next(iter(colunas.values()), [])),
+            "colunas": schema_colunas,
+        }
+        (temporario / "schema.json").write_text(json.dumps(schema, ensure_ascii=False), encoding="utf-8")
+
+        if destino.exists():
+            remover_conversao(destino)
+        os.replace(temporario, destino)
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+
+    for antiga in caminho_planilha.parent.glob(f"{caminho_planilha.name}.*.colunas"):
+        if antiga != destino:
+            remover_conversao(antiga)
+
+    logger.info(f"[Colunar] {caminho_planilha.name} convertida ({schema['linhas']} linhas).", status="columnar_converted")
+    return destino
+
+def _ler_schema(diretorio: Path) -> dict | None:
+    """Lê o `schema.json` de uma conversão, ou None se ausente/ilegível."""
+    try:
+        return json.loads((diretorio / "schema.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def _schema_compativel(diretorio: Path, sheet: str, header_row: int) -> bool:
+    """Verifica se a conversão existe e foi feita com o mesmo formato, aba e cabeçalho."""
+    schema = _ler_schema(diretorio)
+    return bool(
+        schema
+        and schema.get("versao_formato") == VERSAO_FORMATO
+        and schema.get("sheet") == sheet
+        and schema.get("header_row") == header_row
+    )
+
+def carregar_tabela(caminho_planilha: Path, hash_conteudo: str, sheet: str, header_row: int) -> TabelaColunar | None:
+    """
+    Abre a conversão colunar de uma planilha com memory-mapping, se ela estiver atualizada.
+
+    Args:
+        caminho_planilha (Path): Caminho da planilha .xlsx de origem.
+        hash_conteudo (str): SHA-256 atual do conteúdo da planilha.
+        sheet (str): Aba esperada na conversão.
+        header_row (int): Linha de cabeçalho esperada na conversão.
+
+    Returns:
+        TabelaColunar | None: A tabela, ou None se a conversão estiver ausente ou desatualizada.
+    """
+    diretorio = diretorio_colunar(caminho_planilha, hash_conteudo)
+    with _LOCK_TABELAS:
+        tabela = _TABELAS_ABERTAS.get(diretorio)
+        if tabela is not None:
+            _TABELAS_ABERTAS.move_to_end(diretorio)
+    if tabela is not None and tabela.schema["sheet"] == sheet and tabela.schema["header_row"] == header_row:
+        return tabela
+
+    if not _schema_compativel(diretorio, sheet, header_row):
+        return None
+
+    import numpy as np
+
+    schema = _ler_schema(diretorio)
+    try:
+        colunas = {
+            coluna["nome"]: np.load(diretorio / coluna["arquivo"], mmap_mode="r", allow_pickle=False)
+            for coluna in schema["colunas"]
+        }
+    except (OSError, ValueError) as e:
+        logger.warning(f"[Colunar] Conversão de {caminho_planilha.name} ilegível: {e}")
+        return None
+
+    tabela = TabelaColunar(colunas=colunas, schema=schema)
+    with _LOCK_TABELAS:
+        _TABELAS_ABERTAS[diretorio] = tabela
+        _TABELAS_ABERTAS.move_to_end(diretorio)
+        # Conversões removidas por outro processo (ou apenas antigas) deixam de ficar mapeadas
+        while len(_TABELAS_ABERTAS) > max(1, settings.COLUMNAR_MAX_OPEN_TABLES):
+            _TABELAS_ABERTAS.popitem(last=False)
+    return tabela
+
+def valor_python(valor):
+    """Converte um escalar NumPy para o tipo Python equivalente (datetime, float, str)."""
+    import numpy as np
+
+    if isinstance(valor, np.datetime64):
+        return None if np.isnat(valor) else valor.astype("datetime64[us]").item()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
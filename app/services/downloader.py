@@ -1,37 +1,138 @@
-import redis
-import requests
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import ssl
+import tempfile
+import httpx
 import re
 from pathlib import Path
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from datetime import timedelta
+from datetime import date, timedelta
+from app.services.artifact_store import ArmazemArtefatos
+from app.services.circuit_breaker import Disjuntor
+from app.services.coalescer import Coalescedor, lock_distribuido
 from app.services.logger import setup_logger
+from app.services.metrics import CACHE_L1_ENTRIES, DOWNLOAD_BYTES_TOTAL, DOWNLOADS_TOTAL, PIPELINE_STAGE_SECONDS, registrar_cache, registrar_medidor
+from app.services.redis_client import INDISPONIVEL, cliente_redis
+from app.services.tiered_cache import CacheDoisNiveis
 from app.core.config import settings
 from app.services.time_sync import get_current_time
 
 logger = setup_logger(__name__)
 
-# Conexão com Redis (container rodando no Docker)
-redis_client = None
-try:
-    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-    # Testa a conexão
-    redis_client.ping()
-    logger.info("Conectado ao Redis com sucesso!")
-except redis.exceptions.ConnectionError as e:
-    logger.warning(f"Não foi possível conectar ao Redis: {e}. O caching será desabilitado.")
-    redis_client = None # Desabilita o cliente Redis se a conexão falhar
-
 BASE_URL = settings.ANP_BASE_URL
 OUTPUT_DIR = settings.OUTPUT_DIR
 SEARCH_URL = "https://www.gov.br/anp/pt-br/assuntos/precos-e-defesa-da-concorrencia/precos/levantamento-de-precos-de-combustiveis-ultimas-semanas-pesquisadas"
 
+# Política de retries (equivalente ao Retry do urllib3 usado anteriormente)
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_FORCELIST = frozenset({500, 502, 503, 504})
+
+# Tamanho dos blocos do download em streaming (limita o pico de memória por download)
+TAMANHO_BLOCO_DOWNLOAD = 64 * 1024
+
+# Varredura da página de busca: links .xlsx, lidos à medida que o HTML chega
+_LINK_XLSX = re.compile(r'href=["\']([^"\']*?\.xlsx)["\']', re.IGNORECASE)
+# Datas no nome da planilha (ex: resumo_semanal_lpc_2025-11-30_2025-12-06.xlsx)
+_DATA_NO_NOME = re.compile(r"(\d{4})[-_](\d{2})[-_](\d{2})")
+# Trecho final do HTML mantido entre blocos (um link pode chegar dividido entre dois)
+_CAUDA_VARREDURA = 2048
+# Os links das planilhas semanais ficam agrupados: a leitura para depois de tantos
+# caracteres sem um novo link, ou ao atingir o limite da página
+PARADA_ANTECIPADA_CARACTERES = 64 * 1024
+TAMANHO_MAXIMO_PAGINA = 4 * 1024 * 1024
+
+# URL mais recente resolvida (compartilhada entre réplicas pelo Redis, com TTL curto)
+CHAVE_URL_RECENTE = "anp:url_recente"
+
+HEADERS_PADRAO = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+# Cliente HTTP compartilhado (pool de conexões keep-alive), criado no lifespan da aplicação
+_cliente_http: httpx.AsyncClient | None = None
+
+# Última varredura da página de busca neste processo: URL e validadores (ETag/Last-Modified)
+_PAGINA_BUSCA: dict | None = None
+
+# URL mais recente e caminhos das planilhas: memória do processo (L1) na frente do Redis (L2),
+# com invalidação entre réplicas por pub/sub (iniciada no lifespan)
+cache_anp = CacheDoisNiveis("anp")
+registrar_medidor(CACHE_L1_ENTRIES.labels(cache="anp"), lambda: len(cache_anp))
+
+# Single-flight dos downloads: chamadas concorrentes para a mesma planilha compartilham um download
+coalescedor_downloads = Coalescedor("download")
+
+# Disjuntor da ANP (scraping e download): com a ANP fora do ar, falha imediatamente em vez
+# de repetir timeouts e retries a cada ciclo
+disjuntor_anp = Disjuntor(
+    "anp",
+    limite_falhas=settings.ANP_BREAKER_FAILURE_THRESHOLD,
+    recuperacao=settings.ANP_BREAKER_RESET_SECONDS,
+    recuperacao_maxima=settings.ANP_BREAKER_MAX_RESET_SECONDS,
+)
+
+# Memória dos hashes já calculados: (caminho, mtime_ns, tamanho) -> sha256
+# Evita reler o arquivo inteiro a cada requisição; basta um stat() para validar a entrada.
+_HASHES_ARQUIVOS: dict[tuple[str, int, int], str] = {}
+
+def _assinatura_arquivo(caminho_arquivo: Path) -> tuple[str, int, int] | None:
+    """Retorna a assinatura (caminho, mtime_ns, tamanho) do arquivo ou None se inacessível."""
+    try:
+        info = Path(caminho_arquivo).stat()
+    except (OSError, TypeError, ValueError):
+        return None
+    return str(caminho_arquivo), info.st_mtime_ns, info.st_size
+
+def calcular_hash_arquivo(caminho_arquivo: str | Path) -> str | None:
+    """
+    Calcula (ou recupera da memória) o SHA-256 do conteúdo de uma planilha.
+
+    O hash identifica o conteúdo da planilha independentemente do nome do arquivo e
+    é usado como parte da chave do cache de resultados extraídos.
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local da planilha.
+
+    Returns:
+        str | None: Hash hexadecimal do conteúdo, ou None se o arquivo não puder ser lido.
+    """
+    assinatura = _assinatura_arquivo(caminho_arquivo)
+    if assinatura is None:
+        return None
+
+    hash_conhecido = _HASHES_ARQUIVOS.get(assinatura)
+    if hash_conhecido:
+        return hash_conhecido
+
+    digest = hashlib.sha256()
+    try:
+        with Path(caminho_arquivo).open("rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(bloco)
+    except OSError as e:
+        logger.warning(f"[Hash] Não foi possível ler {caminho_arquivo}: {e}")
+        return None
+
+    _HASHES_ARQUIVOS[assinatura] = digest.hexdigest()
+    return _HASHES_ARQUIVOS[assinatura]
+
+def _registrar_hash_calculado(caminho_arquivo: Path, hash_conteudo: str):
+    """Registra o hash de um arquivo recém-gravado, evitando relê-lo do disco."""
+    assinatura = _assinatura_arquivo(caminho_arquivo)
+    if assinatura is not None:
+        _HASHES_ARQUIVOS[assinatura] = hash_conteudo
+
 def calcular_tempo_ate_proximo_domingo():
     """
     Calcula o tempo restante (em segundos) até o próximo domingo à meia-noite.
 
-    Utiliza o serviço de sincronização de tempo (NTP) para obter a hora atual.
-    O valor calculado é utilizado como TTL (Time To Live) para o cache no Redis.
+    Utiliza o relógio sincronizado (offset NTP mantido em cache, sem I/O) para obter
+    a hora atual. O valor calculado é utilizado como TTL (Time To Live) para o cache no Redis.
 
     Returns:
         int: Número de segundos até o próximo domingo às 00:00:00.
@@ -41,68 +142,454 @@ def calcular_tempo_ate_proximo_domingo():
     proximo_domingo = proximo_domingo.replace(hour=0, minute=0, second=0, microsecond=0)
     return int((proximo_domingo - hoje).total_seconds())
 
-def criar_sessao():
-    """Cria uma sessão HTTP com política de retries."""
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount('https://', adapter)
-    session.mount('http://', adapter)
+def criar_cliente_http(verify: bool = True) -> httpx.AsyncClient:
+    """
+    Cria um cliente HTTP assíncrono com pool de conexões keep-alive.
+
+    Args:
+        verify (bool): Se deve verificar o certificado SSL do servidor.
+
+    Returns:
+        httpx.AsyncClient: Cliente configurado com headers, timeout e limites do pool.
+    """
+    limites = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    )
+    return httpx.AsyncClient(
+        headers=HEADERS_PADRAO,
+        timeout=settings.HTTP_TIMEOUT_SECONDS,
+        limits=limites,
+        verify=verify,
+        follow_redirects=True,
+    )
+
+async def iniciar_cliente_http() -> httpx.AsyncClient:
+    """Cria o cliente HTTP compartilhado (chamado no startup da aplicação)."""
+    global _cliente_http
+    if _cliente_http is None or _cliente_http.is_closed:
+        _cliente_http = criar_cliente_http()
+        logger.info("[HTTP] Cliente HTTP compartilhado iniciado.", status="http_client_started")
+    return _cliente_http
 
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
-    })
-    return session
+async def fechar_cliente_http():
+    """Fecha o cliente HTTP compartilhado e suas conexões (chamado no shutdown)."""
+    global _cliente_http
+    if _cliente_http is not None:
+        await _cliente_http.aclose()
+        _cliente_http = None
+        logger.info("[HTTP] Cliente HTTP compartilhado encerrado.", status="http_client_closed")
 
-def encontrar_url_mais_recente(session):
+def obter_cliente_http() -> httpx.AsyncClient:
     """
-    Realiza o scraping da página da ANP para encontrar a URL da planilha mais recente.
+    Retorna o cliente HTTP compartilhado, criando-o sob demanda se o lifespan não o iniciou.
+
+    Returns:
+        httpx.AsyncClient: Cliente compartilhado.
+    """
+    global _cliente_http
+    if _cliente_http is None or _cliente_http.is_closed:
+        _cliente_http = criar_cliente_http()
+    return _cliente_http
+
+def _tempo_backoff(tentativa: int) -> float:
+    """Tempo de espera antes do retry `tentativa` (mesma fórmula do urllib3: 0, 1s, 2s...)."""
+    if tentativa <= 1:
+        return 0.0
+    return RETRY_BACKOFF_FACTOR * (2 ** (tentativa - 1))
 
-    Busca por links que terminam em '.xlsx' e contenham 'resumo_semanal' no href.
+def _eh_erro_ssl(exc: BaseException) -> bool:
+    """Verifica se a exceção (ou alguma de suas causas) é uma falha de verificação SSL."""
+    atual: BaseException | None = exc
+    while atual is not None:
+        if isinstance(atual, ssl.SSLError):
+            return True
+        atual = atual.__cause__ or atual.__context__
+    return False
+
+async def requisitar_com_retries(
+    cliente: httpx.AsyncClient, url: str, headers: dict[str, str] | None = None, stream: bool = False
+) -> httpx.Response:
+    """
+    Executa um GET aplicando a política de retries (erros de transporte e status 5xx).
+
+    Falhas de verificação SSL não são repetidas: são propagadas para o fallback do chamador.
+
+    Args:
+        cliente (httpx.AsyncClient): Cliente HTTP a ser utilizado.
+        url (str): URL requisitada.
+        headers (dict[str, str] | None): Headers adicionais (ex: revalidação condicional).
+        stream (bool): Se True, o corpo não é lido; o chamador deve consumir e fechar a resposta.
+
+    Returns:
+        httpx.Response: A última resposta obtida.
+
+    Raises:
+        httpx.TransportError: Se todas as tentativas falharem por erro de transporte.
+    """
+    for tentativa in range(RETRY_TOTAL + 1):
+        if tentativa:
+            await asyncio.sleep(_tempo_backoff(tentativa))
+        try:
+            response = await cliente.send(cliente.build_request("GET", url, headers=headers), stream=stream)
+        except httpx.TransportError as e:
+            if _eh_erro_ssl(e) or tentativa == RETRY_TOTAL:
+                raise
+            logger.warning(f"[Retry] Erro de transporte em {url}: {e}. Tentativa {tentativa + 1}/{RETRY_TOTAL}")
+            continue
+
+        if response.status_code in RETRY_STATUS_FORCELIST and tentativa < RETRY_TOTAL:
+            logger.warning(f"[Retry] Status {response.status_code} em {url}. Tentativa {tentativa + 1}/{RETRY_TOTAL}")
+            await response.aclose()
+            continue
+        return response
+    raise AssertionError("inalcançável")  # pragma: no cover
+
+def limpar_cache_busca():
+    """Descarta a última varredura da página de busca e a URL mantidas em memória."""
+    global _PAGINA_BUSCA
+    _PAGINA_BUSCA = None
+    cache_anp.descartar_local(CHAVE_URL_RECENTE)
+
+def _data_no_nome(url: str) -> date | None:
+    """Maior data válida no nome do arquivo (a data final da semana), ou None se não houver."""
+    datas = []
+    for ano, mes, dia in _DATA_NO_NOME.findall(url.rsplit("/", 1)[-1]):
+        try:
+            datas.append(date(int(ano), int(mes), int(dia)))
+        except ValueError:
+            continue
+    return max(datas, default=None)
+
+def ordenar_candidatos(links: list[str]) -> list[str]:
+    """
+    Ordena os links de planilhas da mais recente para a mais antiga, pela data no nome do arquivo.
+
+    Links sem data no nome vêm depois dos datados; empates mantêm a ordem da página.
+    """
+    def chave(link: str) -> tuple[bool, date]:
+        data = _data_no_nome(link)
+        return data is not None, data or date.min
+
+    return sorted(dict.fromkeys(links), key=chave, reverse=True)
+
+async def _varrer_links(response: httpx.Response) -> list[str]:
+    """
+    Lê a página de busca em blocos, coletando os links de planilhas semanais.
+
+    A leitura é interrompida `PARADA_ANTECIPADA_CARACTERES` após o último link encontrado
+    (fim da lista de planilhas) ou em `TAMANHO_MAXIMO_PAGINA`.
+
+    Returns:
+        list[str]: Links com "resumo_semanal", na ordem da página.
+    """
+    candidatos: list[str] = []
+    buffer, inicio_buffer, lidos, ultimo_link = "", 0, 0, 0
+    async for bloco in response.aiter_text():
+        lidos += len(bloco)
+        buffer += bloco
+        fim = 0
+        for encontrado in _LINK_XLSX.finditer(buffer):
+            fim = encontrado.end()
+            if "resumo_semanal" in encontrado.group(1).lower():
+                candidatos.append(encontrado.group(1))
+                ultimo_link = inicio_buffer + fim
+        corte = max(fim, len(buffer) - _CAUDA_VARREDURA)
+        buffer, inicio_buffer = buffer[corte:], inicio_buffer + corte
+        if candidatos and lidos - ultimo_link > PARADA_ANTECIPADA_CARACTERES:
+            break
+        if lidos > TAMANHO_MAXIMO_PAGINA:
+            logger.warning(f"[Scraper] Página de busca excedeu {TAMANHO_MAXIMO_PAGINA} caracteres; leitura interrompida.")
+            break
+    return candidatos
+
+async def _url_em_cache() -> str | None:
+    """URL mais recente ainda dentro do TTL: memória do processo e, depois, Redis (outras réplicas)."""
+    url = await cache_anp.obter(CHAVE_URL_RECENTE)
+    if isinstance(url, bytes):
+        url = url.decode("utf-8")
+    return url or None
+
+async def encontrar_url_mais_recente_async(cliente: httpx.AsyncClient) -> str | None:
+    """
+    Encontra a URL da planilha mais recente na página de busca da ANP.
+
+    A URL resolvida fica em cache por `SCRAPE_CACHE_SECONDS` (no processo e no Redis).
+    Depois disso, a página é revalidada com `If-None-Match`/`If-Modified-Since`: um 304
+    mantém a URL conhecida sem transferir o HTML. Em um 200, o HTML é varrido em
+    streaming (com parada antecipada) em busca de links '.xlsx' com 'resumo_semanal',
+    e o mais recente é escolhido pela data no nome do arquivo, não pela posição na página.
 
     Args:
-        session (requests.Session): Sessão HTTP configurada para realizar a requisição.
+        cliente (httpx.AsyncClient): Cliente HTTP utilizado na requisição.
 
     Returns:
         str | None: A URL completa do arquivo .xlsx se encontrado, ou None caso contrário.
     """
+    global _PAGINA_BUSCA
+    usar_cache = settings.SCRAPE_CACHE_SECONDS > 0
+    if usar_cache:
+        em_cache = await _url_em_cache()
+        registrar_cache("busca", em_cache is not None)
+        if em_cache:
+            return em_cache
+
+    anterior = _PAGINA_BUSCA if usar_cache else None
+    headers = {}
+    if anterior and anterior.get("etag"):
+        headers["If-None-Match"] = anterior["etag"]
+    if anterior and anterior.get("last_modified"):
+        headers["If-Modified-Since"] = anterior["last_modified"]
+
+    if not disjuntor_anp.permite():
+        logger.warning("[Scraper] ANP indisponível (disjuntor aberto); busca não realizada.", status="anp_circuit_open")
+        return None
+
     logger.info(f"[Scraper] Buscando URL mais recente em: {SEARCH_URL}")
     try:
-        response = session.get(SEARCH_URL, timeout=15)
-        response.raise_for_status()
-
-        # Encontrar todos os links que terminam em .xlsx
-        # Regex captura o conteúdo do href
-        links = re.findall(r'href=["\'](.*?\.xlsx)["\']', response.text, re.IGNORECASE)
-
-        # Filtrar links que parecem ser o resumo semanal
-        # Geralmente contém "resumo_semanal"
-        links_validos = [link for link in links if "resumo_semanal" in link.lower()]
-
-        if links_validos:
-            # Assume que o primeiro link da página é o mais recente
-            url_recente = links_validos[0]
-            logger.info(f"[Scraper] URL encontrada: {url_recente}")
-            return url_recente
-        else:
-            logger.warning("[Scraper] Nenhum link de planilha semanal encontrado na página.")
-            return None
-
-    except requests.RequestException as e:
+        with PIPELINE_STAGE_SECONDS.labels(etapa="scrape").time():
+            response = await requisitar_com_retries(cliente, SEARCH_URL, headers=headers, stream=True)
+            try:
+                if response.status_code == 304 and anterior:
+                    logger.info("[Scraper] Página de busca não modificada (304).")
+                    url_recente = anterior["url"]
+                else:
+                    response.raise_for_status()
+                    candidatos = ordenar_candidatos(await _varrer_links(response))
+                    url_recente = candidatos[0] if candidatos else None
+            finally:
+                await response.aclose()
+    except httpx.HTTPError as e:
+        disjuntor_anp.registrar_falha()
         logger.error(f"[Scraper] Erro ao acessar a página da ANP: {e}")
         return None
+    disjuntor_anp.registrar_sucesso()
 
-def baixar_arquivo():
+    if not url_recente:
+        logger.warning("[Scraper] Nenhum link de planilha semanal encontrado na página.")
+        return None
+
+    logger.info(f"[Scraper] URL encontrada: {url_recente}")
+    if usar_cache:
+        _PAGINA_BUSCA = {
+            "url": url_recente,
+            "etag": response.headers.get("etag") or (anterior or {}).get("etag"),
+            "last_modified": response.headers.get("last-modified") or (anterior or {}).get("last_modified"),
+        }
+        await cache_anp.definir(CHAVE_URL_RECENTE, url_recente, settings.SCRAPE_CACHE_SECONDS)
+    return url_recente
+
+def _caminho_metadados(caminho_arquivo: Path) -> Path:
+    """Caminho do arquivo de metadados (ETag, Last-Modified, SHA-256) de uma planilha."""
+    return caminho_arquivo.with_name(caminho_arquivo.name + ".meta.json")
+
+def ler_metadados(caminho_arquivo: Path) -> dict | None:
+    """
+    Lê os metadados gravados junto com a planilha, se existirem.
+
+    Returns:
+        dict | None: Metadados do download (url, etag, last_modified, sha256, tamanho).
+    """
+    try:
+        return json.loads(_caminho_metadados(caminho_arquivo).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def _gravar_atomicamente(destino: Path, conteudo: bytes):
+    """Grava `conteudo` em um arquivo temporário no mesmo diretório e renomeia atomicamente."""
+    fd, temporario = tempfile.mkstemp(dir=destino.parent, prefix=f".{destino.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, destino)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+
+def _gravar_bloco(arquivo, digest, bloco: bytes):
+    """Grava um bloco do download e o acumula no SHA-256 (roda em thread)."""
+    arquivo.write(bloco)
+    digest.update(bloco)
+
+def _sincronizar_arquivo(arquivo):
+    """Descarrega o arquivo no disco (`fsync`) antes da publicação (roda em thread)."""
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+
+def arquivo_integro(caminho_arquivo: Path) -> bool:
+    """
+    Verifica se a planilha local está completa, comparando tamanho e SHA-256 com os metadados.
+
+    Arquivos sem metadados (ex: gravações interrompidas ou anteriores a esta verificação)
+    não são considerados íntegros e serão baixados novamente. Uma planilha fria (comprimida
+    no armazém) é restaurada; uma que não confere com os metadados é descartada, para nunca
+    chegar ao extrator. O SHA-256 é recalculado na primeira leitura de cada processo e depois
+    revalidado pela assinatura (mtime, tamanho) do arquivo.
+
+    Args:
+        caminho_arquivo (Path): Caminho local da planilha.
+
+    Returns:
+        bool: True se o arquivo existe e corresponde aos metadados gravados no download.
+    """
+    metadados = ler_metadados(caminho_arquivo)
+    if not metadados:
+        return False
+    caminho_arquivo = Path(caminho_arquivo)
+    armazem = ArmazemArtefatos(caminho_arquivo.parent)
+    sha256 = metadados.get("sha256")
+    assinatura = _assinatura_arquivo(caminho_arquivo)
+    if assinatura is None:
+        if not (sha256 and armazem.restaurar(sha256, caminho_arquivo)):
+            return False
+        assinatura = _assinatura_arquivo(caminho_arquivo)
+    if assinatura is None or assinatura[2] != metadados.get("tamanho") or calcular_hash_arquivo(caminho_arquivo) != sha256:
+        armazem.descartar_corrompido(caminho_arquivo, sha256)
+        return False
+    armazem.registrar_acesso(sha256, caminho_arquivo)
+    return True
+
+def ultima_planilha_valida() -> tuple[str, Path] | None:
+    """
+    Planilha íntegra mais recente já baixada em `OUTPUT_DIR` (último dado válido conhecido).
+
+    A mais recente é escolhida pela data no nome do arquivo (ver `ordenar_candidatos`).
+
+    Returns:
+        tuple[str, Path] | None: (URL de origem, caminho local), ou None se não houver.
+    """
+    try:
+        # Pelos metadados: planilhas frias (comprimidas no armazém) não têm o .xlsx no diretório
+        metadados = {caminho.name[: -len(".meta.json")]: caminho for caminho in OUTPUT_DIR.glob("*.xlsx.meta.json")}
+        planilhas = {nome: OUTPUT_DIR / nome for nome in metadados}
+        # Sem data no nome, vale a modificação mais recente
+        por_modificacao = sorted(planilhas, key=lambda nome: metadados[nome].stat().st_mtime, reverse=True)
+    except OSError:
+        return None
+    for nome in ordenar_candidatos(por_modificacao):
+        caminho = planilhas[nome]
+        if arquivo_integro(caminho):
+            return ler_metadados(caminho).get("url") or nome, caminho
+    return None
+
+def _digest_esperado(response: httpx.Response) -> str | None:
+    """Extrai o SHA-256 anunciado pelo servidor (headers `Repr-Digest`/`Digest`), se houver."""
+    for header in ("repr-digest", "digest"):
+        for parte in response.headers.get(header, "").split(","):
+            algoritmo, _, valor = parte.strip().partition("=")
+            if algoritmo.lower() == "sha-256" and valor:
+                try:
+                    return base64.b64decode(valor.strip(":")).hex()
+                except ValueError:
+                    return None
+    return None
+
+async def _baixar_para_disco(cliente: httpx.AsyncClient, url: str, caminho_arquivo: Path) -> Path | None:
+    """
+    Baixa a planilha em blocos para um arquivo temporário e a publica com rename atômico.
+
+    Se já houver uma cópia íntegra em disco, a requisição é condicional (`If-None-Match` /
+    `If-Modified-Since`) e um 304 reaproveita o arquivo sem nova transferência. O tamanho
+    recebido é conferido com o `Content-Length`, e o SHA-256 com o digest anunciado pelo
+    servidor, quando houver. O conteúdo é guardado no armazém por SHA-256 (`ArmazemArtefatos`)
+    e o nome de arquivo da URL vira um alias dele.
+
+    Returns:
+        Path | None: Caminho da planilha publicada, ou None em caso de falha.
+    """
+    # Verificação de integridade (SHA-256, restauração de objeto comprimido) em thread
+    anteriores = ler_metadados(caminho_arquivo) if await asyncio.to_thread(arquivo_integro, caminho_arquivo) else None
+    headers = {}
+    if anteriores and anteriores.get("etag"):
+        headers["If-None-Match"] = anteriores["etag"]
+    if anteriores and anteriores.get("last_modified"):
+        headers["If-Modified-Since"] = anteriores["last_modified"]
+
+    response = await requisitar_com_retries(cliente, url, headers=headers, stream=True)
+    try:
+        if response.status_code == 304 and anteriores:
+            logger.info(f"[Download] Planilha não modificada (304), reutilizando: {caminho_arquivo}")
+            DOWNLOADS_TOTAL.labels(resultado="nao_modificada").inc()
+            return caminho_arquivo
+
+        if response.status_code != 200:
+            logger.error(f"[Erro] Falha ao baixar (Status {response.status_code}). URL: {url}")
+            return None
+
+        # Gravação, hash e fsync em thread: o event loop só recebe os blocos da rede
+        await asyncio.to_thread(OUTPUT_DIR.mkdir, parents=True, exist_ok=True)
+        fd, temporario = await asyncio.to_thread(
+            tempfile.mkstemp, dir=caminho_arquivo.parent, prefix=f".{caminho_arquivo.name}.", suffix=".part"
+        )
+        try:
+            digest = hashlib.sha256()
+            tamanho = 0
+            with os.fdopen(fd, "wb") as f:
+                async for bloco in response.aiter_bytes(TAMANHO_BLOCO_DOWNLOAD):
+                    await asyncio.to_thread(_gravar_bloco, f, digest, bloco)
+                    tamanho += len(bloco)
+                    DOWNLOAD_BYTES_TOTAL.inc(len(bloco))
+                await asyncio.to_thread(_sincronizar_arquivo, f)
+
+            # Content-Length refere-se ao corpo transferido (antes de descompressão, se houver)
+            esperado = response.headers.get("content-length")
+            comprimido = response.headers.get("content-encoding", "identity") != "identity"
+            recebidos = response.num_bytes_downloaded if comprimido else tamanho
+            if esperado is not None and int(esperado) != recebidos:
+                logger.error(f"[Erro] Download incompleto: {recebidos} de {esperado} bytes. URL: {url}")
+                return None
+
+            digest_esperado = _digest_esperado(response)
+            if digest_esperado and digest_esperado != digest.hexdigest():
+                logger.error(f"[Erro] Checksum divergente para {url}.")
+                return None
+
+            await asyncio.to_thread(ArmazemArtefatos(caminho_arquivo.parent).publicar, Path(temporario), digest.hexdigest(), caminho_arquivo)
+        finally:
+            Path(temporario).unlink(missing_ok=True)
+
+        metadados = {
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "sha256": digest.hexdigest(),
+            "tamanho": tamanho,
+        }
+        await asyncio.to_thread(_gravar_atomicamente, _caminho_metadados(caminho_arquivo), json.dumps(metadados).encode("utf-8"))
+        _registrar_hash_calculado(caminho_arquivo, digest.hexdigest())
+        DOWNLOADS_TOTAL.labels(resultado="baixada").inc()
+        return caminho_arquivo
+    finally:
+        await response.aclose()
+
+async def _baixar_com_fallback_ssl(cliente: httpx.AsyncClient, url: str, caminho_arquivo: Path) -> Path | None:
+    """Baixa a URL verificando o certificado; em falha SSL, repete sem verificação."""
+    try:
+        return await _baixar_para_disco(cliente, url, caminho_arquivo)
+    except httpx.TransportError as e:
+        if not _eh_erro_ssl(e):
+            raise
+        logger.warning(f"[SSL] Falha na verificação de certificado para {url}. Tentando sem verificação...")
+        async with criar_cliente_http(verify=False) as cliente_inseguro:
+            return await _baixar_para_disco(cliente_inseguro, url, caminho_arquivo)
+
+async def baixar_arquivo_async(cliente: httpx.AsyncClient | None = None):
     """
-    Orquestra o processo de download da planilha da ANP.
+    Orquestra o processo de download da planilha da ANP sem bloquear o event loop.
 
     1. Busca a URL mais recente via scraping.
     2. Verifica se o arquivo já existe no cache (Redis) ou disco local.
-    3. Se não existir, realiza o download e salva no disco.
+    3. Se não existir, realiza o download em streaming para um arquivo temporário,
+       verifica tamanho/checksum e publica com rename atômico. Downloads concorrentes da
+       mesma planilha são coalescidos no processo e coordenados entre réplicas por um
+       lock distribuído no Redis.
     4. Atualiza o cache com TTL até o próximo domingo.
 
+    Args:
+        cliente (httpx.AsyncClient | None): Cliente HTTP; por padrão, o cliente compartilhado.
+
     Returns:
         tuple: Uma tupla contendo:
             - url (str): URL do arquivo baixado.
@@ -111,10 +598,10 @@ def baixar_arquivo():
             - caminho_arquivo (Path): Caminho local onde o arquivo foi salvo.
             Retorna (None, None, None, None) em caso de falha.
     """
-    session = criar_sessao()
+    cliente = cliente or obter_cliente_http()
 
     # 1. Obter URL dinâmica via scraping
-    url = encontrar_url_mais_recente(session)
+    url = await encontrar_url_mais_recente_async(cliente)
 
     if not url:
         logger.error("🚨 [Falha] Não foi possível obter a URL do arquivo.")
@@ -128,45 +615,119 @@ def baixar_arquivo():
     cache_key = f"arquivo_precos:{nome_arquivo}"
 
     # 2. Verificar Cache
-    if redis_client:
-        cached_path = redis_client.get(cache_key)
-        if cached_path and Path(cached_path).exists():
+    em_cache = await _consultar_cache(cache_key, caminho_arquivo)
+    if em_cache:
+        # Retornamos None para as datas pois elas serão extraídas do arquivo posteriormente
+        return url, None, None, em_cache
+
+    # 3. Cache miss: uma única execução por planilha no processo (single-flight)
+    caminho_baixado = await coalescedor_downloads.executar(
+        cache_key, lambda: _baixar_e_cachear(cliente, url, caminho_arquivo, cache_key)
+    )
+    if caminho_baixado:
+        return url, None, None, caminho_baixado
+    return None, None, None, None
+
+async def _consultar_cache(cache_key: str, caminho_arquivo: Path) -> Path | None:
+    """
+    Retorna o caminho da planilha em cache (memória, Redis ou disco local), se houver e estiver íntegra.
+
+    O caminho lido do Redis fica na memória do processo até o próximo domingo (o TTL da
+    chave). Sem a chave na memória e com o Redis desabilitado ou indisponível (disjuntor
+    aberto), consulta apenas o disco. A verificação de integridade (`arquivo_integro`) roda
+    em thread, fora do event loop.
+    """
+    cached_path = await cache_anp.obter(cache_key, ttl=calcular_tempo_ate_proximo_domingo(), padrao=INDISPONIVEL)
+    if cached_path is not INDISPONIVEL:
+        hit = bool(cached_path) and await asyncio.to_thread(arquivo_integro, Path(cached_path))
+        registrar_cache("redis", hit)
+        if hit:
             logger.info(f"[Cache] Usando arquivo em cache: {cached_path}")
-            # Retornamos None para as datas pois elas serão extraídas do arquivo posteriormente
-            return url, None, None, Path(cached_path)
+            return Path(cached_path)
     else:
-        # Se sem redis, verifica se arquivo existe localmente
-        if caminho_arquivo.exists():
+        # Se sem redis, verifica se arquivo existe localmente (e não é uma gravação parcial)
+        hit = await asyncio.to_thread(arquivo_integro, caminho_arquivo)
+        registrar_cache("disco", hit)
+        if hit:
              logger.info(f"[Local] Arquivo já existe no disco: {caminho_arquivo}")
-             return url, None, None, caminho_arquivo
+             return caminho_arquivo
+    return None
 
-    logger.info(f"[Download] Iniciando download de: {url}")
+def _manter_armazem(caminho_arquivo: Path):
+    """Aplica as políticas do armazém (em thread), preservando a planilha informada."""
+    ArmazemArtefatos(caminho_arquivo.parent).manutencao({calcular_hash_arquivo(caminho_arquivo)})
+
+async def _baixar_e_cachear(cliente: httpx.AsyncClient, url: str, caminho_arquivo: Path, cache_key: str) -> Path | None:
+    """
+    Baixa a planilha sob o lock distribuído da semana e atualiza o cache.
+
+    Apenas uma réplica por vez baixa uma mesma planilha; as demais aguardam o lock e,
+    ao obtê-lo, reutilizam o resultado se ele já estiver disponível no cache.
+
+    Returns:
+        Path | None: Caminho local da planilha, ou None em caso de falha.
+    """
+    async with lock_distribuido(
+        cliente_redis.disponivel(),
+        f"lock:{cache_key}",
+        lease=settings.LOCK_LEASE_SECONDS,
+        espera_maxima=settings.LOCK_WAIT_TIMEOUT_SECONDS,
+    ):
+        # Double-check: outra réplica pode ter concluído o download enquanto aguardávamos
+        # (a ausência guardada na memória pela primeira consulta é descartada)
+        cache_anp.descartar_local(cache_key)
+        em_cache = await _consultar_cache(cache_key, caminho_arquivo)
+        if em_cache:
+            return em_cache
+
+        if not disjuntor_anp.permite():
+            logger.warning(f"[Download] ANP indisponível (disjuntor aberto); download de {url} não realizado.", status="anp_circuit_open")
+            DOWNLOADS_TOTAL.labels(resultado="falha").inc()
+            return None
+
+        logger.info(f"[Download] Iniciando download de: {url}")
 
-    try:
-        # Tenta com verificação SSL
         try:
-            response = session.get(url, timeout=15, verify=True)
-        except requests.exceptions.SSLError:
-            logger.warning(f"[SSL] Falha na verificação de certificado para {url}. Tentando sem verificação...")
-            response = session.get(url, timeout=15, verify=False)
-
-        if response.status_code == 200:
-            OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-            with caminho_arquivo.open("wb") as f:
-                f.write(response.content)
-
-            if redis_client:
-                cache_ttl = calcular_tempo_ate_proximo_domingo()
-                redis_client.setex(cache_key, cache_ttl, str(caminho_arquivo))
-                logger.info(f"[Sucesso] Arquivo baixado e cacheado: {caminho_arquivo}")
-            else:
-                logger.info(f"[Sucesso] Arquivo baixado: {caminho_arquivo}")
-
-            return url, None, None, caminho_arquivo
+            with PIPELINE_STAGE_SECONDS.labels(etapa="download").time():
+                caminho_baixado = await _baixar_com_fallback_ssl(cliente, url, caminho_arquivo)
+        except httpx.HTTPError as e:
+            disjuntor_anp.registrar_falha()
+            logger.error(f"[Exceção] Erro na requisição: {e}. URL: {url}")
+            DOWNLOADS_TOTAL.labels(resultado="falha").inc()
+            return None
+
+        if caminho_baixado is None:
+            disjuntor_anp.registrar_falha()
+            DOWNLOADS_TOTAL.labels(resultado="falha").inc()
+            return None
+        disjuntor_anp.registrar_sucesso()
+        # Orçamento de disco e compressão das planilhas frias, preservando a que acabou de chegar
+        await asyncio.to_thread(_manter_armazem, caminho_baixado)
+
+        cache_ttl = calcular_tempo_ate_proximo_domingo()
+        if await cache_anp.definir(cache_key, str(caminho_baixado), cache_ttl):
+            logger.info(f"[Sucesso] Arquivo baixado e cacheado: {caminho_baixado}")
         else:
-            logger.error(f"[Erro] Falha ao baixar (Status {response.status_code}). URL: {url}")
+            logger.info(f"[Sucesso] Arquivo baixado: {caminho_baixado}")
 
-    except requests.RequestException as e:
-        logger.error(f"[Exceção] Erro na requisição: {e}. URL: {url}")
+        return caminho_baixado
 
-    return None, None, None, None
+def baixar_arquivo():
+    """
+    Versão síncrona de `baixar_arquivo_async`, para scripts e uso fora de um event loop.
+
+    Usa um cliente HTTP próprio, encerrado ao final da chamada. Dentro da aplicação
+    (código assíncrono), prefira `baixar_arquivo_async`, que usa o cliente compartilhado.
+
+    Returns:
+        tuple: Mesmo retorno de `baixar_arquivo_async`.
+    """
+    async def _executar():
+        try:
+            async with criar_cliente_http() as cliente:
+                return await baixar_arquivo_async(cliente)
+        finally:
+            # As conexões do pool Redis pertencem a este event loop, que será encerrado
+            await cliente_redis.fechar()
+
+    return asyncio.run(_executar())
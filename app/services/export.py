@@ -0,0 +1,140 @@
+import csv
+import importlib.util
+import io
+import json
+import zlib
+from itertools import islice
+from typing import Callable, Iterable, Iterator, NamedTuple
+from app.core.config import settings
+from app.services.columnar import TabelaColunar
+from app.services.extractor import RegrasExtracao, linhas_historico
+from app.services.history import data_hora_iso
+
+# Colunas exportadas, com os mesmos nomes dos endpoints JSON
+CAMPOS = ("estado", "produto", "dataInicial", "dataFinal", "precoMedioRevenda")
+
+class FormatoExportacao(NamedTuple):
+    media_type: str
+    extensao: str
+    comprimivel: bool  # False: o formato já é comprimido internamente (gzip não compensa)
+
+FORMATOS = {
+    "ndjson": FormatoExportacao("application/x-ndjson", "ndjson", True),
+    "csv": FormatoExportacao("text/csv; charset=utf-8", "csv", True),
+    "parquet": FormatoExportacao("application/vnd.apache.parquet", "parquet", False),
+}
+
+def formato_disponivel(formato: str) -> bool:
+    """Indica se o formato pode ser gerado (o Parquet depende do pyarrow, opcional)."""
+    return formato != "parquet" or importlib.util.find_spec("pyarrow") is not None
+
+def _linhas(tabela: TabelaColunar, regras: RegrasExtracao) -> Iterator[tuple]:
+    for linha in linhas_historico(tabela, regras):
+        yield linha["estado"], linha["produto"], linha["data_inicial"], linha["data_final"], linha["preco_medio"]
+
+def _datas_iso(linha: tuple) -> tuple:
+    """Linha com as datas no formato de data e hora dos endpoints JSON (`data_hora_iso`)."""
+    estado, produto, data_inicial, data_final, preco = linha
+    return estado, produto, data_hora_iso(data_inicial), data_hora_iso(data_final), preco
+
+def _lotes(linhas: Iterator[tuple], tamanho: int) -> Iterator[list[tuple]]:
+    while lote := list(islice(linhas, tamanho)):
+        yield lote
+
+def _serializador_ndjson() -> Callable[[dict], bytes]:
+    """Serializa uma linha com orjson (ou com a biblioteca padrão, se ele não estiver instalado)."""
+    try:
+        import orjson
+    except ImportError:
+        return lambda linha: json.dumps(linha, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+    return lambda linha: orjson.dumps(linha, option=orjson.OPT_APPEND_NEWLINE)
+
+def _ndjson(lotes: Iterable[list[tuple]]) -> Iterator[bytes]:
+    serializar = _serializador_ndjson()
+    for lote in lotes:
+        yield b"".join(serializar(dict(zip(CAMPOS, _datas_iso(linha)))) for linha in lote)
+
+def _csv(lotes: Iterable[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(CAMPOS)
+    for lote in lotes:
+        escritor.writerows(map(_datas_iso, lote))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")  # apenas o cabeçalho (aba sem linhas)
+
+class _Vazao(io.RawIOBase):
+    """Destino do escritor Parquet: acumula os bytes gravados até serem drenados para o cliente."""
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+        self._posicao = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def drenar(self) -> bytes:
+        dados, self._partes = b"".join(self._partes), []
+        return dados
+
+def _parquet(lotes: Iterable[list[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("estado", pa.string()),
+        ("produto", pa.string()),
+        ("dataInicial", pa.date32()),
+        ("dataFinal", pa.date32()),
+        ("precoMedioRevenda", pa.float64()),
+    ])
+    destino = _Vazao()
+    # Um row group por lote: cada um é enviado assim que gravado e o rodapé vai no fim
+    with pq.ParquetWriter(destino, schema, compression="zstd") as escritor:
+        for lote in lotes:
+            colunas = [pa.array(valores, type=campo.type) for valores, campo in zip(zip(*lote), schema)]
+            escritor.write_table(pa.Table.from_arrays(colunas, schema=schema))
+            if dados := destino.drenar():
+                yield dados
+    yield destino.drenar()
+
+def _gzip(partes: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for parte in partes:
+        if comprimido := compressor.compress(parte):
+            yield comprimido
+    yield compressor.flush()
+
+_CODIFICADORES = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}
+
+def exportar(tabela: TabelaColunar, regras: RegrasExtracao, formato: str, gzip: bool = False) -> Iterator[bytes]:
+    """
+    Gera a aba inteira, normalizada, no formato pedido, em blocos de `EXPORT_BATCH_ROWS` linhas.
+
+    As linhas são produzidas sob demanda a partir da tabela (colunar, memory-mapped,
+    quando a planilha já foi ingerida): a memória usada é limitada a um bloco
+    serializado, independentemente do tamanho da exportação. É um iterador síncrono,
+    consumido pelo `StreamingResponse` em threads do pool (sem bloquear o event loop).
+
+    Args:
+        tabela (TabelaColunar): Aba aberta por `abrir_tabela`.
+        regras (RegrasExtracao): Regras de extração resolvidas.
+        formato (str): Chave de `FORMATOS` ("ndjson", "csv" ou "parquet").
+        gzip (bool): Comprime a saída com gzip, bloco a bloco.
+
+    Returns:
+        Iterator[bytes]: Blocos da exportação, na ordem.
+    """
+    partes = _CODIFICADORES[formato](_lotes(_linhas(tabela, regras), settings.EXPORT_BATCH_ROWS))
+    return _gzip(partes) if gzip else partes
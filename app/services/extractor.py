@@ -1,116 +1,805 @@
-import pandas as pd
-import yaml
+import hashlib
+import json
+import math
+import threading
+import time
 from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, NamedTuple
+from app.services.columnar import TabelaColunar, carregar_tabela, converter_linhas, converter_planilha, valor_python
+from app.services.history import historico
 from app.services.logger import setup_logger
+from app.services.metrics import registrar_cache
+from app.services.downloader import calcular_hash_arquivo, calcular_tempo_ate_proximo_domingo
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    import numpy as np
+
 logger = setup_logger(__name__)
 
-# Carregar configurações de ETL
+# Configurações de ETL, carregadas do YAML no primeiro uso (`configuracao_etl`) e
+# recarregadas quando o arquivo muda (ver `plano_regras`).
+# NumPy, pandas, openpyxl e PyYAML também só são importados quando necessários,
+# para que importar a aplicação (e responder a /health/live) seja rápido.
 CONFIG_PATH = settings.ETL_CONFIG_PATH
-ETL_CONFIG = {}
+ETL_CONFIG: dict | None = None
+
+# Nome do conjunto de regras definido diretamente em `anp` (o par servido em `/precos`)
+CONJUNTO_PADRAO = "padrao"
+
+class RegrasExtracao(NamedTuple):
+    """Regras de extração de um conjunto, resolvidas a partir de `ETL_CONFIG` (com os defaults)."""
+    sheet: str
+    header_row: int
+    est_col: str
+    prod_col: str
+    col_ini: str
+    col_fim: str
+    col_preco: str
+    est_val: str
+    prod_val: str
+
+    @property
+    def colunas_obrigatorias(self) -> set[str]:
+        return {self.est_col, self.prod_col, self.col_ini, self.col_fim, self.col_preco}
+
+class PlanoRegras(NamedTuple):
+    """
+    Regras de ETL compiladas: validadas uma única vez e aplicadas em uma única passada pela aba.
+
+    Attributes:
+        versao (str): Hash das regras compiladas; compõe as chaves dos caches de resultados.
+        sheet (str): Aba lida (comum a todos os conjuntos).
+        header_row (int): Linha do cabeçalho, 0-based (comum a todos os conjuntos).
+        conjuntos (MappingProxyType[str, RegrasExtracao]): Conjuntos nomeados; `CONJUNTO_PADRAO` sempre presente.
+        colunas_obrigatorias (frozenset[str]): Colunas exigidas por algum conjunto.
+    """
+    versao: str
+    sheet: str
+    header_row: int
+    conjuntos: MappingProxyType
+    colunas_obrigatorias: frozenset
 
-try:
-    if CONFIG_PATH.exists():
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            ETL_CONFIG = yaml.safe_load(f)
-        logger.info(f"Configurações de ETL carregadas de {CONFIG_PATH}")
+    @property
+    def padrao(self) -> RegrasExtracao:
+        return self.conjuntos[CONJUNTO_PADRAO]
+
+def _texto(valor, campo: str) -> str:
+    if not isinstance(valor, str) or not valor.strip():
+        raise ValueError(f"'{campo}' deve ser um texto não vazio: {valor!r}")
+    return valor.strip()
+
+def _resolver_conjunto(base: dict, sobrescritas: dict, nome: str) -> RegrasExtracao:
+    """Combina `filters`/`output_columns` de `anp` com as sobrescritas de um conjunto nomeado."""
+    filters = {**base.get("filters", {}), **sobrescritas.get("filters", {})}
+    cols = {**base.get("output_columns", {}), **sobrescritas.get("output_columns", {})}
+    prefixo = f"conjuntos.{nome}." if nome != CONJUNTO_PADRAO else ""
+    return RegrasExtracao(
+        sheet=base["sheet_name"],
+        header_row=base["header_row"],
+        est_col=_texto(filters.get("estado_col", "ESTADOS"), f"{prefixo}filters.estado_col"),
+        prod_col=_texto(filters.get("produto_col", "PRODUTO"), f"{prefixo}filters.produto_col"),
+        col_ini=_texto(cols.get("data_inicial", "DATA INICIAL"), f"{prefixo}output_columns.data_inicial"),
+        col_fim=_texto(cols.get("data_final", "DATA FINAL"), f"{prefixo}output_columns.data_final"),
+        col_preco=_texto(cols.get("preco_medio", "PREÇO MÉDIO REVENDA"), f"{prefixo}output_columns.preco_medio"),
+        est_val=normalizar_chave(_texto(filters.get("estado_val", "DISTRITO FEDERAL"), f"{prefixo}filters.estado_val")),
+        prod_val=normalizar_chave(_texto(filters.get("produto_val", "GASOLINA COMUM"), f"{prefixo}filters.produto_val")),
+    )
+
+def compilar_plano(configuracao: dict) -> PlanoRegras:
+    """
+    Valida as regras de ETL e as compila em um `PlanoRegras`.
+
+    O conjunto `CONJUNTO_PADRAO` vem de `anp.filters`/`anp.output_columns`; cada entrada
+    de `anp.conjuntos` define um conjunto nomeado que herda esses valores e pode
+    sobrescrever `filters` e `output_columns`. Todos os conjuntos usam a mesma aba e
+    linha de cabeçalho, pois são aplicados na mesma passada.
+
+    Args:
+        configuracao (dict): Conteúdo de `etl_rules.yaml`.
+
+    Returns:
+        PlanoRegras: Plano compilado.
+
+    Raises:
+        ValueError: Se as regras forem inválidas.
+    """
+    if not configuracao:
+        raise ValueError("configuração vazia")
+    anp_conf = configuracao.get("anp")
+    if not isinstance(anp_conf, dict):
+        raise ValueError("seção 'anp' ausente")
+
+    # Ajuste: Ignorar as 9 primeiras linhas e definir a linha 10 como cabeçalho
+    header_row = anp_conf.get("header_row", 9)
+    if not isinstance(header_row, int) or isinstance(header_row, bool) or header_row < 0:
+        raise ValueError(f"'header_row' inválido: {header_row}")
+    base = {**anp_conf, "sheet_name": _texto(anp_conf.get("sheet_name", "ESTADOS"), "sheet_name"), "header_row": header_row}
+
+    conjuntos = {CONJUNTO_PADRAO: _resolver_conjunto(base, {}, CONJUNTO_PADRAO)}
+    for nome, sobrescritas in (anp_conf.get("conjuntos") or {}).items():
+        if nome == CONJUNTO_PADRAO or not isinstance(sobrescritas, dict):
+            raise ValueError(f"conjunto '{nome}' inválido")
+        if set(sobrescritas) - {"filters", "output_columns"}:
+            raise ValueError(f"conjunto '{nome}': apenas 'filters' e 'output_columns' podem ser sobrescritos")
+        conjuntos[str(nome)] = _resolver_conjunto(base, sobrescritas, str(nome))
+
+    serializado = json.dumps({nome: regras._asdict() for nome, regras in conjuntos.items()}, sort_keys=True)
+    return PlanoRegras(
+        versao=hashlib.sha256(serializado.encode("utf-8")).hexdigest()[:16],
+        sheet=base["sheet_name"],
+        header_row=header_row,
+        conjuntos=MappingProxyType(conjuntos),
+        colunas_obrigatorias=frozenset().union(*(regras.colunas_obrigatorias for regras in conjuntos.values())),
+    )
+
+# Estado das regras carregadas: (configuração, plano ou None, assinatura do arquivo).
+# Trocado por uma única atribuição: leitores em outras threads veem a versão antiga ou a nova, inteira.
+_REGRAS: tuple[dict, PlanoRegras | None, tuple[int, int] | None] | None = None
+_LOCK_REGRAS = threading.Lock()
+_VERIFICADO_EM = float("-inf")
+
+def _assinatura_config() -> tuple[int, int] | None:
+    try:
+        info = CONFIG_PATH.stat()
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+def _carregar_regras(assinatura: tuple[int, int] | None, anteriores: tuple | None):
+    """Lê e compila `CONFIG_PATH`; regras inválidas numa recarga mantêm as anteriores."""
+    global _REGRAS, ETL_CONFIG
+    configuracao = _carregar_configuracao_etl()
+    try:
+        plano = compilar_plano(configuracao)
+    except ValueError as e:
+        logger.error(f"Schema Error: regras de ETL inválidas em {CONFIG_PATH}: {e}")
+        if anteriores is not None and anteriores[1] is not None:
+            _REGRAS = (anteriores[0], anteriores[1], assinatura)
+            return
+        plano = None
     else:
+        if anteriores is not None and anteriores[1] is not None and anteriores[1].versao != plano.versao:
+            logger.info(f"[ETL] Regras recarregadas (versão {plano.versao}).", status="etl_rules_reloaded")
+    _REGRAS = (configuracao, plano, assinatura)
+    ETL_CONFIG = configuracao
+
+def _regras_atuais() -> tuple[dict, PlanoRegras | None, tuple[int, int] | None]:
+    """
+    Regras carregadas, relendo `etl_rules.yaml` se ele mudou em disco.
+
+    A alteração é verificada (um `stat`) no máximo a cada `ETL_CONFIG_RELOAD_SECONDS`.
+    """
+    global _VERIFICADO_EM
+    regras = _REGRAS
+    if regras is not None:
+        intervalo = settings.ETL_CONFIG_RELOAD_SECONDS
+        agora = time.monotonic()
+        if intervalo <= 0 or agora - _VERIFICADO_EM < intervalo:
+            return regras
+        _VERIFICADO_EM = agora
+        if _assinatura_config() == regras[2]:
+            return regras
+    with _LOCK_REGRAS:
+        if _REGRAS is regras:
+            _carregar_regras(_assinatura_config(), regras)
+        return _REGRAS
+
+def configuracao_etl() -> dict:
+    """
+    Retorna as configurações de ETL, lendo `etl_rules.yaml` na primeira chamada (e quando ele muda).
+
+    Returns:
+        dict: Conteúdo do arquivo, ou vazio se ele estiver ausente ou inválido.
+    """
+    return _regras_atuais()[0]
+
+def plano_regras() -> PlanoRegras | None:
+    """
+    Retorna o plano compilado das regras de ETL, recarregado a quente quando o YAML muda.
+
+    Returns:
+        PlanoRegras | None: Plano atual, ou None se as regras nunca foram válidas.
+    """
+    return _regras_atuais()[1]
+
+def _carregar_configuracao_etl() -> dict:
+    """Lê `CONFIG_PATH` (falhas apenas geram log e resultam em configuração vazia)."""
+    import yaml
+
+    try:
+        if CONFIG_PATH.exists():
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                configuracao = yaml.safe_load(f) or {}
+            logger.info(f"Configurações de ETL carregadas de {CONFIG_PATH}")
+            return configuracao
         logger.warning(f"Arquivo de configuração {CONFIG_PATH} não encontrado. Usando defaults seria arriscado, a extração pode falhar.")
-except Exception as e:
-    logger.error(f"Erro crítico ao carregar configuração ETL: {e}")
+    except Exception as e:
+        logger.error(f"Erro crítico ao carregar configuração ETL: {e}")
+    return {}
+
+class _Extracao(NamedTuple):
+    """Entrada do cache de resultados: o que já foi extraído de uma planilha, preenchido sob demanda."""
+    expira_em: float  # time.monotonic()
+    conjuntos: dict[str, dict | None] | None = None  # `extrair_conjuntos`
+    indice: dict[tuple[str, str], dict] | None = None  # `extrair_indice`
+
+# Cache de resultados extraídos: (nome_arquivo, hash_conteudo, versao_regras) -> `_Extracao`.
+# Uma requisição "quente" vira uma consulta a dicionário; cada planilha é lida uma única vez.
+_CACHE_RESULTADOS: dict[tuple[str, str, str], _Extracao] = {}
+
+def versao_regras() -> str:
+    """
+    Retorna a versão das regras de ETL carregadas.
+
+    Returns:
+        str: Hash curto e determinístico do plano compilado (muda apenas quando as regras mudam,
+            não com comentários ou formatação do YAML).
+    """
+    plano = plano_regras()
+    if plano is None:
+        return hashlib.sha256(b"{}").hexdigest()[:16]
+    return plano.versao
+
+def _chave_resultado(caminho_arquivo: str | Path) -> tuple[str, str, str] | None:
+    """Monta a chave do cache de resultados, ou None se a planilha não puder ser identificada."""
+    hash_conteudo = calcular_hash_arquivo(caminho_arquivo)
+    if not hash_conteudo:
+        return None
+    return Path(caminho_arquivo).name, hash_conteudo, versao_regras()
+
+def limpar_cache_resultados():
+    """Descarta todos os resultados e índices extraídos mantidos em memória."""
+    _CACHE_RESULTADOS.clear()
+
+def _consultar_cache(chave: tuple[str, str, str] | None, campo: str, rotulo: str):
+    """Valor de `campo` ("conjuntos" ou "indice") em cache para a planilha, ou None (métrica `rotulo`)."""
+    entrada = _CACHE_RESULTADOS.get(chave) if chave else None
+    valor = getattr(entrada, campo) if entrada and entrada.expira_em > time.monotonic() else None
+    registrar_cache(rotulo, valor is not None)
+    return valor
 
-def extrair_dados(caminho_arquivo: str | Path):
+def _guardar_no_cache(chave: tuple[str, str, str], **campos):
+    """Guarda o que foi extraído da planilha, com TTL até o próximo domingo (o mesmo da planilha no Redis)."""
+    agora = time.monotonic()
+    # Remove entradas expiradas ou de outra versão das regras antes de inserir a nova
+    for chave_antiga in [k for k, entrada in _CACHE_RESULTADOS.items() if entrada.expira_em <= agora or k[2] != chave[2]]:
+        del _CACHE_RESULTADOS[chave_antiga]
+    entrada = _CACHE_RESULTADOS.get(chave) or _Extracao(expira_em=agora + calcular_tempo_ate_proximo_domingo())
+    _CACHE_RESULTADOS[chave] = entrada._replace(**campos)
+
+def extrair_dados(caminho_arquivo: str | Path, conjunto: str = CONJUNTO_PADRAO):
     """
-    Processa o arquivo Excel da ANP para extrair o preço médio da gasolina no Distrito Federal.
+    Retorna os dados extraídos da planilha para um conjunto de regras, consultando antes o cache de resultados.
 
-    Utiliza as configurações definidas em `etl_rules.yaml` para validar o schema da planilha
-    (abas, colunas, linha de cabeçalho) e aplicar filtros.
+    A chave do cache combina o nome do arquivo, o hash do seu conteúdo e a versão das
+    regras de ETL; o TTL acompanha o do cache da planilha (até o próximo domingo).
+    Apenas extrações bem-sucedidas são cacheadas.
 
     Args:
         caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+        conjunto (str): Nome do conjunto de regras (`anp.conjuntos`); por padrão, o par de `anp.filters`.
 
     Returns:
         dict | None: Dicionário contendo 'dataInicial', 'dataFinal' e 'precoMedioRevenda'
                      se a extração for bem-sucedida; caso contrário, retorna None.
     """
-    if not ETL_CONFIG:
+    resultados = extrair_conjuntos(caminho_arquivo)
+    resultado = (resultados or {}).get(conjunto)
+    return dict(resultado) if resultado else None
+
+def extrair_conjuntos(caminho_arquivo: str | Path) -> dict[str, dict | None] | None:
+    """
+    Extrai os dados de todos os conjuntos de regras em uma única passada pela aba (com cache).
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+
+    Returns:
+        dict[str, dict | None] | None: Nome do conjunto -> dados (None se não encontrados),
+            ou None se a planilha não pôde ser processada.
+    """
+    chave = _chave_resultado(caminho_arquivo)
+    em_cache = _consultar_cache(chave, "conjuntos", "resultados")
+    if em_cache is not None:
+        logger.info(f"[Cache] Resultado já extraído para {chave[0]}", status="result_cache_hit")
+        return dict(em_cache)
+
+    resultados = _extrair_dados_planilha(caminho_arquivo)
+
+    if resultados and any(resultados.values()) and chave:
+        _guardar_no_cache(chave, conjuntos=dict(resultados))
+
+    return resultados
+
+def _resolver_regras() -> RegrasExtracao | None:
+    """Regras do conjunto padrão do plano compilado; retorna None (com log) se forem inválidas."""
+    plano = plano_regras()
+    if plano is None:
         logger.error("Configuração ETL inválida ou não carregada.")
         return None
+    return plano.padrao
 
-    anp_conf = ETL_CONFIG.get("anp", {})
+def _converter_preco(preco_raw) -> float | None:
+    """Converte o preço para float (aceitando vírgula decimal, padrão PT-BR); None se inválido."""
+    try:
+        if isinstance(preco_raw, str):
+            preco_raw = preco_raw.replace(',', '.')
+        preco_float = float(preco_raw)
+    except (ValueError, TypeError):
+        return None
+    return None if math.isnan(preco_float) else preco_float
 
+def _formatar_resultado(data_inicial, data_final, preco_raw) -> dict | None:
+    """
+    Valida o preço (aceitando vírgula decimal, padrão PT-BR) e monta o dicionário de saída.
+
+    Regra comum a todos os caminhos (motores e índice): a primeira linha do par com preço
+    válido vale; linhas com preço inválido são ignoradas (retorno None).
+    """
+    preco_float = _converter_preco(preco_raw)
+    if preco_float is None:
+        logger.error(f"Data Integrity: Valor inválido para preço médio: {preco_raw}")
+        return None
+
+    return {
+        "dataInicial": data_inicial,
+        "dataFinal": data_final,
+        "precoMedioRevenda": preco_float
+    }
+
+def _extrair_dados_planilha(caminho_arquivo: str | Path, motor: str | None = None) -> dict[str, dict | None] | None:
+    """
+    Processa o arquivo Excel da ANP, aplicando todos os conjuntos do plano de regras em uma única passada.
+
+    Utiliza o plano compilado de `etl_rules.yaml` (`plano_regras`) para validar o schema da
+    planilha (abas, colunas, linha de cabeçalho) e aplicar os filtros de cada conjunto.
+
+    Se a planilha já foi ingerida (`ingerir_planilha`), os dados vêm da cópia colunar
+    memory-mapped e o .xlsx não é aberto. Caso contrário, usa o motor configurado em
+    `settings.EXTRACTION_ENGINE`: o "streaming" lê a aba linha a linha e para assim que
+    todos os conjuntos forem encontrados; se ele falhar por um formato inesperado, a
+    extração é refeita pelo motor "pandas".
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+        motor (str | None): "streaming" ou "pandas"; por padrão, `settings.EXTRACTION_ENGINE`.
+
+    Returns:
+        dict[str, dict | None] | None: Nome do conjunto -> dicionário com 'dataInicial',
+            'dataFinal' e 'precoMedioRevenda' (None se não encontrado), ou None se a
+            planilha não puder ser processada.
+    """
+    plano = plano_regras()
+    if plano is None:
+        logger.error("Configuração ETL inválida ou não carregada.")
+        return None
+
+    if settings.COLUMNAR_ENABLED:
+        hash_conteudo = calcular_hash_arquivo(caminho_arquivo)
+        if hash_conteudo:
+            tabela = carregar_tabela(Path(caminho_arquivo), hash_conteudo, plano.sheet, plano.header_row)
+            if tabela is not None:
+                return _conjuntos_colunar(tabela, plano)
+
+    motor = motor or settings.EXTRACTION_ENGINE
+    if motor == "streaming":
+        try:
+            return _conjuntos_streaming(caminho_arquivo, plano)
+        except Exception as e:
+            logger.warning(f"[Extractor] Falha no motor streaming ({e}). Usando o motor pandas.")
+    return _conjuntos_pandas(caminho_arquivo, plano)
+
+def _avisar_nao_encontrados(resultados: dict[str, dict | None], plano: PlanoRegras):
+    for nome, resultado in resultados.items():
+        if resultado is None:
+            regras = plano.conjuntos[nome]
+            logger.warning(f"Data Integrity: Nenhum dado encontrado para {regras.prod_val} no {regras.est_val}.")
+
+def ingerir_planilha(caminho_arquivo: str | Path) -> Path | None:
+    """
+    Etapa de ingestão: converte a aba configurada para o formato colunar (NumPy).
+
+    A conversão acontece uma única vez por conteúdo de planilha; chamadas seguintes
+    apenas confirmam que a cópia colunar existe e está atualizada. As linhas da aba
+    também são acrescentadas à série histórica (`historico`), uma vez por conteúdo,
+    independentemente da cópia colunar (`COLUMNAR_ENABLED` desligado ou falha na conversão).
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+
+    Returns:
+        Path | None: Diretório da cópia colunar, ou None se ela estiver desabilitada ou a
+                     conversão não foi possível.
+    """
+    regras = _resolver_regras()
+    hash_conteudo = calcular_hash_arquivo(caminho_arquivo)
+    if regras is None or hash_conteudo is None:
+        return None
+    destino = None
+    if settings.COLUMNAR_ENABLED:
+        try:
+            destino = converter_planilha(Path(caminho_arquivo), hash_conteudo, regras.sheet, regras.header_row)
+        except Exception as e:
+            logger.error(f"[Colunar] Falha ao converter {caminho_arquivo}: {e}")
+
+    _registrar_historico(Path(caminho_arquivo), hash_conteudo, regras, colunar=destino is not None)
+    return destino
+
+def _registrar_historico(caminho_arquivo: Path, hash_conteudo: str, regras: RegrasExtracao, colunar: bool):
+    """
+    Acrescenta as linhas da planilha ingerida à série histórica (falhas apenas geram log).
+
+    Lê a cópia colunar quando ela existe; caso contrário, a aba é lida uma vez com o openpyxl.
+    """
     try:
-        excel_data = pd.ExcelFile(caminho_arquivo, engine="openpyxl")
-        sheet = anp_conf.get("sheet_name", "ESTADOS")
+        if historico.semana_registrada(hash_conteudo):
+            return
+        tabela = carregar_tabela(caminho_arquivo, hash_conteudo, regras.sheet, regras.header_row) if colunar else None
+        tabela = tabela or _ler_tabela_em_memoria(caminho_arquivo, regras)
+        if tabela is None or regras.colunas_obrigatorias - set(tabela.colunas):
+            return
+        historico.registrar_semana(linhas_historico(tabela, regras), hash_conteudo, caminho_arquivo.name)
+    except Exception as e:
+        logger.error(f"[Histórico] Falha ao registrar {caminho_arquivo.name}: {e}")
+
+def normalizar_chave(texto) -> str:
+    """Normaliza estado/produto para as chaves do índice e do histórico (maiúsculas, sem espaços nas bordas)."""
+    return str(texto).strip().upper()
+
+def _normalizar_coluna(valores: "np.ndarray") -> "np.ndarray":
+    """`normalizar_chave` aplicado a uma coluna inteira (vetorizado)."""
+    import numpy as np
+
+    return np.char.upper(np.char.strip(valores.astype(str)))
 
-        if sheet not in excel_data.sheet_names:
-            logger.error(f"Schema Error: A aba '{sheet}' não foi encontrada na planilha. Abas disponíveis: {excel_data.sheet_names}")
+def _linhas_normalizadas(tabela: TabelaColunar, regras: RegrasExtracao):
+    """
+    Percorre a aba com estado e produto normalizados e o preço já convertido.
+
+    Linhas sem estado ou produto são ignoradas; preços inválidos viram None.
+
+    Yields:
+        tuple: (estado, produto, data_inicial, data_final, preco_medio).
+    """
+    estados = _normalizar_coluna(tabela.colunas[regras.est_col])
+    produtos = _normalizar_coluna(tabela.colunas[regras.prod_col])
+    iniciais, finais, precos = tabela.colunas[regras.col_ini], tabela.colunas[regras.col_fim], tabela.colunas[regras.col_preco]
+    for i in range(tabela.linhas):
+        if not estados[i] or not produtos[i]:
+            continue
+        yield (
+            str(estados[i]),
+            str(produtos[i]),
+            valor_python(iniciais[i]),
+            valor_python(finais[i]),
+            _converter_preco(valor_python(precos[i])),
+        )
+
+def linhas_historico(tabela: TabelaColunar, regras: RegrasExtracao):
+    """
+    Gera as linhas da aba no formato da série histórica.
+
+    Estado e produto são normalizados (`normalizar_chave`); linhas sem data inicial
+    são ignoradas e preços inválidos viram None.
+
+    Args:
+        tabela (TabelaColunar): Aba convertida por `ingerir_planilha`.
+        regras (RegrasExtracao): Regras de extração resolvidas.
+
+    Yields:
+        dict: Linha com `estado`, `produto`, `data_inicial`, `data_final` e `preco_medio`.
+    """
+    for estado, produto, data_inicial, data_final, preco in _linhas_normalizadas(tabela, regras):
+        if not hasattr(data_inicial, "date"):
+            continue
+        yield {
+            "estado": estado,
+            "produto": produto,
+            "data_inicial": data_inicial.date(),
+            "data_final": data_final.date() if hasattr(data_final, "date") else None,
+            "preco_medio": preco,
+        }
+
+def construir_indice(tabela: TabelaColunar, regras: RegrasExtracao) -> dict[tuple[str, str], dict]:
+    """
+    Monta o índice (estado, produto) -> dados de todos os estados e produtos da aba.
+
+    As chaves são normalizadas com `normalizar_chave` e vale a primeira linha de cada par
+    com preço válido: as mesmas regras dos motores de extração (`_formatar_resultado`).
+
+    Args:
+        tabela (TabelaColunar): Aba convertida (ou lida em memória).
+        regras (RegrasExtracao): Regras de extração resolvidas.
+
+    Returns:
+        dict[tuple[str, str], dict]: Chave -> {'dataInicial', 'dataFinal', 'precoMedioRevenda'}.
+    """
+    indice: dict[tuple[str, str], dict] = {}
+    for estado, produto, data_inicial, data_final, preco in _linhas_normalizadas(tabela, regras):
+        if preco is not None:
+            indice.setdefault((estado, produto), {"dataInicial": data_inicial, "dataFinal": data_final, "precoMedioRevenda": preco})
+    return indice
+
+def _ler_tabela_em_memoria(caminho_arquivo: str | Path, regras: RegrasExtracao) -> TabelaColunar | None:
+    """Lê a aba configurada (openpyxl read-only) para colunas em memória, sem gravar a cópia colunar."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(caminho_arquivo, read_only=True, data_only=True)
+    try:
+        if regras.sheet not in workbook.sheetnames:
+            logger.error(f"Schema Error: A aba '{regras.sheet}' não foi encontrada na planilha. Abas disponíveis: {workbook.sheetnames}")
             return None
+        linhas = workbook[regras.sheet].iter_rows(min_row=regras.header_row + 1, values_only=True)
+        colunas = converter_linhas(next(linhas, ()), linhas)
+    finally:
+        workbook.close()
+    return TabelaColunar(colunas=colunas, schema={"linhas": len(next(iter(colunas.values()), []))})
 
-        # Ajuste: Ignorar as 9 primeiras linhas e definir a linha 10 como cabeçalho
-        header_row = anp_conf.get("header_row", 9)
+def abrir_tabela(caminho_arquivo: str | Path) -> tuple[TabelaColunar, RegrasExtracao] | None:
+    """
+    Abre a aba configurada da planilha com as regras de extração vigentes.
 
-        # Validação básica do header_row
-        if not isinstance(header_row, int) or header_row < 0:
-             logger.error(f"Schema Error: 'header_row' inválido: {header_row}")
-             return None
+    Usa a cópia colunar (memory-mapped) quando a planilha já foi ingerida; caso
+    contrário, lê a aba uma vez com o openpyxl.
 
-        df_estados = excel_data.parse(sheet, skiprows=header_row)
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
 
-        # Ajuste para garantir que os nomes das colunas estejam corretos
-        df_estados.rename(columns=lambda x: str(x).strip(), inplace=True)
+    Returns:
+        tuple | None: (tabela, regras), ou None se a aba não puder ser lida ou não tiver as colunas obrigatórias.
+    """
+    regras = _resolver_regras()
+    if regras is None:
+        return None
+
+    chave = _chave_resultado(caminho_arquivo)
+    tabela = None
+    if settings.COLUMNAR_ENABLED and chave:
+        tabela = carregar_tabela(Path(caminho_arquivo), chave[1], regras.sheet, regras.header_row)
+    try:
+        tabela = tabela or _ler_tabela_em_memoria(caminho_arquivo, regras)
+    except Exception as e:
+        logger.error(f"Erro ao processar o arquivo: {e}")
+        return None
+    if tabela is None:
+        return None
 
-        # Configurações de colunas
-        filters = anp_conf.get("filters", {})
-        est_col = filters.get("estado_col", "ESTADOS")
-        prod_col = filters.get("produto_col", "PRODUTO")
+    missing_cols = regras.colunas_obrigatorias - set(tabela.colunas)
+    if missing_cols:
+        logger.error(f"Schema Error: Colunas obrigatórias ausentes na planilha: {missing_cols}")
+        return None
+    return tabela, regras
 
-        cols = anp_conf.get("output_columns", {})
-        col_ini = cols.get("data_inicial", "DATA INICIAL")
-        col_fim = cols.get("data_final", "DATA FINAL")
-        col_preco = cols.get("preco_medio", "PREÇO MÉDIO REVENDA")
+def extrair_indice(caminho_arquivo: str | Path) -> dict[tuple[str, str], dict] | None:
+    """
+    Retorna o índice (estado, produto) da planilha, construído uma única vez por conteúdo.
 
-        # Validação de Schema: Verificar se colunas existem
-        required_cols = {est_col, prod_col, col_ini, col_fim, col_preco}
-        missing_cols = required_cols - set(df_estados.columns)
+    Usa a cópia colunar quando a planilha já foi ingerida; caso contrário, lê a aba
+    uma vez com o openpyxl (`abrir_tabela`). O índice fica no cache de resultados, ao lado
+    dos conjuntos extraídos da mesma planilha (mesma chave e TTL).
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+
+    Returns:
+        dict | None: Índice de `construir_indice`, ou None se a aba não puder ser lida.
+    """
+    chave = _chave_resultado(caminho_arquivo)
+    em_cache = _consultar_cache(chave, "indice", "indice")
+    if em_cache is not None:
+        return em_cache
+
+    aberta = abrir_tabela(caminho_arquivo)
+    if aberta is None:
+        return None
+
+    indice = construir_indice(*aberta)
+    logger.info(f"[Índice] {len(indice)} pares (estado, produto) indexados.", status="index_built")
+    if chave:
+        _guardar_no_cache(chave, indice=indice)
+    return indice
+
+def chave_padrao() -> tuple[str, str] | None:
+    """Chave do índice para o par configurado em `etl_rules.yaml` (servido em `/precos`)."""
+    regras = _resolver_regras()
+    if regras is None:
+        return None
+    return normalizar_chave(regras.est_val), normalizar_chave(regras.prod_val)
+
+def _conjuntos_colunar(tabela: TabelaColunar, plano: PlanoRegras) -> dict[str, dict | None] | None:
+    """Aplica todos os conjuntos do plano à cópia colunar (cada coluna de filtro é normalizada uma vez)."""
+    missing_cols = plano.colunas_obrigatorias - set(tabela.colunas)
+    if missing_cols:
+        logger.error(f"Schema Error: Colunas obrigatórias ausentes na planilha: {missing_cols}")
+        return None
+
+    import numpy as np
+
+    normalizadas: dict[str, "np.ndarray"] = {}
+
+    def normalizada(coluna: str):
+        if coluna not in normalizadas:
+            normalizadas[coluna] = _normalizar_coluna(tabela.colunas[coluna])
+        return normalizadas[coluna]
+
+    resultados: dict[str, dict | None] = {}
+    for nome, regras in plano.conjuntos.items():
+        indices = np.flatnonzero((normalizada(regras.est_col) == regras.est_val) & (normalizada(regras.prod_col) == regras.prod_val))
+        resultado = None
+        for i in indices:
+            resultado = _formatar_resultado(
+                valor_python(tabela.colunas[regras.col_ini][i]),
+                valor_python(tabela.colunas[regras.col_fim][i]),
+                valor_python(tabela.colunas[regras.col_preco][i]),
+            )
+            if resultado is not None:
+                break
+        resultados[nome] = resultado
+    _avisar_nao_encontrados(resultados, plano)
+    return resultados
+
+def _plano_unico(regras: RegrasExtracao) -> PlanoRegras:
+    """Plano com um único conjunto (as funções `extrair_dados_*` de um só par)."""
+    return PlanoRegras(
+        versao="",
+        sheet=regras.sheet,
+        header_row=regras.header_row,
+        conjuntos=MappingProxyType({CONJUNTO_PADRAO: regras}),
+        colunas_obrigatorias=frozenset(regras.colunas_obrigatorias),
+    )
+
+def _apenas_padrao(resultados: dict[str, dict | None] | None) -> dict | None:
+    return resultados.get(CONJUNTO_PADRAO) if resultados else None
+
+def extrair_dados_colunar(tabela: TabelaColunar, regras: RegrasExtracao):
+    """
+    Extrai os dados a partir da cópia colunar, com filtros vetorizados (NumPy).
+
+    Args:
+        tabela (TabelaColunar): Aba convertida por `ingerir_planilha`.
+        regras (RegrasExtracao): Regras de extração resolvidas.
+
+    Returns:
+        dict | None: Mesmo retorno de `extrair_dados_pandas`.
+    """
+    return _apenas_padrao(_conjuntos_colunar(tabela, _plano_unico(regras)))
+
+def _conjuntos_streaming(caminho_arquivo: str | Path, plano: PlanoRegras) -> dict[str, dict | None] | None:
+    """
+    Lê a aba em modo read-only uma única vez, parando quando todos os conjuntos forem encontrados.
+
+    Raises:
+        Exception: Erros de leitura do arquivo são propagados para o fallback do chamador.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(caminho_arquivo, read_only=True, data_only=True)
+    try:
+        if plano.sheet not in workbook.sheetnames:
+            logger.error(f"Schema Error: A aba '{plano.sheet}' não foi encontrada na planilha. Abas disponíveis: {workbook.sheetnames}")
+            return None
+
+        linhas = workbook[plano.sheet].iter_rows(min_row=plano.header_row + 1, values_only=True)
+        cabecalho = next(linhas, ())
+
+        # Posição de cada coluna (primeira ocorrência), com nomes normalizados como no pandas
+        posicoes: dict[str, int] = {}
+        for indice, nome in enumerate(cabecalho):
+            posicoes.setdefault(str(nome).strip(), indice)
+
+        missing_cols = plano.colunas_obrigatorias - set(posicoes)
         if missing_cols:
             logger.error(f"Schema Error: Colunas obrigatórias ausentes na planilha: {missing_cols}")
             return None
 
-        est_val = filters.get("estado_val", "DISTRITO FEDERAL")
-        prod_val = filters.get("produto_val", "GASOLINA COMUM")
+        # Conjunto -> (valores esperados e posições das colunas), resolvidos uma única vez
+        pendentes = {
+            nome: (
+                regras.est_val, regras.prod_val,
+                posicoes[regras.est_col], posicoes[regras.prod_col],
+                posicoes[regras.col_ini], posicoes[regras.col_fim], posicoes[regras.col_preco],
+            )
+            for nome, regras in plano.conjuntos.items()
+        }
+        largura_minima = max(max(alvo[2:]) for alvo in pendentes.values()) + 1
+        resultados: dict[str, dict | None] = dict.fromkeys(plano.conjuntos)
+
+        for linha in linhas:
+            if len(linha) < largura_minima:
+                continue
+            for nome, (est_val, prod_val, i_est, i_prod, i_ini, i_fim, i_preco) in list(pendentes.items()):
+                if normalizar_chave(linha[i_est]) == est_val and normalizar_chave(linha[i_prod]) == prod_val:
+                    resultado = _formatar_resultado(linha[i_ini], linha[i_fim], linha[i_preco])
+                    if resultado is not None:
+                        resultados[nome] = resultado
+                        del pendentes[nome]
+            if not pendentes:
+                break
+    finally:
+        workbook.close()
+
+    _avisar_nao_encontrados(resultados, plano)
+    return resultados
 
-        df_filtrado = df_estados[
-            (df_estados[est_col].astype(str).str.upper() == est_val) &
-            (df_estados[prod_col].astype(str).str.upper() == prod_val)
-        ]
+def extrair_dados_streaming(caminho_arquivo: str | Path):
+    """
+    Motor de extração em streaming: lê a aba em modo read-only e para no primeiro match.
+
+    As posições das colunas são resolvidas uma única vez a partir do cabeçalho
+    (`header_row`); as linhas seguintes são percorridas sob demanda.
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+
+    Returns:
+        dict | None: Mesmo retorno de `extrair_dados_pandas`.
 
-        if df_filtrado.empty:
-            logger.warning(f"Data Integrity: Nenhum dado encontrado para {prod_val} no {est_val}.")
+    Raises:
+        Exception: Erros de leitura do arquivo são propagados para o fallback do chamador.
+    """
+    regras = _resolver_regras()
+    if regras is None:
+        return None
+    return _apenas_padrao(_conjuntos_streaming(caminho_arquivo, _plano_unico(regras)))
+
+def _conjuntos_pandas(caminho_arquivo: str | Path, plano: PlanoRegras) -> dict[str, dict | None] | None:
+    """Carrega a aba inteira em um DataFrame uma única vez e aplica os filtros de cada conjunto."""
+    import pandas as pd
+
+    try:
+        excel_data = pd.ExcelFile(caminho_arquivo, engine="openpyxl")
+
+        if plano.sheet not in excel_data.sheet_names:
+            logger.error(f"Schema Error: A aba '{plano.sheet}' não foi encontrada na planilha. Abas disponíveis: {excel_data.sheet_names}")
             return None
 
-        # Extração e validação de tipos
-        row = df_filtrado.iloc[0]
+        df_estados = excel_data.parse(plano.sheet, skiprows=plano.header_row)
 
-        try:
-            # Tentar converter preço para float, tratando vírgula se necessário (padrão PT-BR)
-            preco_raw = row[col_preco]
-            if isinstance(preco_raw, str):
-                preco_raw = preco_raw.replace(',', '.')
-            preco_float = float(preco_raw)
-        except (ValueError, TypeError):
-            logger.error(f"Data Integrity: Valor inválido para preço médio: {row[col_preco]}")
+        # Ajuste para garantir que os nomes das colunas estejam corretos
+        df_estados.rename(columns=lambda x: str(x).strip(), inplace=True)
+
+        # Validação de Schema: Verificar se colunas existem
+        missing_cols = plano.colunas_obrigatorias - set(df_estados.columns)
+        if missing_cols:
+            logger.error(f"Schema Error: Colunas obrigatórias ausentes na planilha: {missing_cols}")
             return None
 
-        dados_formatados = {
-            "dataInicial": row[col_ini],
-            "dataFinal": row[col_fim],
-            "precoMedioRevenda": preco_float
-        }
+        normalizadas = {}
+        resultados: dict[str, dict | None] = {}
+        for nome, regras in plano.conjuntos.items():
+            for coluna in (regras.est_col, regras.prod_col):
+                if coluna not in normalizadas:
+                    normalizadas[coluna] = df_estados[coluna].astype(str).str.strip().str.upper()
+            df_filtrado = df_estados[(normalizadas[regras.est_col] == regras.est_val) & (normalizadas[regras.prod_col] == regras.prod_val)]
 
-        return dados_formatados
+            # Extração e validação de tipos: vale a primeira linha com preço válido
+            resultados[nome] = None
+            for _, row in df_filtrado.iterrows():
+                resultados[nome] = _formatar_resultado(row[regras.col_ini], row[regras.col_fim], row[regras.col_preco])
+                if resultados[nome] is not None:
+                    break
 
     except Exception as e:
         logger.error(f"Erro ao processar o arquivo: {e}")
-    return None
+        return None
+
+    _avisar_nao_encontrados(resultados, plano)
+    return resultados
+
+def extrair_dados_pandas(caminho_arquivo: str | Path):
+    """
+    Motor de extração via pandas: carrega a aba inteira em um DataFrame e filtra.
+
+    Args:
+        caminho_arquivo (str | Path): Caminho local para o arquivo .xlsx baixado.
+
+    Returns:
+        dict | None: Dicionário contendo 'dataInicial', 'dataFinal' e 'precoMedioRevenda'
+                     se a extração for bem-sucedida; caso contrário, retorna None.
+    """
+    regras = _resolver_regras()
+    if regras is None:
+        return None
+    return _apenas_padrao(_conjuntos_pandas(caminho_arquivo, _plano_unico(regras)))
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from app.services import downloader
+from app.services.coalescer import Coalescedor
+from app.services.logger import setup_logger
+from app.services.redis_client import cliente_redis
+from app.core.config import settings
+
+logger = setup_logger(__name__)
+
+class VerificadorProntidao:
+    """
+    Verificações de prontidão (readiness) das dependências, com cache.
+
+    As verificações rodam de forma concorrente e assíncrona, cada uma com seu timeout.
+    O resultado fica em cache por `settings.HEALTH_CACHE_SECONDS`, e sondas simultâneas
+    compartilham a mesma execução, de modo que a frequência das sondas não vira tráfego
+    para a ANP ou para o Redis.
+    """
+
+    def __init__(self):
+        self._cache: tuple[float, bool, dict[str, str]] | None = None
+        self._coalescedor = Coalescedor("health")
+
+    def limpar(self):
+        """Descarta o resultado em cache (útil em testes)."""
+        self._cache = None
+
+    async def verificar(self) -> tuple[bool, dict[str, str]]:
+        """
+        Retorna o estado das dependências, a partir do cache quando ainda válido.
+
+        Returns:
+            tuple[bool, dict[str, str]]: (pronto, mensagem de cada verificação).
+        """
+        if self._cache is not None and self._cache[0] > time.monotonic():
+            return self._cache[1], self._cache[2]
+        return await self._coalescedor.executar("ready", self._executar_verificacoes)
+
+    async def _executar_verificacoes(self) -> tuple[bool, dict[str, str]]:
+        """Executa todas as verificações em paralelo e atualiza o cache."""
+        verificacoes = {"anp_connection": verificar_anp(), "redis_connection": verificar_redis()}
+        timeout = settings.HEALTH_CHECK_TIMEOUT_SECONDS
+        resultados = await asyncio.gather(
+            *(asyncio.wait_for(verificacao, timeout) for verificacao in verificacoes.values()),
+            return_exceptions=True,
+        )
+
+        pronto = True
+        checks: dict[str, str] = {}
+        for nome, resultado in zip(verificacoes, resultados):
+            if isinstance(resultado, Exception):
+                mensagem = "timeout" if isinstance(resultado, asyncio.TimeoutError) else resultado
+                checks[nome] = f"FAIL: {mensagem}"
+                pronto = False
+                logger.error(f"Verificação {nome}: FALHA - {mensagem}", check=nome)
+            else:
+                checks[nome] = resultado
+        checks["api_service"] = "OK"
+
+        self._cache = (time.monotonic() + settings.HEALTH_CACHE_SECONDS, pronto, checks)
+        return pronto, checks
+
+    async def verificar_legado(self) -> tuple[bool, dict[str, str]]:
+        """
+        Resultado no formato do `/health` original, a partir das mesmas verificações (e do mesmo cache).
+
+        Mantém a chave `internet_connection` (agora a conectividade com a ANP) e trata o Redis
+        indisponível como aviso, sem derrubar o status: só a falha de conectividade resulta em DOWN.
+
+        Returns:
+            tuple[bool, dict[str, str]]: (saudável, mensagem de cada verificação).
+        """
+        _, checks = await self.verificar()
+        redis_status = checks["redis_connection"]
+        if redis_status.startswith("FAIL"):
+            redis_status = f"WARNING: Redis unavailable ({redis_status.removeprefix('FAIL: ')})"
+        legado = {
+            "internet_connection": checks["anp_connection"],
+            "redis_connection": redis_status,
+            "api_service": checks["api_service"],
+        }
+        return not legado["internet_connection"].startswith("FAIL"), legado
+
+async def verificar_anp() -> str:
+    """
+    Verifica se a página de busca da ANP (`SEARCH_URL`) responde, usando o cliente HTTP compartilhado.
+
+    Raises:
+        httpx.HTTPError: Se a ANP estiver inacessível ou responder com erro 5xx.
+    """
+    response = await downloader.obter_cliente_http().head(downloader.SEARCH_URL)
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return "OK"
+
+async def verificar_redis() -> str:
+    """
+    Verifica a conexão com o Redis (assíncrona, pelo pool compartilhado).
+
+    Raises:
+        redis.exceptions.ConnectionError: Se o Redis não responder.
+    """
+    if not cliente_redis.habilitado:
+        logger.warning("Verificação de conexão com Redis: Redis desabilitado (REDIS_ENABLED=false).", check="redis")
+        return "WARNING: Redis disabled (caching limited to local disk)"
+    await cliente_redis.ping()
+    return "OK"
+
+verificador = VerificadorProntidao()
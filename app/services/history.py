@@ -0,0 +1,226 @@
+import base64
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Iterable
+from app.services.logger import setup_logger
+from app.core.config import settings
+
+logger = setup_logger(__name__)
+
+# Tabela "clusterizada" (WITHOUT ROWID) pela chave (estado, produto, data_inicial):
+# uma consulta por intervalo é uma busca binária na B-tree seguida de leitura sequencial.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS precos_semanais (
+    estado TEXT NOT NULL,
+    produto TEXT NOT NULL,
+    data_inicial TEXT NOT NULL,
+    data_final TEXT,
+    preco_medio REAL,
+    origem_sha256 TEXT NOT NULL,
+    PRIMARY KEY (estado, produto, data_inicial)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_precos_semanais_data ON precos_semanais (data_inicial, estado, produto);
+CREATE TABLE IF NOT EXISTS semanas_ingeridas (
+    origem_sha256 TEXT PRIMARY KEY,
+    nome_arquivo TEXT NOT NULL,
+    linhas INTEGER NOT NULL,
+    ingerido_em TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+def data_hora_iso(valor: date | str | None) -> str | None:
+    """
+    Data no formato ISO de data e hora usado por toda a API (ex: "2025-12-07T00:00:00").
+
+    É o formato de `/precos` e `/precos/batch` (datas da planilha como `datetime`); as
+    datas da série histórica, gravadas como "2025-12-07", são convertidas para ele.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if not isinstance(valor, datetime):
+        valor = datetime.combine(valor, time())
+    return valor.isoformat()
+
+def codificar_cursor(item: dict) -> str:
+    """Cursor opaco (base64 URL-safe) da chave (data_inicial, estado, produto) de um item de `consultar`."""
+    # A chave usa a data como gravada no banco ("2025-12-07"), sem o horário da resposta
+    data_inicial = datetime.fromisoformat(item["dataInicial"]).date().isoformat()
+    chave = json.dumps([data_inicial, item["estado"], item["produto"]], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(chave.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+def decodificar_cursor(cursor: str) -> tuple[str, str, str] | None:
+    """Chave (data_inicial, estado, produto) de um cursor de `codificar_cursor`, ou None se ele for inválido."""
+    try:
+        chave = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(chave, list) or len(chave) != 3 or not all(isinstance(valor, str) for valor in chave):
+        return None
+    return tuple(chave)
+
+class HistoricoPrecos:
+    """
+    Armazenamento persistente (SQLite) da série histórica semanal de preços.
+
+    Cada planilha ingerida acrescenta suas linhas da aba ESTADOS; a reingestão de uma
+    planilha já registrada (mesmo SHA-256) é ignorada. Cada thread usa sua própria
+    conexão; o banco opera em modo WAL para que leituras não bloqueiem a escrita.
+    """
+
+    def __init__(self, caminho: Path):
+        self._caminho = Path(caminho)
+        self._local = threading.local()
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, criando o banco e o schema se necessário."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            self._caminho.parent.mkdir(parents=True, exist_ok=True)
+            conexao = sqlite3.connect(self._caminho)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(_SCHEMA)
+            self._local.conexao = conexao
+        return conexao
+
+    def fechar(self):
+        """Fecha a conexão da thread atual."""
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
+
+    def semana_registrada(self, origem_sha256: str) -> bool:
+        """Indica se a planilha com este SHA-256 já foi registrada no histórico."""
+        cursor = self._conexao().execute("SELECT 1 FROM semanas_ingeridas WHERE origem_sha256 = ?", (origem_sha256,))
+        return cursor.fetchone() is not None
+
+    def registrar_semana(self, linhas: Iterable[dict], origem_sha256: str, nome_arquivo: str) -> int:
+        """
+        Acrescenta as linhas de uma planilha ao histórico (uma única vez por conteúdo).
+
+        Args:
+            linhas (Iterable[dict]): Linhas com `estado`, `produto`, `data_inicial`
+                (date), `data_final` (date | None) e `preco_medio` (float | None).
+            origem_sha256 (str): SHA-256 da planilha de origem.
+            nome_arquivo (str): Nome do arquivo de origem (para diagnóstico).
+
+        Returns:
+            int: Número de linhas gravadas (0 se a planilha já estava registrada).
+        """
+        if self.semana_registrada(origem_sha256):
+            return 0
+
+        registros = [
+            (
+                linha["estado"],
+                linha["produto"],
+                linha["data_inicial"].isoformat(),
+                linha["data_final"].isoformat() if linha.get("data_final") else None,
+                linha.get("preco_medio"),
+                origem_sha256,
+            )
+            for linha in linhas
+        ]
+        conexao = self._conexao()
+        with conexao:
+            conexao.executemany("INSERT OR REPLACE INTO precos_semanais VALUES (?, ?, ?, ?, ?, ?)", registros)
+            conexao.execute(
+                "INSERT INTO semanas_ingeridas (origem_sha256, nome_arquivo, linhas) VALUES (?, ?, ?)",
+                (origem_sha256, nome_arquivo, len(registros)),
+            )
+        logger.info(f"[Histórico] {len(registros)} linhas de {nome_arquivo} registradas.", status="history_appended")
+        return len(registros)
+
+    def consultar(
+        self,
+        inicio: date,
+        fim: date,
+        estado: str | None = None,
+        produto: str | None = None,
+        limite: int = 100,
+        apos: tuple[str, str, str] | None = None,
+    ) -> list[dict]:
+        """
+        Consulta as semanas cuja `data_inicial` está no intervalo [inicio, fim].
+
+        Com `estado` e `produto`, a consulta percorre apenas o trecho correspondente da
+        chave primária; sem eles, usa o índice por data. A paginação é por chave
+        (keyset): a próxima página começa logo após a chave do último item da anterior,
+        com uma busca no índice, em vez de ler e descartar as linhas de um OFFSET.
+
+        Args:
+            inicio (date): Data inicial do intervalo (inclusiva).
+            fim (date): Data final do intervalo (inclusiva).
+            estado (str | None): Filtro por estado (já normalizado).
+            produto (str | None): Filtro por produto (já normalizado).
+            limite (int): Máximo de linhas retornadas.
+            apos (tuple[str, str, str] | None): Chave (data_inicial, estado, produto) do último
+                item da página anterior (ver `decodificar_cursor`).
+
+        Returns:
+            list[dict]: Linhas ordenadas por (data_inicial, estado, produto), com as datas em
+                        `data_hora_iso`.
+        """
+        condicoes = ["data_inicial <= ?"]
+        parametros: list = [fim.isoformat()]
+        if apos is not None and apos[0] >= inicio.isoformat():
+            # A chave do cursor é o limite inferior: o SQLite começa a leitura direto nela no
+            # índice (com um BETWEEN também presente, ele partiria do início do intervalo)
+            condicoes.append("(data_inicial, estado, produto) > (?, ?, ?)")
+            parametros.extend(apos)
+        else:
+            condicoes.append("data_inicial >= ?")
+            parametros.append(inicio.isoformat())
+        if estado is not None:
+            condicoes.append("estado = ?")
+            parametros.append(estado)
+        if produto is not None:
+            condicoes.append("produto = ?")
+            parametros.append(produto)
+
+        consulta = (
+            "SELECT estado, produto, data_inicial, data_final, preco_medio FROM precos_semanais "
+            f"WHERE {' AND '.join(condicoes)} ORDER BY data_inicial, estado, produto LIMIT ?"
+        )
+        cursor = self._conexao().execute(consulta, [*parametros, limite])
+        return [
+            {
+                "estado": linha["estado"],
+                "produto": linha["produto"],
+                "dataInicial": data_hora_iso(linha["data_inicial"]),
+                "dataFinal": data_hora_iso(linha["data_final"]),
+                "precoMedioRevenda": linha["preco_medio"],
+            }
+            for linha in cursor
+        ]
+
+    def consultar_semanas(self, estados: set[str], produtos: set[str], inicio: date, fim: date) -> list[tuple]:
+        """
+        Lê, em uma única consulta, as semanas de um conjunto de estados e produtos.
+
+        Args:
+            estados (set[str]): Estados (já normalizados).
+            produtos (set[str]): Produtos (já normalizados).
+            inicio (date): Menor `data_inicial` de interesse (inclusiva).
+            fim (date): Maior `data_inicial` de interesse (inclusiva).
+
+        Returns:
+            list[tuple]: Tuplas (estado, produto, data_inicial, data_final, preco_medio), com datas ISO.
+        """
+        if not estados or not produtos:
+            return []
+        consulta = (
+            "SELECT estado, produto, data_inicial, data_final, preco_medio FROM precos_semanais "
+            f"WHERE estado IN ({', '.join('?' * len(estados))}) AND produto IN ({', '.join('?' * len(produtos))}) "
+            "AND data_inicial BETWEEN ? AND ?"
+        )
+        parametros = [*sorted(estados), *sorted(produtos), inicio.isoformat(), fim.isoformat()]
+        return self._conexao().execute(consulta, parametros).fetchall()
+
+historico = HistoricoPrecos(settings.HISTORY_DB_PATH)
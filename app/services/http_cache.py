@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from email.utils import formatdate
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from app.services.time_sync import relogio
+
+# Diretivas da RFC 5861: caches intermediários podem servir a versão anterior enquanto
+# revalidam, e também se a API responder com erro (ex: ANP fora do ar no cold start)
+STALE_WHILE_REVALIDATE_SECONDS = 60
+STALE_IF_ERROR_SECONDS = 24 * 3600
+
+@dataclass(frozen=True)
+class RespostaPreSerializada:
+    """
+    Corpo de uma resposta JSON serializado uma única vez por versão dos dados.
+
+    Attributes:
+        etag (str): ETag forte (entre aspas) da versão.
+        corpo (bytes | memoryview): JSON serializado (uma fatia do snapshot compartilhado, com vários workers).
+        corpo_gzip (bytes | memoryview | None): JSON comprimido com gzip (None se não compensar).
+        expira_em (float): Epoch em que os dados deixam de ser válidos (próxima publicação).
+    """
+    etag: str
+    corpo: bytes | memoryview
+    corpo_gzip: bytes | memoryview | None
+    expira_em: float
+
+def serializar_json(conteudo) -> bytes:
+    """Serializa o conteúdo exatamente como o `JSONResponse` do FastAPI (datas em ISO 8601)."""
+    return json.dumps(jsonable_encoder(conteudo), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def preparar_resposta(conteudo, versao: str | None, ttl_segundos: float) -> RespostaPreSerializada:
+    """
+    Serializa (e comprime) o conteúdo de uma versão dos dados.
+
+    Args:
+        conteudo: Conteúdo JSON-serializável.
+        versao (str | None): Identificador da versão (hash da planilha + versão das regras);
+            sem ele, a ETag é derivada do próprio corpo.
+        ttl_segundos (float): Segundos até a próxima publicação esperada.
+
+    Returns:
+        RespostaPreSerializada: Corpo, corpo comprimido, ETag e expiração.
+    """
+    corpo = serializar_json(conteudo)
+    comprimido = gzip.compress(corpo, mtime=0)
+    versao = versao or hashlib.sha256(corpo).hexdigest()[:32]
+    return RespostaPreSerializada(
+        etag=f'"{versao}"',
+        corpo=corpo,
+        corpo_gzip=comprimido if len(comprimido) < len(corpo) else None,
+        expira_em=relogio.agora_epoch() + ttl_segundos,
+    )
+
+def _etag_corresponde(if_none_match: str | None, etag: str) -> bool:
+    """Compara o `If-None-Match` com a ETag (comparação fraca, como exige a RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidatas = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidatas or etag in candidatas
+
+def aceita_gzip(accept_encoding: str | None) -> bool:
+    """
+    Indica se o `Accept-Encoding` aceita gzip, respeitando os q-values (RFC 9110).
+
+    `gzip;q=0` recusa a codificação; sem menção explícita a gzip, vale o curinga `*`.
+    """
+    if not accept_encoding:
+        return False
+    qualidades: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        codificacao, *parametros = item.split(";")
+        qualidade = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip().lower() == "q":
+                try:
+                    qualidade = float(valor)
+                except ValueError:
+                    qualidade = 0.0
+        qualidades[codificacao.strip().lower()] = qualidade
+    for codificacao in ("gzip", "x-gzip", "*"):
+        if codificacao in qualidades:
+            return qualidades[codificacao] > 0
+    return False
+
+def responder(
+    request: Request,
+    resposta: RespostaPreSerializada,
+    headers_extras: dict[str, str] | None = None,
+    defasado: bool = False,
+) -> Response:
+    """
+    Escreve a resposta pré-serializada, com cache condicional.
+
+    Devolve 304 (sem corpo) se o `If-None-Match` do cliente corresponder à ETag;
+    caso contrário, os bytes já serializados (comprimidos, se o cliente aceitar gzip).
+    `Cache-Control`/`Expires` apontam para a próxima publicação esperada; um dado
+    defasado (ANP indisponível) vai com `no-cache`, para que caches e clientes
+    revalidem a cada uso e vejam o dado novo assim que a atualização voltar.
+
+    Args:
+        request (Request): Requisição recebida.
+        resposta (RespostaPreSerializada): Corpo da versão publicada.
+        headers_extras (dict[str, str] | None): Headers adicionais (ex: idade do snapshot).
+        defasado (bool): O dado servido não reflete a ANP (último dado válido ou atualização que falhou).
+
+    Returns:
+        Response: 200 com o corpo ou 304.
+    """
+    agora = relogio.agora_epoch()
+    if defasado:
+        cache_control, expira_em = f"public, no-cache, stale-if-error={STALE_IF_ERROR_SECONDS}", agora
+    else:
+        max_age = max(0, int(resposta.expira_em - agora))
+        cache_control = (
+            f"public, max-age={max_age}, stale-while-revalidate={STALE_WHILE_REVALIDATE_SECONDS}, "
+            f"stale-if-error={STALE_IF_ERROR_SECONDS}"
+        )
+        expira_em = resposta.expira_em
+    headers = {
+        "ETag": resposta.etag,
+        "Cache-Control": cache_control,
+        "Expires": formatdate(expira_em, usegmt=True),
+        "Vary": "Accept-Encoding",
+        **(headers_extras or {}),
+    }
+    if _etag_corresponde(request.headers.get("if-none-match"), resposta.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    corpo = resposta.corpo
+    if resposta.corpo_gzip is not None and aceita_gzip(request.headers.get("accept-encoding")):
+        corpo = resposta.corpo_gzip
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=corpo, media_type="application/json", headers=headers)
@@ -1,57 +1,177 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
 import structlog
 import structlog.stdlib
 import structlog.processors
 import structlog.dev
 import structlog.contextvars
-import json
+from app.core.config import settings
+
+# Níveis (nomes dos métodos do logger) que recebem arquivo, linha e função de origem
+_NIVEIS_COM_CALLSITE = frozenset({"warning", "warn", "error", "exception", "critical", "fatal"})
+
+_CALLSITE = structlog.processors.CallsiteParameterAdder(
+    [
+        structlog.processors.CallsiteParameter.FILENAME,
+        structlog.processors.CallsiteParameter.LINENO,
+        structlog.processors.CallsiteParameter.FUNC_NAME,
+    ],
+    additional_ignores=[__name__],
+)
+
+# Listener que escreve os logs a partir de uma thread própria (modo fila)
+_LISTENER: logging.handlers.QueueListener | None = None
+
+# Pacote cujos loggers só registram pelo structlog (origem vinda de `adicionar_callsite`)
+_PACOTE_APP = __name__.split(".")[0]
+
+def adicionar_callsite(logger, method_name: str, event_dict: dict) -> dict:
+    """
+    Adiciona arquivo, linha e função de origem apenas a avisos e erros.
+
+    Descobrir a origem exige inspecionar a pilha de chamadas; para os eventos
+    INFO/DEBUG (a maioria, inclusive os de cada requisição) esse custo é evitado.
+    """
+    if method_name in _NIVEIS_COM_CALLSITE:
+        return _CALLSITE(logger, method_name, event_dict)
+    return event_dict
+
+def mesclar_contexto(logger, method_name: str, event_dict: dict) -> dict:
+    """
+    `merge_contextvars` que, para registros da biblioteca padrão, usa o contexto da thread de origem.
+
+    No modo fila, os registros da biblioteca padrão (uvicorn, httpx...) passam pelo
+    `foreign_pre_chain` na thread do listener, onde as contextvars da requisição (ex:
+    `trace_id`) não existem; `_HandlerFila` as captura antes de enfileirar o registro.
+    """
+    contexto = getattr(event_dict.get("_record"), "contexto_structlog", None)
+    if contexto is None:
+        return structlog.contextvars.merge_contextvars(logger, method_name, event_dict)
+    for chave, valor in contexto.items():
+        event_dict.setdefault(chave, valor)
+    return event_dict
+
+class _LoggerSemInspecao(logging.Logger):
+    """
+    Logger da biblioteca padrão que não inspeciona a pilha para os loggers do app.
+
+    Os loggers do app só registram pelo structlog, cuja origem (apenas em avisos e erros)
+    vem de `adicionar_callsite`; o `findCaller` padrão percorreria a pilha a cada evento.
+    Os demais loggers (uvicorn, httpx...) mantêm arquivo, linha e função de origem.
+    """
+
+    def findCaller(self, stack_info: bool = False, stacklevel: int = 1):
+        if self.name == _PACOTE_APP or self.name.startswith(f"{_PACOTE_APP}."):
+            return "(unknown file)", 0, "(unknown function)", None
+        # +1: ignora o próprio frame desta sobrescrita
+        return super().findCaller(stack_info, stacklevel + 1)
+
+def _serializar_json(objeto, **kwargs) -> str:
+    """Serializa o evento com orjson (ou com a biblioteca padrão, se ele não estiver instalado)."""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(objeto, **kwargs)
+    return orjson.dumps(objeto, default=kwargs.get("default"), option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+class _HandlerFila(logging.handlers.QueueHandler):
+    """
+    Enfileira os registros sem formatá-los.
+
+    O `QueueHandler` padrão formata a mensagem na thread que registra o log; aqui a
+    renderização (JSON) fica para a thread do listener. Os registros não saem do
+    processo, então não precisam ser convertidos para texto antes de entrar na fila.
+    Os registros da biblioteca padrão levam as contextvars da thread de origem
+    (`mesclar_contexto`); os do structlog já chegam com o contexto mesclado.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not isinstance(record.msg, dict):
+            record.contexto_structlog = structlog.contextvars.get_contextvars()
+        return record
 
 def configure_structlog():
     """
     Configura o structlog para output JSON estruturado.
+
+    Com `LOG_QUEUE_ENABLED` (padrão), a requisição apenas monta o evento e o coloca
+    em uma fila; a serialização JSON e a escrita no stdout acontecem em uma thread
+    de fundo (`QueueListener`), esvaziada no encerramento do processo.
     """
+    global _LISTENER
+
     # Processadores padrão que adicionam contexto
     shared_processors = [
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
         structlog.processors.TimeStamper(fmt="iso"), # Adiciona timestamp ISO
         structlog.processors.StackInfoRenderer(),
-        structlog.processors.CallsiteParameterAdder(
-            [
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.LINENO,
-                structlog.processors.CallsiteParameter.FUNC_NAME,
-            ]
-        ),
-        structlog.contextvars.merge_contextvars, # Para trace_id
+        adicionar_callsite, # Arquivo/linha/função apenas para WARNING ou acima
+        mesclar_contexto, # Para trace_id
     ]
 
-    # Configura o logger padrão do Python
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=logging.INFO,
-    )
-
     # Configura os processadores do structlog
     if sys.stdout.isatty():
         # Renderização amigável para terminais interativos
-        processors = shared_processors + [
-            structlog.dev.ConsoleRenderer(),
-        ]
+        renderer = structlog.dev.ConsoleRenderer()
     else:
         # JSON para ambiente de produção/CI
-        processors = shared_processors + [
-            structlog.processors.JSONRenderer(serializer=json.dumps),
-        ]
+        renderer = structlog.processors.JSONRenderer(serializer=_serializar_json)
+
+    # A renderização acontece no handler (na thread do listener, no modo fila)
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer],
+        foreign_pre_chain=shared_processors,
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+    if settings.LOG_QUEUE_ENABLED:
+        fila: queue.SimpleQueue = queue.SimpleQueue()
+        _LISTENER = logging.handlers.QueueListener(fila, stream_handler, respect_handler_level=True)
+        _LISTENER.start()
+        handler: logging.Handler = _HandlerFila(fila)
+    else:
+        handler = stream_handler
+
+    # Configura o logger padrão do Python
+    logging.basicConfig(
+        handlers=[handler],
+        level=logging.INFO,
+        force=True,
+    )
+    # O httpx registra cada requisição em INFO; mantemos apenas avisos e erros
+    logging.getLogger("httpx").setLevel(logging.WARNING)
 
     structlog.configure(
-        processors=processors,
+        processors=shared_processors + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
         logger_factory=structlog.stdlib.LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
     )
+    # Depois do LoggerFactory, que define a própria classe de logger: a origem dos eventos
+    # do app vem de `adicionar_callsite`, sem o findCaller a cada registro
+    logging.setLoggerClass(_LoggerSemInspecao)
+
+def encerrar_logging():
+    """Escreve os logs ainda na fila e para a thread do listener."""
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
+def amostrar_requisicao() -> bool:
+    """Sorteia se os eventos de início/fim de uma requisição serão registrados (`LOG_REQUEST_SAMPLE_RATE`)."""
+    taxa = settings.LOG_REQUEST_SAMPLE_RATE
+    return taxa >= 1 or (taxa > 0 and random.random() < taxa)
 
 def setup_logger(name: str) -> structlog.BoundLogger:
     """
@@ -61,3 +181,4 @@ def setup_logger(name: str) -> structlog.BoundLogger:
 
 # Garante que a configuração seja executada apenas uma vez
 configure_structlog()
+atexit.register(encerrar_logging)
@@ -0,0 +1,163 @@
+import os
+from typing import Callable
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from starlette.routing import Match
+
+# Modo multiprocesso do prometheus_client (vários workers do uvicorn/gunicorn): cada
+# processo grava suas métricas em arquivos em PROMETHEUS_MULTIPROC_DIR e o /metrics
+# agrega os arquivos de todos os workers. O diretório deve existir e estar vazio antes
+# de os workers iniciarem, e a variável precisa estar definida antes do primeiro import
+# do prometheus_client.
+MULTIPROCESSO = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Rótulo `endpoint` das requisições que não correspondem a nenhuma rota (ex: scanners),
+# para que URLs arbitrárias não criem séries novas
+ROTA_DESCONHECIDA = "desconhecida"
+
+# HTTP (rotulado pelo template da rota, ex: /precos/{estado}/{produto})
+REQUESTS_TOTAL = Counter("http_requests_total", "Total HTTP Requests", ["method", "endpoint", "status_code"])
+RESPONSE_TIME_SECONDS = Histogram("http_response_time_seconds", "HTTP Response Time", ["method", "endpoint"])
+
+# Etapas do pipeline de /precos: scrape, download, ingestao (conversão colunar) e indexacao (parse)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "precos_pipeline_stage_seconds",
+    "Duração de cada etapa do pipeline de atualização",
+    ["etapa"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+DOWNLOADS_TOTAL = Counter(
+    "precos_downloads_total",
+    "Downloads da planilha por resultado (baixada, nao_modificada, falha)",
+    ["resultado"],
+)
+DOWNLOAD_BYTES_TOTAL = Counter("precos_download_bytes_total", "Bytes de planilhas baixados da ANP")
+CACHE_REQUESTS_TOTAL = Counter(
+    "precos_cache_requests_total",
+    "Consultas a caches por camada (busca, redis, disco, resultados, indice) e resultado (hit, miss)",
+    ["cache", "resultado"],
+)
+# Cache em dois níveis (L1 em processo, L2 Redis): consultas e remoções por camada
+CACHE_TIER_REQUESTS_TOTAL = Counter(
+    "precos_cache_tier_requests_total",
+    "Consultas ao cache em dois níveis por camada (l1, l2) e resultado (hit, miss, negativo, indisponivel)",
+    ["cache", "camada", "resultado"],
+)
+CACHE_TIER_EVICTIONS_TOTAL = Counter(
+    "precos_cache_tier_evictions_total",
+    "Entradas removidas do cache em dois níveis por camada e motivo (capacidade, expiracao, invalidacao)",
+    ["cache", "camada", "motivo"],
+)
+CACHE_L1_ENTRIES = Gauge(
+    "precos_cache_l1_entries",
+    "Entradas no L1 (memória do processo) do cache em dois níveis",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+# Ciclo de atualização e snapshot
+REFRESH_DURATION_SECONDS = Histogram(
+    "precos_refresh_duration_seconds",
+    "Duração de cada ciclo de atualização (scraping + download + extração)",
+    ["resultado"],
+)
+SNAPSHOT_AGE_SECONDS = Gauge(
+    "precos_snapshot_age_seconds",
+    "Segundos desde a última atualização bem-sucedida do snapshot de preços",
+    multiprocess_mode="livemostrecent",
+)
+
+# Coalescência de operações concorrentes
+COALESCED_WAITERS_TOTAL = Counter(
+    "precos_coalesced_waiters_total",
+    "Chamadas que aguardaram uma operação já em andamento em vez de repeti-la",
+    ["operacao"],
+)
+COALESCED_WAITERS = Gauge(
+    "precos_coalesced_waiters_inflight",
+    "Chamadas aguardando neste momento uma operação já em andamento",
+    ["operacao"],
+    multiprocess_mode="livesum",
+)
+
+# Disjuntores (um rótulo por circuito)
+CIRCUIT_STATE = Gauge(
+    "precos_circuit_breaker_state",
+    "Estado do disjuntor (0 = fechado, 1 = meio aberto, 2 = aberto)",
+    ["circuito"],
+    multiprocess_mode="livemax",
+)
+CIRCUIT_REJECTED_TOTAL = Counter(
+    "precos_circuit_breaker_rejected_total",
+    "Chamadas recusadas sem tentativa porque o disjuntor estava aberto",
+    ["circuito"],
+)
+
+# Relógio sincronizado
+CLOCK_OFFSET_SECONDS = Gauge(
+    "precos_clock_offset_seconds",
+    "Diferença (NTP - relógio local) medida na última sincronização bem-sucedida",
+    multiprocess_mode="livemostrecent",
+)
+CLOCK_SYNC_AGE_SECONDS = Gauge(
+    "precos_clock_sync_age_seconds",
+    "Segundos desde a última sincronização NTP bem-sucedida (+Inf se nunca sincronizou)",
+    multiprocess_mode="livemostrecent",
+)
+CLOCK_SYNC_FAILURES_TOTAL = Counter(
+    "precos_clock_sync_failures_total",
+    "Falhas ao consultar o servidor NTP",
+)
+
+# Medidores calculados no momento da coleta: (gauge, função)
+_MEDIDORES: list[tuple[Gauge, Callable[[], float]]] = []
+
+def registrar_medidor(gauge: Gauge, funcao: Callable[[], float]):
+    """
+    Faz o gauge refletir `funcao()` no momento da coleta.
+
+    Em um único processo, usa `set_function`. No modo multiprocesso os valores vêm
+    dos arquivos de cada worker, então o valor é gravado a cada coleta (`gerar_metricas`).
+    """
+    if MULTIPROCESSO:
+        _MEDIDORES.append((gauge, funcao))
+    else:
+        gauge.set_function(funcao)
+
+def registrar_cache(cache: str, hit: bool):
+    """Conta uma consulta a um cache ("busca", "redis", "disco", "resultados" ou "indice")."""
+    CACHE_REQUESTS_TOTAL.labels(cache=cache, resultado="hit" if hit else "miss").inc()
+
+def rotulo_rota(request: Request) -> str:
+    """
+    Retorna o template da rota que atendeu a requisição (ex: "/precos/{estado}/{produto}").
+
+    Requisições que não correspondem a nenhuma rota recebem `ROTA_DESCONHECIDA`.
+    """
+    rota = request.scope.get("route")
+    if rota is None:
+        # Rotas do Starlette (ex: /docs) não registram a rota no scope
+        rota = next((r for r in request.app.routes if r.matches(request.scope)[0] == Match.FULL), None)
+    return getattr(rota, "path", None) or ROTA_DESCONHECIDA
+
+def gerar_metricas() -> bytes:
+    """Métricas no formato de exposição do Prometheus (agregando os workers no modo multiprocesso)."""
+    if not MULTIPROCESSO:
+        return generate_latest(REGISTRY)
+
+    from prometheus_client import multiprocess
+
+    for gauge, funcao in _MEDIDORES:
+        gauge.set(funcao())
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+def encerrar_processo():
+    """No modo multiprocesso, descarta os gauges "live" deste worker (chamado no shutdown)."""
+    if MULTIPROCESSO:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
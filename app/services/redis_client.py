@@ -0,0 +1,119 @@
+from typing import TYPE_CHECKING, Awaitable, Callable, TypeVar
+from app.services.circuit_breaker import FECHADO, Disjuntor
+from app.services.logger import setup_logger
+from app.core.config import settings
+
+logger = setup_logger(__name__)
+
+# O redis-py só é importado quando o primeiro cliente é criado (importar a aplicação continua rápido)
+if TYPE_CHECKING:
+    import redis.asyncio
+
+T = TypeVar("T")
+
+def erros_conexao() -> tuple[type[Exception], ...]:
+    """Erros que indicam Redis indisponível (e contam como falha no disjuntor)."""
+    import redis.exceptions
+
+    return (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, OSError)
+
+# Valor padrão de `executar` para distinguir "Redis indisponível" de "chave ausente"
+INDISPONIVEL = object()
+
+class ClienteRedis:
+    """
+    Cliente Redis assíncrono, criado sob demanda, com pool de conexões e circuit breaker.
+
+    Nada é feito no import: o cliente (e seu pool) só é criado na primeira operação,
+    e as conexões são abertas pelo pool conforme a necessidade. Falhas de conexão
+    são repetidas com backoff exponencial pelo próprio redis-py e, se persistirem,
+    abrem o disjuntor: enquanto ele estiver aberto, as operações retornam o valor
+    padrão sem tentar a rede, e o cache volta a funcionar sozinho quando o Redis
+    responder a uma chamada de teste. O `lifespan` da aplicação fecha o pool.
+    """
+
+    def __init__(self):
+        self._cliente: "redis.asyncio.Redis | None" = None
+        self.disjuntor = Disjuntor(
+            "redis",
+            limite_falhas=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+            recuperacao=settings.REDIS_BREAKER_RESET_SECONDS,
+            recuperacao_maxima=settings.REDIS_BREAKER_MAX_RESET_SECONDS,
+        )
+
+    @property
+    def habilitado(self) -> bool:
+        """Indica se o Redis está configurado (`REDIS_ENABLED`)."""
+        return settings.REDIS_ENABLED
+
+    def obter(self) -> "redis.asyncio.Redis | None":
+        """Retorna o cliente (criando-o na primeira chamada), ou None se o Redis estiver desabilitado."""
+        if not self.habilitado:
+            return None
+        if self._cliente is None:
+            import redis.asyncio
+            from redis.asyncio.retry import Retry
+            from redis.backoff import ExponentialWithJitterBackoff
+
+            self._cliente = redis.asyncio.Redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+                health_check_interval=30,
+                retry=Retry(ExponentialWithJitterBackoff(cap=0.5, base=0.05), settings.REDIS_RETRIES),
+            )
+        return self._cliente
+
+    def disponivel(self) -> "redis.asyncio.Redis | None":
+        """Retorna o cliente se o Redis estiver habilitado e o disjuntor fechado; senão None."""
+        if self.disjuntor.estado != FECHADO:
+            return None
+        return self.obter()
+
+    async def executar(self, operacao: Callable[["redis.asyncio.Redis"], Awaitable[T]], padrao: T | None = None) -> T | None:
+        """
+        Executa uma operação no Redis, protegida pelo disjuntor.
+
+        Args:
+            operacao (Callable): Recebe o cliente e retorna a corrotina do comando.
+            padrao: Valor retornado se o Redis estiver desabilitado ou indisponível.
+
+        Returns:
+            O resultado do comando, ou `padrao`.
+        """
+        cliente = self.obter()
+        if cliente is None or not self.disjuntor.permite():
+            return padrao
+        try:
+            resultado = await operacao(cliente)
+        except erros_conexao() as e:
+            self.disjuntor.registrar_falha()
+            logger.warning(f"[Redis] Indisponível: {e}. Operação ignorada.", status="redis_unavailable")
+            return padrao
+        self.disjuntor.registrar_sucesso()
+        return resultado
+
+    async def ping(self):
+        """
+        Verifica a conexão com o Redis, atualizando o disjuntor.
+
+        Raises:
+            redis.exceptions.ConnectionError, redis.exceptions.TimeoutError: Se o Redis não responder.
+        """
+        cliente = self.obter()
+        try:
+            await cliente.ping()
+        except erros_conexao():
+            self.disjuntor.registrar_falha()
+            raise
+        self.disjuntor.registrar_sucesso()
+
+    async def fechar(self):
+        """Fecha o cliente e o pool de conexões (no shutdown, ou ao final de um event loop próprio)."""
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+cliente_redis = ClienteRedis()
@@ -0,0 +1,445 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from functools import cached_property
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping
+from app.services.downloader import baixar_arquivo_async, calcular_hash_arquivo, calcular_tempo_ate_proximo_domingo, ultima_planilha_valida
+from app.services.extractor import CONJUNTO_PADRAO, extrair_conjuntos, extrair_indice, ingerir_planilha, versao_regras
+from app.services.http_cache import RespostaPreSerializada, preparar_resposta
+from app.services.logger import setup_logger
+from app.services.metrics import PIPELINE_STAGE_SECONDS, REFRESH_DURATION_SECONDS, SNAPSHOT_AGE_SECONDS, registrar_medidor
+from app.services.shared_snapshot import ArmazenamentoSnapshot
+from app.services.time_sync import relogio
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = setup_logger(__name__)
+
+ERRO_DOWNLOAD = "Arquivo não encontrado no site da ANP"
+ERRO_EXTRACAO = "Não foi possível extrair os dados para o Distrito Federal"
+
+def validade_dados(dados: Mapping) -> float:
+    """
+    Segundos até os dados deixarem de ser os atuais (base de `Cache-Control`/`Expires`).
+
+    Vale até a próxima publicação esperada da ANP (domingo), mas nunca além do fim da
+    semana seguinte à da planilha: uma planilha antiga (ex: servida do disco durante uma
+    indisponibilidade da ANP) já nasce expirada, independentemente de quando o snapshot
+    foi montado.
+    """
+    ttl = float(calcular_tempo_ate_proximo_domingo())
+    data_final = dados.get("dataFinal")
+    if isinstance(data_final, date):
+        dia = data_final.date() if isinstance(data_final, datetime) else data_final
+        fim_semana_seguinte = datetime.combine(dia + timedelta(days=8), datetime.min.time())
+        ttl = min(ttl, (fim_semana_seguinte - relogio.agora()).total_seconds())
+    return max(0.0, ttl)
+
+@dataclass(frozen=True)
+class SnapshotPrecos:
+    """
+    Retrato imutável dos dados publicados para a API.
+
+    Attributes:
+        url (str): URL da planilha da ANP de onde os dados vieram.
+        caminho_arquivo (Path): Caminho local da planilha.
+        resultado (Mapping): Dados do par configurado em `etl_rules.yaml` (somente leitura).
+        atualizado_em (float): Epoch (segundos) da última atualização bem-sucedida.
+        indice (Mapping): (estado, produto) normalizados -> dados, para toda a aba (somente leitura).
+        resposta (RespostaPreSerializada): `resultado` já serializado para `/precos`, com ETag da versão.
+        conjuntos (Mapping): Conjunto nomeado de `etl_rules.yaml` -> resposta já serializada para
+            `/precos?conjunto=<nome>` (apenas os encontrados na planilha).
+        versao_regras (str): Versão das regras de ETL com que o snapshot foi montado.
+    """
+    url: str
+    caminho_arquivo: Path
+    resultado: Mapping
+    atualizado_em: float
+    indice: Mapping
+    resposta: RespostaPreSerializada
+    conjuntos: Mapping
+    versao_regras: str
+
+    @cached_property
+    def semanas(self) -> "pd.DataFrame":
+        """`indice` no formato das semanas de `/precos/batch`, convertido no primeiro lote (uma vez por snapshot)."""
+        from app.services.batch import semanas_do_indice
+
+        return semanas_do_indice(self.indice)
+
+class AtualizadorPrecos:
+    """
+    Agendador que consulta a ANP periodicamente e publica um `SnapshotPrecos`.
+
+    Os endpoints `/precos` e `/precos/{estado}/{produto}` apenas consultam o índice do
+    snapshot publicado; o scraping e o download (assíncronos) e a ingestão/indexação
+    (em thread) rodam em segundo plano.
+    Falhas na atualização mantêm o último snapshot válido.
+
+    Sem snapshot (cold start), o último dado válido conhecido (snapshot compartilhado ou
+    planilha íntegra mais recente em disco) é servido imediatamente, marcado como
+    defasado, enquanto a atualização roda em segundo plano. Uma atualização que falhou
+    sem snapshot disponível não é repetida pelas requisições durante `NEGATIVE_CACHE_SECONDS`.
+
+    Com um `ArmazenamentoSnapshot` (vários workers), apenas o worker líder executa o
+    ciclo e publica o snapshot no arquivo compartilhado; os demais acompanham o arquivo
+    a cada `SNAPSHOT_POLL_SECONDS` (no cold start, aguardam a primeira publicação) e
+    assumem a atualização se o líder morrer.
+
+    Args:
+        compartilhado (ArmazenamentoSnapshot | None): Snapshot compartilhado entre workers.
+    """
+
+    def __init__(self, compartilhado: ArmazenamentoSnapshot | None = None):
+        self._snapshot: SnapshotPrecos | None = None
+        self._ultimo_erro: str = ERRO_DOWNLOAD
+        self._lock = asyncio.Lock()
+        self._tarefa: asyncio.Task | None = None
+        self._compartilhado = compartilhado
+        self._defasado = False
+        # Instante (monotônico) da última atualização que falhou; None após um sucesso
+        self._falhou_em: float | None = None
+        self._lock_ultimo_valido = asyncio.Lock()
+        self._ultimo_valido_verificado = False
+        self._revalidacao: asyncio.Task | None = None
+        self._reaplicacao: asyncio.Task | None = None
+        # Versão das regras já reaplicada ao snapshot (evita repetir uma remontagem que falhou)
+        self._regras_reaplicadas: str | None = None
+
+    @property
+    def snapshot(self) -> SnapshotPrecos | None:
+        """Snapshot publicado atualmente (ou None antes da primeira atualização)."""
+        return self._snapshot
+
+    @property
+    def ultimo_erro(self) -> str:
+        """Mensagem do último erro de atualização, usada quando não há snapshot."""
+        return self._ultimo_erro
+
+    @property
+    def defasado(self) -> bool:
+        """True se o snapshot servido não reflete a ANP (veio do disco ou a última atualização falhou)."""
+        return self._defasado
+
+    def tentar_novamente_em(self) -> int:
+        """Segundos até o fim do cache negativo da última falha (0 se não houver), para o `Retry-After`."""
+        if self._falhou_em is None:
+            return 0
+        return max(0, math.ceil(settings.NEGATIVE_CACHE_SECONDS - (time.monotonic() - self._falhou_em)))
+
+    def _falha_recente(self) -> bool:
+        return self.tentar_novamente_em() > 0
+
+    def idade_snapshot(self) -> float:
+        """Segundos desde a última atualização bem-sucedida (0 se não houver snapshot)."""
+        if self._snapshot is None:
+            return 0.0
+        return max(0.0, time.time() - self._snapshot.atualizado_em)
+
+    def limpar(self):
+        """Descarta o snapshot publicado (útil em testes e diagnósticos)."""
+        self._snapshot = None
+        self._ultimo_erro = ERRO_DOWNLOAD
+        self._defasado = False
+        self._falhou_em = None
+        self._ultimo_valido_verificado = False
+        self._regras_reaplicadas = None
+
+    async def _montar_snapshot(self, url: str, caminho_arquivo: Path, atualizado_em: float | None = None) -> SnapshotPrecos | None:
+        """Ingere, extrai e indexa a planilha (em thread) e monta o snapshot, sem publicá-lo."""
+        # Ingestão (uma vez por planilha) para o formato colunar; os conjuntos do plano de
+        # regras (o padrão é o de /precos) e o índice (estado, produto) são extraídos dessa
+        # cópia, uma vez por conteúdo (cache de resultados). Tudo roda em thread para não
+        # bloquear o event loop.
+        with PIPELINE_STAGE_SECONDS.labels(etapa="ingestao").time():
+            await asyncio.to_thread(ingerir_planilha, caminho_arquivo)
+        with PIPELINE_STAGE_SECONDS.labels(etapa="extracao").time():
+            conjuntos = await asyncio.to_thread(extrair_conjuntos, caminho_arquivo)
+        with PIPELINE_STAGE_SECONDS.labels(etapa="indexacao").time():
+            indice = await asyncio.to_thread(extrair_indice, caminho_arquivo)
+        resultado = (conjuntos or {}).get(CONJUNTO_PADRAO)
+        if not resultado or not indice:
+            logger.error("Não foi possível extrair os dados para o Distrito Federal do arquivo baixado.", status="extraction_failed")
+            self._ultimo_erro = ERRO_EXTRACAO
+            return None
+
+        # Versão dos dados = conteúdo da planilha + regras de ETL (base da ETag de /precos)
+        hash_conteudo = await asyncio.to_thread(calcular_hash_arquivo, caminho_arquivo)
+        regras = versao_regras()
+        versao = f"{hash_conteudo[:16]}-{regras}" if hash_conteudo else None
+        # Os conjuntos nomeados são serializados uma vez por versão, como o padrão
+        respostas_conjuntos = {
+            nome: preparar_resposta(dados, f"{versao}-{nome}" if versao else None, validade_dados(dados))
+            for nome, dados in conjuntos.items()
+            if nome != CONJUNTO_PADRAO and dados
+        }
+        return SnapshotPrecos(
+            url=url,
+            caminho_arquivo=Path(caminho_arquivo),
+            resultado=MappingProxyType(dict(resultado)),
+            atualizado_em=atualizado_em or time.time(),
+            indice=MappingProxyType({chave: MappingProxyType(dados) for chave, dados in indice.items()}),
+            resposta=preparar_resposta(resultado, versao, validade_dados(resultado)),
+            conjuntos=MappingProxyType(respostas_conjuntos),
+            versao_regras=regras,
+        )
+
+    async def _executar_ciclo(self) -> SnapshotPrecos | None:
+        """Executa um ciclo de download + extração e publica o resultado."""
+        url, _, _, caminho_arquivo = await baixar_arquivo_async()
+        if not caminho_arquivo:
+            logger.error("Arquivo da ANP não encontrado após tentativas de download.", status="download_failed")
+            self._ultimo_erro = ERRO_DOWNLOAD
+            return None
+
+        snapshot = await self._montar_snapshot(url, caminho_arquivo)
+        if snapshot is None:
+            return None
+        await self._publicar(snapshot)
+        return snapshot
+
+    async def _publicar(self, snapshot: SnapshotPrecos):
+        """Adota o snapshot e, se este worker for o líder, o publica no arquivo compartilhado."""
+        self._snapshot = snapshot
+        if self._compartilhado is not None and self._compartilhado.lider:
+            await asyncio.to_thread(self._compartilhado.publicar, snapshot)
+
+    async def _aguardar_lider(self) -> SnapshotPrecos | None:
+        """
+        Worker seguidor: aguarda o líder publicar uma nova versão, em vez de atualizar por conta própria.
+
+        Acompanha o arquivo compartilhado a cada `SNAPSHOT_POLL_SECONDS`, por até
+        `SNAPSHOT_WAIT_SECONDS`. Se o líder morrer nesse meio tempo, este worker assume a
+        liderança e executa o ciclo.
+
+        Returns:
+            SnapshotPrecos | None: O snapshot publicado pelo líder, ou None se nada foi publicado a tempo.
+        """
+        limite = time.monotonic() + settings.SNAPSHOT_WAIT_SECONDS
+        while True:
+            if self.carregar_compartilhado(forcar=self._snapshot is None) is not None:
+                return self._snapshot
+            if self._compartilhado.assumir_lideranca():
+                return await self._executar_ciclo()
+            if time.monotonic() >= limite:
+                logger.warning("[Refresher] O worker líder não publicou um snapshot a tempo.", status="leader_wait_timeout")
+                return None
+            await asyncio.sleep(settings.SNAPSHOT_POLL_SECONDS)
+
+    def carregar_compartilhado(self, forcar: bool = False) -> SnapshotPrecos | None:
+        """
+        Adota o snapshot publicado no arquivo compartilhado, se houver uma versão nova.
+
+        Args:
+            forcar (bool): Relê o snapshot publicado mesmo que ele já tenha sido carregado.
+
+        Returns:
+            SnapshotPrecos | None: O snapshot adotado, ou None se nada mudou.
+        """
+        if self._compartilhado is None:
+            return None
+        campos = self._compartilhado.carregar(forcar)
+        if campos is None:
+            return None
+        if self._snapshot is not None and self._snapshot.resposta.etag == campos["resposta"].etag:
+            # Mesma versão: só renova o horário da atualização
+            self._snapshot = replace(self._snapshot, atualizado_em=campos["atualizado_em"])
+        else:
+            self._snapshot = SnapshotPrecos(**campos)
+            # O líder só publica atualizações bem-sucedidas
+            self._defasado, self._falhou_em = False, None
+            logger.info(f"[Refresher] Snapshot {campos['resposta'].etag} carregado do arquivo compartilhado.", status="snapshot_loaded")
+        return self._snapshot
+
+    async def carregar_ultimo_valido(self) -> SnapshotPrecos | None:
+        """
+        Sem snapshot, adota o último dado válido conhecido, sem acessar a ANP.
+
+        Tenta o snapshot publicado por outro worker e, depois (uma vez por processo), a
+        planilha íntegra mais recente em `OUTPUT_DIR`. O snapshot vindo do disco fica
+        marcado como defasado até a próxima atualização bem-sucedida.
+
+        Returns:
+            SnapshotPrecos | None: O snapshot atual, ou None se não houver dado válido.
+        """
+        if self._snapshot is not None or self.carregar_compartilhado(forcar=True) is not None:
+            return self._snapshot
+        async with self._lock_ultimo_valido:
+            if self._snapshot is not None or self._ultimo_valido_verificado:
+                return self._snapshot
+            self._ultimo_valido_verificado = True
+            planilha = await asyncio.to_thread(ultima_planilha_valida)
+            if planilha is None:
+                return None
+            url, caminho_arquivo = planilha
+            snapshot = await self._montar_snapshot(url, caminho_arquivo, atualizado_em=caminho_arquivo.stat().st_mtime)
+            if snapshot is None or self._snapshot is not None:
+                return self._snapshot
+            self._snapshot = snapshot
+            self._defasado = True
+            logger.warning(f"[Refresher] Servindo o último dado válido em disco ({caminho_arquivo.name}) até a próxima atualização.", status="serving_last_known_good")
+            return snapshot
+
+    def _revalidar_em_segundo_plano(self):
+        """
+        Atualiza um snapshot defasado em segundo plano (stale-while-revalidate).
+
+        Só é usado sem o agendador (que já atualiza periodicamente) e fora da janela do
+        cache negativo; no máximo uma revalidação por vez.
+        """
+        if not self._defasado or self._tarefa is not None or self._falha_recente():
+            return
+        if self._revalidacao is None or self._revalidacao.done():
+            self._revalidacao = asyncio.create_task(self.atualizar())
+
+    def _reaplicar_regras_em_segundo_plano(self):
+        """
+        Remonta o snapshot quando `etl_rules.yaml` muda (recarga sem reinício).
+
+        A planilha já baixada é reprocessada com as novas regras, sem acessar a ANP, para
+        que `/precos` e os conjuntos nomeados reflitam a alteração sem esperar o próximo
+        ciclo. Com o snapshot compartilhado, apenas o líder remonta e publica.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or self._reaplicacao is not None and not self._reaplicacao.done():
+            return
+        regras = versao_regras()
+        if regras in (snapshot.versao_regras, self._regras_reaplicadas):
+            return
+        if self._compartilhado is not None and not self._compartilhado.lider:
+            return
+        self._regras_reaplicadas = regras
+        self._reaplicacao = asyncio.create_task(self._reaplicar_regras(snapshot))
+
+    async def _reaplicar_regras(self, anterior: SnapshotPrecos):
+        """Remonta `anterior` com as regras atuais e o publica, se nada o substituiu nesse meio tempo."""
+        async with self._lock:
+            if self._snapshot is not anterior:
+                return
+            snapshot = await self._montar_snapshot(anterior.url, anterior.caminho_arquivo, atualizado_em=anterior.atualizado_em)
+            if snapshot is None:
+                logger.error("[Refresher] As novas regras de ETL não puderam ser aplicadas; o snapshot anterior continua publicado.", status="rules_reload_failed")
+                return
+            await self._publicar(snapshot)
+            logger.info(f"[Refresher] Regras de ETL {snapshot.versao_regras} aplicadas ao snapshot.", status="rules_reloaded")
+
+    async def _atualizar_com_lock(self) -> SnapshotPrecos | None:
+        """
+        Roda um ciclo de atualização, assumindo que `self._lock` já está adquirido.
+
+        Com o snapshot compartilhado, apenas o líder acessa a ANP; um seguidor aguarda a
+        versão publicada pelo líder (`_aguardar_lider`).
+        """
+        inicio = time.perf_counter()
+        resultado_metrica = "failure"
+        try:
+            if self._compartilhado is not None and not self._compartilhado.assumir_lideranca():
+                snapshot = await self._aguardar_lider()
+            else:
+                snapshot = await self._executar_ciclo()
+            if snapshot is not None:
+                resultado_metrica = "success"
+                self._defasado, self._falhou_em = False, None
+                logger.info(f"[Refresher] Snapshot publicado a partir de {snapshot.url}", status="snapshot_published")
+            else:
+                # O snapshot anterior (se houver) continua sendo servido, agora defasado
+                self._defasado, self._falhou_em = self._snapshot is not None, time.monotonic()
+            return snapshot
+        finally:
+            REFRESH_DURATION_SECONDS.labels(resultado=resultado_metrica).observe(time.perf_counter() - inicio)
+
+    async def atualizar(self) -> SnapshotPrecos | None:
+        """
+        Executa imediatamente um ciclo de atualização.
+
+        Returns:
+            SnapshotPrecos | None: O novo snapshot, ou None se o ciclo falhou.
+        """
+        async with self._lock:
+            return await self._atualizar_com_lock()
+
+    async def obter_snapshot(self) -> SnapshotPrecos | None:
+        """
+        Retorna o snapshot atual, mesmo defasado (a revalidação acontece em segundo plano).
+
+        No cold start, serve o último dado válido conhecido (`carregar_ultimo_valido`); se
+        não houver, aguarda uma atualização, compartilhada pelas requisições concorrentes.
+        Uma falha recente (`NEGATIVE_CACHE_SECONDS`) é devolvida sem nova tentativa.
+
+        Returns:
+            SnapshotPrecos | None: Snapshot publicado, ou None se a atualização falhou.
+        """
+        if self._snapshot is not None:
+            self._revalidar_em_segundo_plano()
+            self._reaplicar_regras_em_segundo_plano()
+            return self._snapshot
+        if await self.carregar_ultimo_valido() is not None:
+            self._revalidar_em_segundo_plano()
+            return self._snapshot
+        async with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            if self._falha_recente():
+                return None
+            return await self._atualizar_com_lock()
+
+    async def _executar_periodicamente(self, intervalo: float):
+        """
+        Loop do agendador: atualiza e dorme pelo intervalo configurado.
+
+        Com o snapshot compartilhado, os workers que não são o líder apenas acompanham
+        o arquivo publicado (e tentam assumir a liderança) a cada `SNAPSHOT_POLL_SECONDS`.
+        """
+        while True:
+            espera = intervalo
+            try:
+                if self._compartilhado is None or self._compartilhado.assumir_lideranca():
+                    # Enquanto a ANP responde, o último dado válido já fica disponível
+                    await self.carregar_ultimo_valido()
+                    await self.atualizar()
+                else:
+                    self.carregar_compartilhado()
+                    espera = settings.SNAPSHOT_POLL_SECONDS
+            except Exception as e:
+                logger.error(f"[Refresher] Erro inesperado no ciclo de atualização: {e}", status="refresh_error")
+            await asyncio.sleep(espera)
+
+    def iniciar(self):
+        """Inicia o agendador em segundo plano, se habilitado em `settings.REFRESH_ENABLED`."""
+        if not settings.REFRESH_ENABLED:
+            logger.info("[Refresher] Atualização em segundo plano desabilitada.", status="refresher_disabled")
+            return
+        if self._tarefa is None or self._tarefa.done():
+            # Snapshot já publicado (outro worker ou execução anterior): servido desde o início
+            self.carregar_compartilhado(forcar=True)
+            intervalo = settings.REFRESH_INTERVAL_SECONDS
+            self._tarefa = asyncio.create_task(self._executar_periodicamente(intervalo))
+            logger.info(f"[Refresher] Agendador iniciado (intervalo de {intervalo}s).", status="refresher_started")
+
+    async def parar(self):
+        """Cancela o agendador (e revalidações/remontagens pendentes) e aguarda seu encerramento."""
+        for tarefa in (self._revalidacao, self._reaplicacao):
+            if tarefa is not None:
+                tarefa.cancel()
+        self._revalidacao = self._reaplicacao = None
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+        if self._compartilhado is not None:
+            self._compartilhado.liberar_lideranca()
+        logger.info("[Refresher] Agendador encerrado.", status="refresher_stopped")
+
+_compartilhar = settings.WORKERS > 1 or settings.SNAPSHOT_SHARED_ENABLED
+atualizador = AtualizadorPrecos(ArmazenamentoSnapshot(settings.SNAPSHOT_DIR) if _compartilhar else None)
+registrar_medidor(SNAPSHOT_AGE_SECONDS, atualizador.idade_snapshot)
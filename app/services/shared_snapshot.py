@@ -0,0 +1,254 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+from app.services.http_cache import RespostaPreSerializada
+from app.services.logger import setup_logger
+
+if TYPE_CHECKING:
+    from app.services.refresher import SnapshotPrecos
+
+logger = setup_logger(__name__)
+
+# Layout do arquivo: MAGICO | tamanho do cabeçalho (uint32) | cabeçalho JSON | seções.
+# As seções (corpo, corpo gzip, índice e os corpos dos conjuntos nomeados) são lidas por
+# fatias de um mmap: as respostas de /precos são servidas diretamente da memória
+# compartilhada pelo page cache, sem cópia.
+MAGICO = b"PRECOSNAP2\n"
+_TAMANHO_CABECALHO = struct.Struct("<I")
+
+# Arquivo com o nome do snapshot atual; trocado por rename atômico a cada publicação
+PONTEIRO = "ATUAL"
+ARQUIVO_LIDER = "lider.lock"
+
+def _serializar_indice(indice) -> bytes:
+    """Índice (estado, produto) -> dados como uma lista JSON de linhas (datas em ISO 8601)."""
+    linhas = [
+        [estado, produto, _data_iso(dados.get("dataInicial")), _data_iso(dados.get("dataFinal")), dados.get("precoMedioRevenda")]
+        for (estado, produto), dados in indice.items()
+    ]
+    return json.dumps(linhas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _data_iso(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+def _data_python(valor):
+    if isinstance(valor, str):
+        try:
+            return datetime.fromisoformat(valor)
+        except ValueError:
+            return valor
+    return valor
+
+def _desserializar_resultado(corpo: memoryview) -> MappingProxyType:
+    """Dados de `/precos` a partir do próprio corpo publicado (datas de volta para `datetime`)."""
+    return MappingProxyType({campo: _data_python(valor) for campo, valor in json.loads(bytes(corpo)).items()})
+
+def _desserializar_indice(dados: memoryview) -> MappingProxyType:
+    # O índice vira objetos Python (consultas por chave); só o corpo de /precos fica no mmap
+    return MappingProxyType({
+        (estado, produto): MappingProxyType({
+            "dataInicial": _data_python(inicial), "dataFinal": _data_python(final), "precoMedioRevenda": preco,
+        })
+        for estado, produto, inicial, final, preco in json.loads(bytes(dados))
+    })
+
+class ArmazenamentoSnapshot:
+    """
+    Snapshot de preços compartilhado entre os workers por um arquivo memory-mapped.
+
+    Um único worker (o líder, eleito por um lock de arquivo) baixa e processa cada
+    planilha e publica o resultado aqui; os demais apenas mapeiam o arquivo publicado.
+    Cada versão é gravada em um arquivo novo e o ponteiro `ATUAL` é trocado com rename
+    atômico, de modo que um leitor sempre vê uma versão completa. Arquivos de versões
+    anteriores podem ser removidos com segurança: mapeamentos já abertos continuam válidos.
+
+    Args:
+        diretorio (Path): Diretório compartilhado pelos workers (mesma máquina).
+    """
+
+    def __init__(self, diretorio: Path):
+        self.diretorio = Path(diretorio)
+        self._arquivo_lider = None
+        # Ponteiro lido por último: (nome do arquivo, atualizado_em)
+        self._carregado: tuple[str, float] | None = None
+
+    @property
+    def lider(self) -> bool:
+        """True se este processo detém o lock de líder."""
+        return self._arquivo_lider is not None
+
+    def assumir_lideranca(self) -> bool:
+        """
+        Tenta se tornar o worker que atualiza o snapshot (lock exclusivo não bloqueante).
+
+        O lock é mantido enquanto o processo viver; se o líder morrer, o sistema
+        operacional o libera e outro worker assume na próxima tentativa.
+
+        Returns:
+            bool: True se este processo é o líder.
+        """
+        if self._arquivo_lider is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # Sem flock (Windows): cada worker atualiza o próprio snapshot
+            return True
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        arquivo = open(self.diretorio / ARQUIVO_LIDER, "a+b")
+        try:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        self._arquivo_lider = arquivo
+        logger.info(f"[Snapshot] Worker {os.getpid()} assumiu a atualização do snapshot.", status="snapshot_leader")
+        return True
+
+    def liberar_lideranca(self):
+        """Libera o lock de líder (no shutdown)."""
+        if self._arquivo_lider is not None:
+            self._arquivo_lider.close()
+            self._arquivo_lider = None
+
+    def _ler_ponteiro(self) -> dict | None:
+        try:
+            return json.loads((self.diretorio / PONTEIRO).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _gravar_ponteiro(self, ponteiro: dict):
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=f".{PONTEIRO}.")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(ponteiro, f)
+        os.replace(temporario, self.diretorio / PONTEIRO)
+
+    def publicar(self, snapshot: "SnapshotPrecos"):
+        """
+        Publica o snapshot para os demais workers (troca atômica de versão).
+
+        Se a versão (ETag) já estiver publicada, apenas o horário da atualização é renovado.
+
+        Args:
+            snapshot (SnapshotPrecos): Snapshot recém-montado pelo líder.
+        """
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        atual = self._ler_ponteiro()
+        if atual and atual.get("etag") == snapshot.resposta.etag and (self.diretorio / atual["arquivo"]).exists():
+            self._gravar_ponteiro({**atual, "atualizado_em": snapshot.atualizado_em})
+            return
+
+        partes = [
+            ("corpo", bytes(snapshot.resposta.corpo)),
+            ("corpo_gzip", bytes(snapshot.resposta.corpo_gzip or b"")),
+            ("indice", _serializar_indice(snapshot.indice)),
+        ]
+        conjuntos = {}
+        for nome_conjunto, resposta in snapshot.conjuntos.items():
+            conjuntos[nome_conjunto] = {"etag": resposta.etag, "expira_em": resposta.expira_em, "gzip": resposta.corpo_gzip is not None}
+            partes.append((f"conjunto:{nome_conjunto}", bytes(resposta.corpo)))
+            partes.append((f"conjunto_gzip:{nome_conjunto}", bytes(resposta.corpo_gzip or b"")))
+        secoes, posicao = {}, 0
+        for nome, conteudo in partes:
+            secoes[nome] = [posicao, len(conteudo)]
+            posicao += len(conteudo)
+        cabecalho = json.dumps({
+            "url": snapshot.url,
+            "caminho_arquivo": str(snapshot.caminho_arquivo),
+            "etag": snapshot.resposta.etag,
+            "expira_em": snapshot.resposta.expira_em,
+            "gzip": snapshot.resposta.corpo_gzip is not None,
+            "versao_regras": snapshot.versao_regras,
+            "conjuntos": conjuntos,
+            "secoes": secoes,
+        }, ensure_ascii=False).encode("utf-8")
+
+        nome = f"snapshot-{time.time_ns()}-{os.getpid()}.bin"
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=f".{nome}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGICO + _TAMANHO_CABECALHO.pack(len(cabecalho)) + cabecalho)
+                for _, conteudo in partes:
+                    f.write(conteudo)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.diretorio / nome)
+        except BaseException:
+            Path(temporario).unlink(missing_ok=True)
+            raise
+
+        self._gravar_ponteiro({"arquivo": nome, "etag": snapshot.resposta.etag, "atualizado_em": snapshot.atualizado_em})
+        for antigo in self.diretorio.glob("snapshot-*.bin"):
+            if antigo.name != nome:
+                antigo.unlink(missing_ok=True)
+        logger.info(f"[Snapshot] Versão {snapshot.resposta.etag} publicada para os workers.", status="snapshot_shared")
+
+    def carregar(self, forcar: bool = False) -> dict | None:
+        """
+        Mapeia o snapshot publicado, se ele mudou desde a última leitura.
+
+        Args:
+            forcar (bool): Mapeia o snapshot atual mesmo que ele já tenha sido lido.
+
+        Returns:
+            dict | None: Campos de um `SnapshotPrecos` (`resposta.corpo` é uma fatia do mmap),
+                         ou None se não houver snapshot publicado ou nada tiver mudado.
+        """
+        ponteiro = self._ler_ponteiro()
+        if not ponteiro:
+            return None
+        chave = (ponteiro["arquivo"], ponteiro["atualizado_em"])
+        if chave == self._carregado and not forcar:
+            return None
+
+        try:
+            with open(self.diretorio / ponteiro["arquivo"], "rb") as f:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            # Versão substituída entre a leitura do ponteiro e a abertura: tenta na próxima
+            logger.warning(f"[Snapshot] Não foi possível mapear {ponteiro['arquivo']}: {e}")
+            return None
+        if mapa[:len(MAGICO)] != MAGICO:
+            logger.error(f"[Snapshot] Arquivo {ponteiro['arquivo']} com formato desconhecido.")
+            return None
+
+        inicio = len(MAGICO) + _TAMANHO_CABECALHO.size
+        (tamanho,) = _TAMANHO_CABECALHO.unpack_from(mapa, len(MAGICO))
+        cabecalho = json.loads(mapa[inicio:inicio + tamanho])
+        dados = memoryview(mapa)[inicio + tamanho:]
+
+        def secao(nome: str) -> memoryview:
+            posicao, comprimento = cabecalho["secoes"][nome]
+            return dados[posicao:posicao + comprimento]
+
+        self._carregado = chave
+        return {
+            "url": cabecalho["url"],
+            "caminho_arquivo": Path(cabecalho["caminho_arquivo"]),
+            "resultado": _desserializar_resultado(secao("corpo")),
+            "atualizado_em": ponteiro["atualizado_em"],
+            "indice": _desserializar_indice(secao("indice")),
+            "resposta": RespostaPreSerializada(
+                etag=cabecalho["etag"],
+                corpo=secao("corpo"),
+                corpo_gzip=secao("corpo_gzip") if cabecalho["gzip"] else None,
+                expira_em=cabecalho["expira_em"],
+            ),
+            "conjuntos": MappingProxyType({
+                nome: RespostaPreSerializada(
+                    etag=meta["etag"],
+                    corpo=secao(f"conjunto:{nome}"),
+                    corpo_gzip=secao(f"conjunto_gzip:{nome}") if meta["gzip"] else None,
+                    expira_em=meta["expira_em"],
+                )
+                for nome, meta in cabecalho["conjuntos"].items()
+            }),
+            "versao_regras": cabecalho["versao_regras"],
+        }
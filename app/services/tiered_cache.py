@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
+from app.core.config import settings
+from app.services.logger import setup_logger
+from app.services.metrics import CACHE_TIER_EVICTIONS_TOTAL, CACHE_TIER_REQUESTS_TOTAL
+from app.services.redis_client import INDISPONIVEL, ClienteRedis, cliente_redis, erros_conexao
+
+logger = setup_logger(__name__)
+
+# Mensagem de invalidação que descarta todo o L1 (em vez de uma chave)
+TODAS = "*"
+
+class _Entrada(NamedTuple):
+    valor: str | None  # None: entrada negativa (chave ausente no L2)
+    expira_em: float  # time.monotonic()
+
+class CacheDoisNiveis:
+    """
+    Cache em dois níveis: LRU com TTL por chave na memória do processo (L1) na frente do Redis (L2).
+
+    Uma consulta só vai ao Redis quando a chave não está no L1. Valores lidos do Redis
+    entram no L1 com o TTL informado pelo chamador (ex: até o próximo domingo, o mesmo
+    da chave no Redis) e ausências entram como entradas negativas de TTL curto. Com o
+    Redis desabilitado ou indisponível, o L1 continua atendendo sozinho.
+
+    Cada gravação publica a chave no canal de invalidação (pub/sub): as outras réplicas
+    descartam a cópia local e leem o valor novo do Redis na próxima consulta. Ao
+    (re)conectar ao canal, o L1 inteiro é descartado, pois mensagens podem ter se perdido.
+
+    Args:
+        nome (str): Rótulo do cache nas métricas.
+        redis (ClienteRedis): Cliente do L2.
+    """
+
+    def __init__(self, nome: str, redis: ClienteRedis = cliente_redis):
+        self.nome = nome
+        self._redis = redis
+        self._entradas: OrderedDict[str, _Entrada] = OrderedDict()
+        # Identifica as mensagens publicadas por este processo (ignoradas na escuta)
+        self._origem = uuid.uuid4().hex
+        self._tarefa: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def _contar(self, camada: str, resultado: str):
+        CACHE_TIER_REQUESTS_TOTAL.labels(cache=self.nome, camada=camada, resultado=resultado).inc()
+
+    def _remover(self, chave: str, motivo: str):
+        if self._entradas.pop(chave, None) is not None:
+            CACHE_TIER_EVICTIONS_TOTAL.labels(cache=self.nome, camada="l1", motivo=motivo).inc()
+
+    def _guardar(self, chave: str, valor: str | None, ttl: float):
+        if ttl <= 0:
+            return
+        self._entradas[chave] = _Entrada(valor, time.monotonic() + ttl)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > settings.CACHE_L1_MAX_ENTRIES:
+            self._remover(next(iter(self._entradas)), "capacidade")
+
+    def _consultar_l1(self, chave: str) -> _Entrada | None:
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if entrada.expira_em <= time.monotonic():
+            self._remover(chave, "expiracao")
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada
+
+    async def obter(self, chave: str, ttl: float | None = None, padrao=None):
+        """
+        Busca a chave no L1 e, se ausente, no Redis.
+
+        Args:
+            chave (str): Chave do cache.
+            ttl (float | None): Validade no L1 de um valor lido do Redis; por padrão,
+                `CACHE_L1_TTL_SECONDS`. Não deve ultrapassar o TTL da chave no Redis.
+            padrao: Retornado quando a chave não está no L1 e o Redis está indisponível.
+
+        Returns:
+            O valor em cache, None se a chave não existir, ou `padrao`.
+        """
+        entrada = self._consultar_l1(chave)
+        if entrada is not None:
+            self._contar("l1", "hit" if entrada.valor is not None else "negativo")
+            return entrada.valor
+        self._contar("l1", "miss")
+
+        valor = await self._redis.executar(lambda r: r.get(chave), padrao=INDISPONIVEL)
+        if valor is INDISPONIVEL:
+            self._contar("l2", "indisponivel")
+            return padrao
+        if valor is None:
+            self._contar("l2", "miss")
+            self._guardar(chave, None, settings.CACHE_NEGATIVE_TTL_SECONDS)
+            return None
+        self._contar("l2", "hit")
+        self._guardar(chave, valor, settings.CACHE_L1_TTL_SECONDS if ttl is None else ttl)
+        return valor
+
+    async def definir(self, chave: str, valor: str, ttl: float) -> bool:
+        """
+        Grava a chave nos dois níveis com o mesmo TTL e invalida a cópia das outras réplicas.
+
+        Returns:
+            bool: True se a chave foi gravada no Redis.
+        """
+        self._guardar(chave, valor, ttl)
+        gravado = await self._redis.executar(lambda r: r.setex(chave, max(1, int(ttl)), valor))
+        if gravado:
+            await self._publicar(chave)
+        return bool(gravado)
+
+    def descartar_local(self, chave: str | None = None):
+        """Descarta uma chave (ou, sem chave, todas) do L1 deste processo."""
+        for removida in ([chave] if chave is not None else list(self._entradas)):
+            self._remover(removida, "invalidacao")
+
+    async def invalidar(self, chave: str):
+        """Remove a chave dos dois níveis, em todas as réplicas."""
+        self.descartar_local(chave)
+        if await self._redis.executar(lambda r: r.delete(chave)):
+            CACHE_TIER_EVICTIONS_TOTAL.labels(cache=self.nome, camada="l2", motivo="invalidacao").inc()
+        await self._publicar(chave)
+
+    async def _publicar(self, chave: str):
+        mensagem = json.dumps({"origem": self._origem, "cache": self.nome, "chave": chave})
+        await self._redis.executar(lambda r: r.publish(settings.CACHE_INVALIDATION_CHANNEL, mensagem))
+
+    def aplicar_invalidacao(self, mensagem: str):
+        """Aplica uma mensagem do canal de invalidação recebida de outra réplica."""
+        try:
+            dados = json.loads(mensagem)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(dados, dict) or dados.get("origem") == self._origem or dados.get("cache") != self.nome:
+            return
+        chave = dados.get("chave")
+        self.descartar_local(None if chave == TODAS else chave)
+
+    async def _escutar(self):
+        """
+        Assina o canal de invalidação e refaz a assinatura após qualquer falha.
+
+        Falhas de conexão contam no disjuntor do Redis; qualquer outro erro é registrado
+        e a escuta continua (a nova assinatura descarta o L1, como numa reconexão).
+        """
+        while True:
+            cliente = self._redis.disponivel()
+            if cliente is None:
+                await asyncio.sleep(settings.REDIS_BREAKER_RESET_SECONDS)
+                continue
+            pubsub = cliente.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                self.descartar_local()
+                logger.info(f"[Cache] Invalidações de '{self.nome}' assinadas.", status="cache_invalidation_subscribed")
+                while True:
+                    mensagem = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if mensagem and mensagem.get("type") == "message":
+                        self.aplicar_invalidacao(mensagem["data"])
+            except erros_conexao() as e:
+                self._redis.disjuntor.registrar_falha()
+                logger.warning(f"[Cache] Canal de invalidação indisponível: {e}.", status="cache_invalidation_lost")
+            except Exception as e:
+                logger.error(f"[Cache] Erro inesperado na escuta de invalidações de '{self.nome}': {e}", status="cache_invalidation_error")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception as e:
+                    logger.warning(f"[Cache] Falha ao fechar a assinatura de invalidações: {e}")
+            await asyncio.sleep(settings.REDIS_BREAKER_RESET_SECONDS)
+
+    def iniciar(self):
+        """Inicia a escuta do canal de invalidação, se o Redis estiver habilitado."""
+        if not self._redis.habilitado:
+            return
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.create_task(self._escutar())
+
+    async def parar(self):
+        """Cancela a escuta do canal de invalidação."""
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
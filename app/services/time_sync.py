@@ -1,40 +1,145 @@
-import ntplib
-from datetime import datetime, timezone
+import asyncio
 import socket
+import time
+import warnings
+import ntplib
+from datetime import datetime
 from app.services.logger import setup_logger
+from app.services.metrics import CLOCK_OFFSET_SECONDS, CLOCK_SYNC_AGE_SECONDS, CLOCK_SYNC_FAILURES_TOTAL, registrar_medidor
+from app.core.config import settings
 
 logger = setup_logger(__name__)
 
-def get_current_time(server: str = "pool.ntp.org") -> datetime:
+def medir_offset_ntp(server: str, timeout: float) -> float:
+    """
+    Mede a diferença entre o relógio do servidor NTP e o relógio local (bloqueante).
+
+    Args:
+        server (str): Endereço do servidor NTP.
+        timeout (float): Timeout da consulta, em segundos.
+
+    Returns:
+        float: Offset em segundos (positivo se o relógio local está atrasado).
+
+    Raises:
+        ntplib.NTPException, OSError: Se o servidor não responder.
+    """
+    response = ntplib.NTPClient().request(server, version=3, timeout=timeout)
+    return response.offset
+
+class RelogioSincronizado:
+    """
+    Relógio com offset NTP medido em segundo plano e mantido em cache.
+
+    A leitura (`agora`) não faz I/O: soma ao instante da última sincronização o tempo
+    decorrido no relógio monotônico, de modo que ajustes no relógio do sistema entre
+    sincronizações não afetam o resultado. Antes da primeira sincronização bem-sucedida
+    (ou se o NTP estiver inacessível desde o início) vale o relógio local (`time.time()`).
+    """
+
+    def __init__(self):
+        self._offset = 0.0
+        # Base da extrapolação monotônica; definida pela primeira sincronização bem-sucedida
+        self._base_epoch = 0.0
+        self._base_monotonica = 0.0
+        self._sincronizado_em: float | None = None
+        self._tarefa: asyncio.Task | None = None
+
+    @property
+    def offset(self) -> float:
+        """Offset (segundos) da última sincronização bem-sucedida."""
+        return self._offset
+
+    def idade_sincronizacao(self) -> float:
+        """Segundos desde a última sincronização bem-sucedida (+Inf se nunca sincronizou)."""
+        if self._sincronizado_em is None:
+            return float("inf")
+        return time.monotonic() - self._sincronizado_em
+
+    def agora_epoch(self) -> float:
+        """Epoch (segundos) corrigido pelo offset, sem I/O (o relógio local, antes da primeira sincronização)."""
+        if self._sincronizado_em is None:
+            return time.time()
+        return self._base_epoch + (time.monotonic() - self._base_monotonica)
+
+    def agora(self) -> datetime:
+        """Hora atual corrigida pelo offset, como datetime local naive (mesmo formato de `datetime.now()`)."""
+        return datetime.fromtimestamp(self.agora_epoch())
+
+    def sincronizar(self, server: str | None = None) -> bool:
+        """
+        Consulta o servidor NTP e atualiza o offset em cache (bloqueante; rode em thread).
+
+        Em caso de falha, o offset anterior é mantido.
+
+        Args:
+            server (str | None): Servidor NTP; por padrão, `settings.NTP_SERVER`.
+
+        Returns:
+            bool: True se a sincronização foi bem-sucedida.
+        """
+        server = server or settings.NTP_SERVER
+        try:
+            offset = medir_offset_ntp(server, settings.NTP_TIMEOUT_SECONDS)
+        except (ntplib.NTPException, socket.gaierror, socket.timeout, OSError) as e:
+            CLOCK_SYNC_FAILURES_TOTAL.inc()
+            logger.warning(f"Falha ao obter hora via NTP ({server}): {e}. Mantendo offset de {self._offset:.3f}s.")
+            return False
+
+        # Rebaseia o relógio monotônico no instante corrigido desta medição
+        self._base_monotonica = time.monotonic()
+        self._base_epoch = time.time() + offset
+        self._offset = offset
+        self._sincronizado_em = self._base_monotonica
+        CLOCK_OFFSET_SECONDS.set(offset)
+        logger.info(f"[Relógio] Offset NTP ({server}): {offset:.3f}s", status="clock_synced")
+        return True
+
+    async def _sincronizar_periodicamente(self, intervalo: float):
+        """Loop de sincronização; após uma falha, tenta novamente em no máximo 60s."""
+        while True:
+            sucesso = await asyncio.to_thread(self.sincronizar)
+            await asyncio.sleep(intervalo if sucesso else min(intervalo, 60))
+
+    def iniciar(self):
+        """Inicia a sincronização em segundo plano, se habilitada em `settings.CLOCK_SYNC_ENABLED`."""
+        if not settings.CLOCK_SYNC_ENABLED:
+            logger.info("[Relógio] Sincronização NTP desabilitada; usando o relógio local.", status="clock_sync_disabled")
+            return
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.create_task(self._sincronizar_periodicamente(settings.NTP_SYNC_INTERVAL_SECONDS))
+
+    async def parar(self):
+        """Cancela a sincronização em segundo plano."""
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        try:
+            await self._tarefa
+        except asyncio.CancelledError:
+            pass
+        self._tarefa = None
+
+relogio = RelogioSincronizado()
+registrar_medidor(CLOCK_SYNC_AGE_SECONDS, relogio.idade_sincronizacao)
+
+def get_current_time(server: str | None = None) -> datetime:
     """
-    Obtém a hora atual precisa a partir de um servidor NTP.
+    Obtém a hora atual corrigida pelo offset NTP em cache.
 
-    Tenta conectar ao servidor NTP especificado para obter o timestamp.
-    Em caso de falha (timeout, erro de rede), realiza fallback para o relógio local do sistema.
+    Não faz I/O: o offset é medido em segundo plano por `relogio` (ver `iniciar`).
+    Sem sincronização bem-sucedida, equivale ao relógio local do sistema.
 
     Args:
-        server (str): Endereço do servidor NTP (padrão: "pool.ntp.org").
+        server (str | None): Obsoleto e ignorado; o servidor é `settings.NTP_SERVER`.
 
     Returns:
         datetime: Objeto datetime representando a hora atual (local naive).
     """
-    try:
-        client = ntplib.NTPClient()
-        # Timeout de 5 segundos para não travar a aplicação
-        response = client.request(server, version=3, timeout=5)
-
-        # Converte timestamp NTP para datetime com timezone UTC
-        ntp_time = datetime.fromtimestamp(response.tx_time, timezone.utc)
-
-        # Converte para local time (naive) se necessário, ou mantém offset-aware
-        # Para compatibilidade com datetime.now(), vamos retornar local naive por enquanto,
-        # mas idealmente deveríamos usar UTC em todo o sistema.
-        # O projeto usa datetime.now() que é naive system time.
-        # Vamos converter para local naive para manter consistência.
-        local_time = ntp_time.astimezone().replace(tzinfo=None)
-
-        return local_time
-
-    except (ntplib.NTPException, socket.gaierror, socket.timeout, Exception) as e:
-        logger.warning(f"Falha ao obter hora via NTP ({server}): {e}. Usando relógio local.")
-        return datetime.now()
+    if server is not None:
+        warnings.warn(
+            "O parâmetro 'server' de get_current_time() é ignorado; configure NTP_SERVER.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+    return relogio.agora()
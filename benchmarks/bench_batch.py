@@ -0,0 +1,67 @@
+"""
+Benchmark: N consultas sequenciais em /precos/{estado}/{produto} vs um único POST /precos/batch.
+
+Publica um snapshot com todos os pares (estado, produto) da aba ESTADOS e mede,
+dentro do processo (TestClient, sem rede), o custo por consulta de cada abordagem.
+
+Uso:
+    python -m benchmarks.bench_batch [--consultas 100] [--repeticoes 5]
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.refresher import atualizador
+from benchmarks.planilhas_sinteticas import ESTADOS, PRODUTOS
+
+def publicar_snapshot():
+    """Publica um snapshot sintético com todos os pares da aba ESTADOS."""
+    indice = {
+        (estado, produto): {"dataInicial": datetime(2025, 12, 7), "dataFinal": datetime(2025, 12, 13), "precoMedioRevenda": 6.0}
+        for estado, produto in itertools.product(ESTADOS, PRODUTOS)
+    }
+    with patch("app.services.refresher.baixar_arquivo_async", return_value=("http://local/planilha.xlsx", None, None, "planilha.xlsx")), \
+         patch("app.services.refresher.extrair_conjuntos", return_value={"padrao": indice[(ESTADOS[0], PRODUTOS[0])]}), \
+         patch("app.services.refresher.extrair_indice", return_value=indice):
+        asyncio.run(atualizador.atualizar())
+
+def medir(funcao, repeticoes: int) -> float:
+    """Retorna a latência mediana em ms."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+def main(consultas: int, repeticoes: int):
+    publicar_snapshot()
+    pares = list(itertools.islice(itertools.cycle(itertools.product(ESTADOS, PRODUTOS)), consultas))
+    client = TestClient(app)
+
+    def sequencial():
+        for estado, produto in pares:
+            assert client.get(f"/precos/{estado}/{produto}").status_code == 200
+
+    def lote():
+        assert client.post("/precos/batch", json=[{"estado": e, "produto": p} for e, p in pares]).status_code == 200
+
+    tempo_sequencial, tempo_lote = medir(sequencial, repeticoes), medir(lote, repeticoes)
+    print(f"{'abordagem':<28}{'total (ms)':>12}{'por consulta (ms)':>20}")
+    print(f"{'sequencial (GET)':<28}{tempo_sequencial:>12.1f}{tempo_sequencial / consultas:>20.3f}")
+    print(f"{'lote (POST /precos/batch)':<28}{tempo_lote:>12.1f}{tempo_lote / consultas:>20.3f}")
+    print(f"\nGanho por consulta: {tempo_sequencial / tempo_lote:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultas", type=int, default=100)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+    main(args.consultas, args.repeticoes)
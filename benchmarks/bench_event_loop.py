@@ -0,0 +1,119 @@
+"""
+Benchmark: latência do event loop durante requisições "frias" concorrentes à ANP.
+
+Compara o caminho antigo (download bloqueante com `requests` dentro de uma corrotina)
+com o `baixar_arquivo_async` (cliente httpx compartilhado com pool keep-alive).
+A ANP é simulada por um servidor HTTP local com latência artificial.
+
+Uso:
+    python -m benchmarks.bench_event_loop [--concorrencia 20] [--latencia 0.2]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+from app.services import downloader
+
+TAMANHO_PLANILHA = 256 * 1024
+
+def iniciar_servidor_anp(latencia: float) -> tuple[ThreadingHTTPServer, str]:
+    """Sobe um servidor local que imita a página de busca e as planilhas da ANP."""
+    sequencia = count()
+    conteudo = b"x" * TAMANHO_PLANILHA
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latencia)
+            if self.path.startswith("/arquivos/"):
+                corpo = conteudo
+            else:
+                # Cada busca aponta para uma semana nova: toda requisição é um cache miss
+                base = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+                corpo = f'<a href="{base}/arquivos/resumo_semanal_{next(sequencia)}.xlsx">x</a>'.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address
+    return servidor, f"http://{host}:{porta}/busca"
+
+async def medir_atrasos(parar: asyncio.Event, intervalo: float = 0.005) -> list[float]:
+    """Mede o atraso (ms) do event loop em acordar de um `sleep(intervalo)`."""
+    atrasos = []
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atrasos.append((time.perf_counter() - inicio - intervalo) * 1000)
+    return atrasos
+
+async def requisicao_bloqueante(url_busca: str, destino: Path):
+    """Reproduz o caminho antigo: `requests` síncrono chamado de dentro do handler async."""
+    sessao = requests.Session()
+    pagina = sessao.get(url_busca, timeout=15)
+    url = pagina.text.split('href="')[1].split('"')[0]
+    (destino / url.split("/")[-1]).write_bytes(sessao.get(url, timeout=15).content)
+
+async def executar_cenario(nome: str, concorrencia: int, fabrica) -> dict:
+    """Executa `concorrencia` requisições frias em paralelo medindo o event loop."""
+    parar = asyncio.Event()
+    monitor = asyncio.create_task(medir_atrasos(parar))
+    await asyncio.sleep(0.05)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(fabrica() for _ in range(concorrencia)))
+    total = time.perf_counter() - inicio
+
+    parar.set()
+    atrasos = sorted(await monitor)
+    return {
+        "cenario": nome,
+        "total_s": round(total, 3),
+        "lag_p50_ms": round(statistics.median(atrasos), 2),
+        "lag_p99_ms": round(atrasos[int(len(atrasos) * 0.99) - 1], 2),
+        "lag_max_ms": round(atrasos[-1], 2),
+    }
+
+async def main(concorrencia: int, latencia: float):
+    servidor, url_busca = iniciar_servidor_anp(latencia)
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = Path(tmp)
+        with patch.object(downloader, "SEARCH_URL", url_busca), \
+             patch.object(downloader, "OUTPUT_DIR", destino), \
+             patch.object(downloader.settings, "REDIS_ENABLED", False):
+            resultados = [
+                await executar_cenario("requests (bloqueante)", concorrencia, lambda: requisicao_bloqueante(url_busca, destino)),
+            ]
+            cliente = downloader.criar_cliente_http()
+            async with cliente:
+                resultados.append(
+                    await executar_cenario("httpx (assíncrono, pool)", concorrencia, lambda: downloader.baixar_arquivo_async(cliente))
+                )
+    servidor.shutdown()
+
+    print(f"{'cenário':<28}{'total (s)':>10}{'lag p50':>10}{'lag p99':>10}{'lag máx':>10}")
+    for r in resultados:
+        print(f"{r['cenario']:<28}{r['total_s']:>10}{r['lag_p50_ms']:>10}{r['lag_p99_ms']:>10}{r['lag_max_ms']:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência simulada da ANP (s)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concorrencia, args.latencia))
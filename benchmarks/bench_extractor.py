@@ -0,0 +1,68 @@
+"""
+Benchmark: motores de extração "pandas" vs "streaming" em planilhas no formato da ANP.
+
+Mede a latência (mediana de N execuções) e o pico de memória (tracemalloc) de cada
+motor, chamando-os diretamente (sem o cache de resultados). Inclui também a leitura
+da cópia colunar ("colunar"), após a ingestão da planilha.
+
+Uso:
+    python -m benchmarks.bench_extractor [--repeticoes 5]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.services.columnar import carregar_tabela
+from app.services.downloader import calcular_hash_arquivo
+from app.services.extractor import (
+    _resolver_regras, extrair_dados_colunar, extrair_dados_pandas, extrair_dados_streaming, ingerir_planilha,
+)
+from benchmarks.planilhas_sinteticas import gerar_planilha_anp
+
+CENARIOS = {
+    "ESTADOS (tamanho real)": {},
+    "ESTADOS + MUNICIPIOS (20k linhas)": {"linhas_municipios": 20_000},
+    "ESTADOS ampliada (20k linhas)": {"linhas_estados": 20_000},
+}
+def extrair_dados_da_copia_colunar(caminho: Path):
+    """Lê a cópia colunar (gerada por `ingerir_planilha`) e aplica os filtros."""
+    regras = _resolver_regras()
+    tabela = carregar_tabela(caminho, calcular_hash_arquivo(caminho), regras.sheet, regras.header_row)
+    return extrair_dados_colunar(tabela, regras)
+
+MOTORES = {"pandas": extrair_dados_pandas, "streaming": extrair_dados_streaming, "colunar": extrair_dados_da_copia_colunar}
+
+def medir(funcao, caminho: Path, repeticoes: int) -> tuple[float, float]:
+    """Retorna (latência mediana em ms, pico de memória em MiB)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(caminho)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    funcao(caminho)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tempos), pico / (1024 * 1024)
+
+def main(repeticoes: int):
+    print(f"{'cenário':<36}{'motor':<12}{'latência (ms)':>15}{'pico (MiB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for nome, parametros in CENARIOS.items():
+            caminho = gerar_planilha_anp(Path(tmp) / f"{len(nome)}.xlsx", **parametros)
+            ingerir_planilha(caminho)
+            resultados = {motor: funcao(caminho) for motor, funcao in MOTORES.items()}
+            assert resultados["pandas"] == resultados["streaming"] == resultados["colunar"], "Os motores divergiram"
+            for motor, funcao in MOTORES.items():
+                latencia, pico = medir(funcao, caminho, repeticoes)
+                print(f"{nome:<36}{motor:<12}{latencia:>15.1f}{pico:>12.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+    main(args.repeticoes)
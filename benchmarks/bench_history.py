@@ -0,0 +1,70 @@
+"""
+Benchmark: consultas por intervalo na série histórica (SQLite) com anos de dados.
+
+Popula um banco temporário com N anos de semanas (27 estados x 7 produtos por
+semana, como a aba ESTADOS) e mede a latência mediana das consultas típicas
+do endpoint /precos/historico.
+
+Uso:
+    python -m benchmarks.bench_history [--anos 12] [--repeticoes 200]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from app.services.history import HistoricoPrecos, codificar_cursor, decodificar_cursor
+from benchmarks.planilhas_sinteticas import ESTADOS, PRODUTOS
+
+def popular(historico: HistoricoPrecos, anos: int, inicio: date) -> int:
+    """Registra `anos` de semanas no histórico; retorna o total de linhas."""
+    total = 0
+    for semana in range(anos * 52):
+        data_inicial = inicio + timedelta(weeks=semana)
+        linhas = [
+            {"estado": estado, "produto": produto, "data_inicial": data_inicial,
+             "data_final": data_inicial + timedelta(days=6), "preco_medio": 5.0 + (semana % 100) / 100}
+            for estado in ESTADOS for produto in PRODUTOS
+        ]
+        total += historico.registrar_semana(linhas, f"semana-{semana}", f"semana-{semana}.xlsx")
+    return total
+
+def medir(funcao, repeticoes: int) -> float:
+    """Retorna a latência mediana em ms."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+def main(anos: int, repeticoes: int):
+    inicio = date(2013, 1, 6)
+    fim = inicio + timedelta(weeks=anos * 52 - 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        historico = HistoricoPrecos(Path(tmp) / "historico.sqlite3")
+        linhas = popular(historico, anos, inicio)
+        print(f"{linhas} linhas ({anos} anos)\n")
+
+        # Keyset: o cursor da página 10 é a chave do último item da página 9
+        ultimo_da_pagina_9 = historico.consultar(fim - timedelta(days=365), fim, limite=900)[-1]
+        apos = decodificar_cursor(codificar_cursor(ultimo_da_pagina_9))
+        consultas = {
+            "1 estado/produto, 1 ano": lambda: historico.consultar(fim - timedelta(days=365), fim, "DISTRITO FEDERAL", "GASOLINA COMUM"),
+            "1 estado/produto, série completa": lambda: historico.consultar(inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", limite=1000),
+            "todos, 1 semana (página de 100)": lambda: historico.consultar(fim - timedelta(days=6), fim),
+            "todos, 1 ano (página 10 de 100)": lambda: historico.consultar(fim - timedelta(days=365), fim, apos=apos),
+        }
+        print(f"{'consulta':<40}{'latência (ms)':>15}")
+        for nome, consulta in consultas.items():
+            print(f"{nome:<40}{medir(consulta, repeticoes):>15.3f}")
+        historico.fechar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--anos", type=int, default=12)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+    main(args.anos, args.repeticoes)
@@ -0,0 +1,105 @@
+"""
+Benchmark: custo de logging por requisição.
+
+Simula os eventos de uma requisição a /precos (início, processamento, dados servidos
+e fim, como no middleware e no handler) e mede o tempo gasto na thread da requisição
+em cada configuração:
+  * original: callsite em todos os eventos, json.dumps e escrita síncrona;
+  * fila: callsite só em avisos, orjson e escrita pela thread do listener;
+  * fila + amostragem: como acima, registrando início/fim de 10% das requisições.
+
+A saída vai para /dev/null; "total" inclui o tempo até o listener esvaziar a fila.
+
+Uso:
+    python -m benchmarks.bench_logging [--requisicoes 20000]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import structlog
+
+from app.services import logger as modulo_logger
+
+def configurar_original(stream):
+    """Pipeline anterior: CallsiteParameterAdder em todo evento, json.dumps e escrita síncrona."""
+    modulo_logger.encerrar_logging()
+    logging.basicConfig(format="%(message)s", stream=stream, level=logging.INFO, force=True)
+    structlog.configure(
+        processors=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.CallsiteParameterAdder([
+                structlog.processors.CallsiteParameter.FILENAME,
+                structlog.processors.CallsiteParameter.LINENO,
+                structlog.processors.CallsiteParameter.FUNC_NAME,
+            ]),
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.JSONRenderer(serializer=json.dumps),
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+def configurar_atual(stream):
+    """Pipeline de `app.services.logger`, escrevendo em `stream`."""
+    with patch.object(sys, "stdout", stream):
+        modulo_logger.configure_structlog()
+
+def simular_requisicoes(requisicoes: int, nome_logger: str) -> None:
+    """Emite os eventos de `requisicoes` requisições a /precos."""
+    logger = structlog.get_logger(nome_logger)
+    for i in range(requisicoes):
+        trace_id = f"{i:032x}"
+        structlog.contextvars.bind_contextvars(trace_id=trace_id)
+        registrar = modulo_logger.amostrar_requisicao()
+        if registrar:
+            logger.info("Iniciando requisição", method="GET", endpoint="/precos", trace_id=trace_id)
+        logger.info("Processando requisição para /precos")
+        logger.info("Dados servidos a partir do snapshot publicado.", status="data_served")
+        if registrar:
+            logger.info("Finalizando requisição", method="GET", endpoint="/precos", status_code=200, response_time_sec=0.0012, trace_id=trace_id)
+        structlog.contextvars.clear_contextvars()
+
+def medir(nome: str, configurar, taxa: float, requisicoes: int, stream, nome_logger: str = "app.main") -> dict:
+    # O logger da biblioteca padrão é criado com a classe vigente após `configurar`
+    # (com ou sem inspeção da pilha) e reaproveitado nas medições seguintes
+    configurar(stream)
+    with patch.object(modulo_logger.settings, "LOG_REQUEST_SAMPLE_RATE", taxa):
+        simular_requisicoes(200, nome_logger)  # aquecimento
+        inicio = time.perf_counter()
+        simular_requisicoes(requisicoes, nome_logger)
+        na_requisicao = time.perf_counter() - inicio
+        modulo_logger.encerrar_logging()
+        total = time.perf_counter() - inicio
+    return {
+        "cenario": nome,
+        "us_por_requisicao": na_requisicao / requisicoes * 1e6,
+        "total_us_por_requisicao": total / requisicoes * 1e6,
+    }
+
+def main(requisicoes: int):
+    with open(os.devnull, "w") as devnull:
+        resultados = [
+            medir("original (síncrono)", configurar_original, 1.0, requisicoes, devnull, "benchmark.original"),
+            medir("fila + orjson", configurar_atual, 1.0, requisicoes, devnull),
+            medir("fila + orjson + amostragem 10%", configurar_atual, 0.1, requisicoes, devnull),
+        ]
+    modulo_logger.configure_structlog()
+
+    print(f"{'cenário':<34}{'µs/req (requisição)':>22}{'µs/req (total)':>17}")
+    for r in resultados:
+        print(f"{r['cenario']:<34}{r['us_por_requisicao']:>22.1f}{r['total_us_por_requisicao']:>17.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.requisicoes)
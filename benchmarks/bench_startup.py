@@ -0,0 +1,115 @@
+"""
+Benchmark: custo de inicialização da aplicação.
+
+Mede, em processos novos (como em um cold start no Render):
+  * o tempo de `import app.main` reportado por `python -X importtime`, com os
+    módulos mais caros, e se alguma dependência pesada foi carregada no import;
+  * o tempo até o primeiro byte de `/health/live` com o uvicorn, contado a partir
+    do início do processo.
+
+Os limites de regressão (import e primeiro byte) são verificados em `tests/test_import_budget.py`.
+
+Uso:
+    python -m benchmarks.bench_startup [--repeticoes 5] [--porta 8765]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+# Dependências que só devem ser importadas no primeiro uso (ETL, lote, Redis)
+MODULOS_PESADOS = ("pandas", "numpy", "openpyxl", "yaml", "redis")
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+def _ambiente() -> dict[str, str]:
+    """Ambiente dos processos medidos: sem agendador, NTP ou Redis, e histórico temporário."""
+    ambiente = dict(os.environ)
+    ambiente.setdefault("REFRESH_ENABLED", "false")
+    ambiente.setdefault("CLOCK_SYNC_ENABLED", "false")
+    ambiente.setdefault("REDIS_ENABLED", "false")
+    ambiente.setdefault("HISTORY_DB_PATH", str(Path(tempfile.gettempdir()) / "bench_startup.sqlite3"))
+    return ambiente
+
+def medir_importacao() -> tuple[float, list[tuple[float, str]], list[str]]:
+    """
+    Importa `app.main` em um processo novo com `-X importtime`.
+
+    Returns:
+        tuple: (segundos do import de app.main, [(segundos, módulo)] dos mais caros,
+                módulos pesados carregados no import).
+    """
+    codigo = f"import sys, app.main; print('carregados=' + ','.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))"
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, env=_ambiente(), capture_output=True, text=True, check=True,
+    )
+    modulos = []
+    total = 0.0
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.removeprefix("import time:").split("|")
+        if not acumulado.strip().isdigit():
+            continue
+        segundos = int(acumulado) / 1_000_000
+        modulos.append((segundos, nome.strip()))
+        if nome.strip() == "app.main":
+            total = segundos
+    # Logs emitidos no import também vão para o stdout; o resultado é a linha marcada
+    marcada = next((linha for linha in processo.stdout.splitlines() if linha.startswith("carregados=")), "carregados=")
+    carregados = [m for m in marcada.removeprefix("carregados=").split(",") if m]
+    return total, sorted(modulos, reverse=True)[:10], carregados
+
+def porta_livre() -> int:
+    """Porta TCP livre em 127.0.0.1 para o uvicorn medido."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def medir_primeiro_byte(porta: int, limite: float = 30.0) -> float:
+    """Segundos entre iniciar o uvicorn e receber a primeira resposta 200 de /health/live."""
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta), "--log-level", "warning"],
+        cwd=RAIZ, env=_ambiente(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < limite:
+            try:
+                if httpx.get(f"http://127.0.0.1:{porta}/health/live", timeout=1).status_code == 200:
+                    return time.perf_counter() - inicio
+            except httpx.TransportError:
+                time.sleep(0.005)
+        raise TimeoutError(f"/health/live não respondeu em {limite}s")
+    finally:
+        processo.terminate()
+        processo.wait()
+
+def main(repeticoes: int, porta: int | None):
+    importacoes = []
+    for _ in range(repeticoes):
+        total, mais_caros, carregados = medir_importacao()
+        importacoes.append(total)
+    print(f"import app.main: mediana {statistics.median(importacoes) * 1000:.0f} ms, mínimo {min(importacoes) * 1000:.0f} ms")
+    print(f"dependências pesadas carregadas no import: {', '.join(carregados) or 'nenhuma'}\n")
+    print(f"{'módulo (acumulado)':<40}{'ms':>8}")
+    for segundos, nome in mais_caros:
+        print(f"{nome:<40}{segundos * 1000:>8.0f}")
+
+    primeiros_bytes = [medir_primeiro_byte(porta or porta_livre()) for _ in range(repeticoes)]
+    print(f"\nprimeiro byte de /health/live: mediana {statistics.median(primeiros_bytes) * 1000:.0f} ms, mínimo {min(primeiros_bytes) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--porta", type=int, default=None)
+    args = parser.parse_args()
+    main(args.repeticoes, args.porta)
@@ -0,0 +1,147 @@
+"""
+Benchmark: vazão de /precos com 1 worker versus N workers.
+
+Publica um snapshot sintético em um diretório temporário (como faria o worker
+líder), sobe `python -m app` com `WORKERS=1` e depois com `WORKERS=N` (agendador
+desligado e `SNAPSHOT_SHARED_ENABLED`: todos servem o snapshot compartilhado) e
+dispara requisições concorrentes contra `/precos` e `/precos/{estado}/{produto}`.
+
+A vazão com N workers só escala com núcleos livres: o gerador de carga roda na
+mesma máquina e disputa a CPU com o servidor.
+
+Uso:
+    python -m benchmarks.bench_workers [--workers 4] [--duracao 5] [--concorrencia 64]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
+
+import httpx
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CHAVE = ("DISTRITO FEDERAL", "GASOLINA COMUM")
+ROTAS = ("/precos", "/precos/BAHIA/ETANOL%20HIDRATADO")
+
+def publicar_snapshot_sintetico(diretorio: Path):
+    """Publica um snapshot com todos os estados para dois produtos."""
+    from app.services.http_cache import preparar_resposta
+    from app.services.refresher import SnapshotPrecos
+    from app.services.shared_snapshot import ArmazenamentoSnapshot
+
+    estados = ["DISTRITO FEDERAL", "BAHIA", "GOIAS", "MINAS GERAIS", "SAO PAULO", "PARANA", "PARA", "CEARA"]
+    indice = {
+        (estado, produto): MappingProxyType({
+            "dataInicial": datetime(2025, 12, 7), "dataFinal": datetime(2025, 12, 13), "precoMedioRevenda": 5.0 + i / 10,
+        })
+        for i, (estado, produto) in enumerate((e, p) for e in estados for p in ("GASOLINA COMUM", "ETANOL HIDRATADO"))
+    }
+    snapshot = SnapshotPrecos(
+        url="http://bench/planilha.xlsx",
+        caminho_arquivo=Path("planilha.xlsx"),
+        resultado=indice[CHAVE],
+        atualizado_em=time.time(),
+        indice=MappingProxyType(indice),
+        resposta=preparar_resposta(indice[CHAVE], "bench", 3600),
+        conjuntos=MappingProxyType({}),
+        versao_regras="bench",
+    )
+    ArmazenamentoSnapshot(diretorio).publicar(snapshot)
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _aguardar(url: str, limite: float = 30.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {limite}s")
+
+async def _carga(base: str, duracao: float, concorrencia: int) -> tuple[int, int]:
+    """Requisições concluídas e falhas em `duracao` segundos, com `concorrencia` clientes."""
+    concluidas = falhas = 0
+    fim = time.monotonic() + duracao
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=10.0) as cliente:
+        async def trabalhador(n: int):
+            nonlocal concluidas, falhas
+            while time.monotonic() < fim:
+                resposta = await cliente.get(ROTAS[n % len(ROTAS)])
+                if resposta.status_code == 200:
+                    concluidas += 1
+                else:
+                    falhas += 1
+
+        await asyncio.gather(*(trabalhador(n) for n in range(concorrencia)))
+    return concluidas, falhas
+
+def medir(workers: int, diretorio: Path, duracao: float, concorrencia: int) -> tuple[float, int]:
+    """Sobe o servidor com `workers` processos e retorna (requisições/s, falhas)."""
+    porta = _porta_livre()
+    ambiente = dict(os.environ)
+    ambiente.update({
+        "WORKERS": str(workers),
+        "PORT": str(porta),
+        "HOST": "127.0.0.1",
+        "SNAPSHOT_DIR": str(diretorio),
+        "SNAPSHOT_SHARED_ENABLED": "true",
+        "REFRESH_ENABLED": "false",
+        "CLOCK_SYNC_ENABLED": "false",
+        "REDIS_ENABLED": "false",
+        "LOG_REQUEST_SAMPLE_RATE": "0",
+        "HISTORY_DB_PATH": str(diretorio / "historico.sqlite3"),
+    })
+    ambiente.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "app"], cwd=RAIZ, env=ambiente,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{porta}"
+    try:
+        _aguardar(f"{base}/health/live")
+        # Aquecimento: cada worker mapeia o snapshot na primeira requisição
+        asyncio.run(_carga(base, 1.0, concorrencia))
+        concluidas, falhas = asyncio.run(_carga(base, duracao, concorrencia))
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+    return concluidas / duracao, falhas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--duracao", type=float, default=5.0)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"Núcleos disponíveis: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as temporario:
+        diretorio = Path(temporario)
+        publicar_snapshot_sintetico(diretorio)
+        base, _ = medir(1, diretorio, args.duracao, args.concorrencia)
+        print(f"1 worker:  {base:8.0f} req/s")
+        if args.workers > 1:
+            vazao, falhas = medir(args.workers, diretorio, args.duracao, args.concorrencia)
+            print(f"{args.workers} workers: {vazao:8.0f} req/s ({vazao / base:.2f}x, {falhas} falhas)")
+
+if __name__ == "__main__":
+    main()
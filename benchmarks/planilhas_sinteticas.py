@@ -0,0 +1,82 @@
+"""
+Gerador de planilhas sintéticas no formato do resumo semanal da ANP.
+
+Reproduz as abas, o deslocamento do cabeçalho (`header_row`) e os nomes reais das
+colunas, com volume configurável, para benchmarks do caminho de ETL.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import random
+
+import openpyxl
+
+ESTADOS = [
+    "ACRE", "ALAGOAS", "AMAPA", "AMAZONAS", "BAHIA", "CEARA", "DISTRITO FEDERAL",
+    "ESPIRITO SANTO", "GOIAS", "MARANHAO", "MATO GROSSO", "MATO GROSSO DO SUL",
+    "MINAS GERAIS", "PARA", "PARAIBA", "PARANA", "PERNAMBUCO", "PIAUI", "RIO DE JANEIRO",
+    "RIO GRANDE DO NORTE", "RIO GRANDE DO SUL", "RONDONIA", "RORAIMA", "SANTA CATARINA",
+    "SAO PAULO", "SERGIPE", "TOCANTINS",
+]
+PRODUTOS = [
+    "ETANOL HIDRATADO", "GASOLINA COMUM", "GASOLINA ADITIVADA", "GLP", "GNV",
+    "OLEO DIESEL", "OLEO DIESEL S10",
+]
+COLUNAS = [
+    "DATA INICIAL", "DATA FINAL", "ESTADOS", "PRODUTO", "NÚMERO DE POSTOS PESQUISADOS",
+    "UNIDADE DE MEDIDA", "PREÇO MÉDIO REVENDA", "DESVIO PADRÃO REVENDA",
+    "PREÇO MÍNIMO REVENDA", "PREÇO MÁXIMO REVENDA", "COEF DE VARIAÇÃO REVENDA",
+]
+HEADER_ROW = 9
+
+def _preencher_aba(aba, rotulos: list[tuple[str, str]], data_inicial: datetime, gerador: random.Random):
+    """Escreve as linhas de título, o cabeçalho (linha HEADER_ROW + 1) e os dados."""
+    aba.append(["AGÊNCIA NACIONAL DO PETRÓLEO, GÁS NATURAL E BIOCOMBUSTÍVEIS - ANP"])
+    aba.append(["SUPERINTENDÊNCIA DE DEFESA DA CONCORRÊNCIA, ESTUDOS E REGULAÇÃO ECONÔMICA - SDC"])
+    aba.append(["SISTEMA DE LEVANTAMENTO DE PREÇOS"])
+    for _ in range(HEADER_ROW - 3):
+        aba.append([])
+    aba.append(COLUNAS)
+    data_final = data_inicial + timedelta(days=6)
+    for local, produto in rotulos:
+        preco = round(gerador.uniform(3.0, 8.0), 2)
+        aba.append([
+            data_inicial, data_final, local, produto, gerador.randint(10, 900),
+            "R$/l", preco, round(gerador.uniform(0.05, 0.4), 3),
+            round(preco - 0.5, 2), round(preco + 0.7, 2), round(gerador.uniform(0.01, 0.08), 3),
+        ])
+
+def gerar_planilha_anp(
+    destino: Path,
+    linhas_estados: int | None = None,
+    linhas_municipios: int = 0,
+    data_inicial: datetime = datetime(2025, 12, 7),
+    semente: int = 42,
+) -> Path:
+    """
+    Gera uma planilha sintética com as abas ESTADOS (e, opcionalmente, MUNICIPIOS).
+
+    Args:
+        destino (Path): Caminho do .xlsx a ser gerado.
+        linhas_estados (int | None): Linhas na aba ESTADOS; por padrão, o tamanho real
+            (todos os estados x produtos). Valores maiores repetem os rótulos.
+        linhas_municipios (int): Linhas na aba MUNICIPIOS (0 para omitir a aba).
+        data_inicial (datetime): Início da semana de referência.
+        semente (int): Semente do gerador de preços (planilhas reprodutíveis).
+
+    Returns:
+        Path: O caminho da planilha gerada.
+    """
+    gerador = random.Random(semente)
+    combinacoes = [(estado, produto) for estado in ESTADOS for produto in PRODUTOS]
+    total_estados = linhas_estados or len(combinacoes)
+    rotulos_estados = [combinacoes[i % len(combinacoes)] for i in range(total_estados)]
+
+    workbook = openpyxl.Workbook(write_only=True)
+    _preencher_aba(workbook.create_sheet("CAPITAIS"), combinacoes[:50], data_inicial, gerador)
+    _preencher_aba(workbook.create_sheet("ESTADOS"), rotulos_estados, data_inicial, gerador)
+    if linhas_municipios:
+        rotulos_municipios = [(f"MUNICIPIO {i:05d}", PRODUTOS[i % len(PRODUTOS)]) for i in range(linhas_municipios)]
+        _preencher_aba(workbook.create_sheet("MUNICIPIOS"), rotulos_municipios, data_inicial, gerador)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(destino)
+    return destino
@@ -0,0 +1,236 @@
+"""
+Suíte de benchmarks do caminho de ETL, com baseline em JSON e limite de regressão.
+
+Gera planilhas sintéticas no formato da ANP (mesmas abas, `header_row` e nomes de
+colunas) em vários tamanhos e mede:
+  * `extrair_dados` a frio (sem cache de resultados nem cópia colunar): latência
+    mediana e pico de memória (tracemalloc);
+  * `extrair_indice` (leitura completa da aba configurada);
+  * o download até o disco (`baixar_arquivo_async`: página de busca + planilha em
+    streaming + verificação), contra um servidor HTTP local no lugar da ANP.
+
+Os resultados são comparados com o baseline (`benchmarks/baselines/etl.json`): uma
+métrica pior que o baseline além de `--limite` (relativo, com uma folga absoluta
+para ruído em medidas pequenas) encerra a execução com código 1. O baseline depende
+da máquina; regrave-o com `--atualizar` ao trocar de ambiente.
+
+Uso:
+    python -m benchmarks.suite [--repeticoes 5] [--limite 0.25] [--atualizar] [--baseline caminho.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from pathlib import Path
+from unittest.mock import patch
+
+from app.services import downloader
+from app.services.extractor import extrair_dados, extrair_indice, limpar_cache_resultados
+from benchmarks.planilhas_sinteticas import gerar_planilha_anp
+
+BASELINE_PADRAO = Path(__file__).resolve().parent / "baselines" / "etl.json"
+LIMITE_PADRAO = 0.25
+
+# Folga absoluta por unidade (sufixo da métrica): variações abaixo disso são ruído
+# (escalonamento do sistema operacional em medidas de poucas dezenas de ms)
+FOLGA_ABSOLUTA = {"ms": 10.0, "mib": 0.5}
+
+# Planilhas medidas: ESTADOS no tamanho real, ESTADOS ampliada e com a aba de municípios
+PLANILHAS = {
+    "estados": {},
+    "estados_20k": {"linhas_estados": 20_000},
+    "municipios_50k": {"linhas_municipios": 50_000},
+}
+PLANILHAS_DOWNLOAD = ("estados", "municipios_50k")
+
+def medir(funcao, repeticoes: int, preparar=None) -> tuple[float, float]:
+    """
+    Mede `funcao()` `repeticoes` vezes, após uma execução de aquecimento (mais uma com tracemalloc).
+
+    Args:
+        funcao: Operação medida.
+        repeticoes (int): Execuções cronometradas.
+        preparar: Chamada antes de cada execução, fora da medição (ex: limpar caches).
+
+    Returns:
+        tuple[float, float]: (latência mediana em ms, pico de memória em MiB).
+    """
+    preparar = preparar or (lambda: None)
+    preparar()
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    preparar()
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tempos), pico / (1024 * 1024)
+
+def medir_extracao(planilhas: dict[str, Path], repeticoes: int) -> dict[str, float]:
+    """Latência e pico de memória de `extrair_dados` e `extrair_indice` a frio, por planilha."""
+    resultados = {}
+    with patch.object(downloader.settings, "COLUMNAR_ENABLED", False):
+        for nome, caminho in planilhas.items():
+            assert extrair_dados(caminho), f"extrair_dados não encontrou o par padrão em {nome}"
+            latencia, pico = medir(lambda: extrair_dados(caminho), repeticoes, limpar_cache_resultados)
+            resultados[f"extrair_dados/{nome}/latencia_ms"] = latencia
+            resultados[f"extrair_dados/{nome}/pico_mib"] = pico
+            latencia, pico = medir(lambda: extrair_indice(caminho), repeticoes, limpar_cache_resultados)
+            resultados[f"extrair_indice/{nome}/latencia_ms"] = latencia
+            resultados[f"extrair_indice/{nome}/pico_mib"] = pico
+    return resultados
+
+def iniciar_servidor_anp(conteudos: dict[str, bytes]) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Sobe um servidor local que imita a página de busca e as planilhas da ANP.
+
+    `/busca/<nome>` aponta sempre para uma semana nova da planilha `<nome>`, de modo
+    que cada download é um cache miss.
+    """
+    sequencia = count()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeçalho e corpo saem em escritas separadas; com o Nagle, o atraso do ACK dominaria a medida
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            _, tipo, nome = self.path.split("/", 2)
+            if tipo == "arquivos":
+                corpo = conteudos[nome.split("-")[0]]
+            else:
+                base = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+                corpo = f'<a href="{base}/arquivos/{nome}-resumo_semanal_{next(sequencia)}.xlsx">x</a>'.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address
+    return servidor, f"http://{host}:{porta}"
+
+def medir_download(planilhas: dict[str, Path], repeticoes: int) -> dict[str, float]:
+    """Latência e pico de memória de `baixar_arquivo_async` (cache miss) contra o servidor local."""
+    conteudos = {nome: planilhas[nome].read_bytes() for nome in PLANILHAS_DOWNLOAD}
+    servidor, base = iniciar_servidor_anp(conteudos)
+    resultados = {}
+    try:
+        with tempfile.TemporaryDirectory() as destino:
+            for nome in PLANILHAS_DOWNLOAD:
+                async def baixar():
+                    async with downloader.criar_cliente_http() as cliente:
+                        url, _, _, caminho = await downloader.baixar_arquivo_async(cliente)
+                    assert caminho is not None, f"Download de {nome} falhou"
+                    Path(caminho).unlink()
+
+                with patch.object(downloader, "SEARCH_URL", f"{base}/busca/{nome}"), \
+                     patch.object(downloader, "OUTPUT_DIR", Path(destino)), \
+                     patch.object(downloader.settings, "REDIS_ENABLED", False):
+                    latencia, pico = medir(lambda: asyncio.run(baixar()), repeticoes)
+                resultados[f"download/{nome}/latencia_ms"] = latencia
+                resultados[f"download/{nome}/pico_mib"] = pico
+    finally:
+        servidor.shutdown()
+    return resultados
+
+def comparar(atual: dict[str, float], baseline: dict[str, float], limite: float) -> list[str]:
+    """
+    Lista as métricas que pioraram além do limite em relação ao baseline.
+
+    Todas as métricas são "menor é melhor". Métricas ausentes do baseline são ignoradas.
+
+    Args:
+        atual (dict[str, float]): Métricas desta execução.
+        baseline (dict[str, float]): Métricas de referência.
+        limite (float): Piora relativa tolerada (0.25 = 25%).
+
+    Returns:
+        list[str]: Descrição de cada regressão (vazia se não houver).
+    """
+    regressoes = []
+    for metrica, valor in atual.items():
+        referencia = baseline.get(metrica)
+        if referencia is None:
+            continue
+        folga = FOLGA_ABSOLUTA.get(metrica.rsplit("_", 1)[-1], 0.0)
+        if valor > referencia * (1 + limite) + folga:
+            variacao = (valor / referencia - 1) * 100 if referencia else float("inf")
+            regressoes.append(f"{metrica}: {referencia:.2f} -> {valor:.2f} (+{variacao:.0f}%)")
+    return regressoes
+
+def _ambiente() -> dict:
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "nucleos": os.cpu_count(),
+    }
+
+def executar(repeticoes: int) -> dict[str, float]:
+    """Gera as planilhas sintéticas e executa todos os benchmarks da suíte."""
+    with tempfile.TemporaryDirectory() as tmp:
+        planilhas = {nome: gerar_planilha_anp(Path(tmp) / f"{nome}.xlsx", **parametros) for nome, parametros in PLANILHAS.items()}
+        resultados = medir_extracao(planilhas, repeticoes)
+        resultados.update(medir_download(planilhas, repeticoes))
+    return {metrica: round(valor, 3) for metrica, valor in resultados.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO, help="Piora relativa tolerada (0.25 = 25%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PADRAO)
+    parser.add_argument("--atualizar", action="store_true", help="Grava os resultados como novo baseline")
+    args = parser.parse_args()
+
+    # Os logs INFO do ETL poluiriam a saída e o tempo medido
+    logging.getLogger().setLevel(logging.WARNING)
+    resultados = executar(args.repeticoes)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+    referencias = baseline["resultados"] if baseline else {}
+    print(f"{'métrica':<44}{'atual':>12}{'baseline':>12}")
+    for metrica, valor in resultados.items():
+        referencia = referencias.get(metrica)
+        coluna_baseline = f"{referencia:>12.2f}" if referencia is not None else f"{'-':>12}"
+        print(f"{metrica:<44}{valor:>12.2f}{coluna_baseline}")
+
+    if args.atualizar or baseline is None:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        conteudo = {"gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"), "ambiente": _ambiente(), "resultados": resultados}
+        args.baseline.write_text(json.dumps(conteudo, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nBaseline gravado em {args.baseline}")
+        return
+
+    if baseline.get("ambiente") != _ambiente():
+        print(f"\nAviso: baseline gerado em outro ambiente ({baseline.get('ambiente')}).")
+    regressoes = comparar(resultados, referencias, args.limite)
+    if regressoes:
+        print(f"\nRegressões acima de {args.limite:.0%}:")
+        for regressao in regressoes:
+            print(f"  {regressao}")
+        sys.exit(1)
+    print(f"\nSem regressões acima de {args.limite:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,29 @@
 import sys
 import os
+import tempfile
+import pytest
 
 # Adiciona a raiz do projeto ao path para importar 'app'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Os testes não devem acessar a ANP a partir do agendador iniciado no lifespan
+os.environ.setdefault("REFRESH_ENABLED", "false")
+os.environ.setdefault("CLOCK_SYNC_ENABLED", "false")
+# Sem Redis nos testes (os testes que dependem dele usam um cliente falso)
+os.environ.setdefault("REDIS_ENABLED", "false")
+# Cada teste responde a página de busca da ANP com um HTML próprio: sem cache da URL
+os.environ.setdefault("SCRAPE_CACHE_SECONDS", "0")
+
+# A série histórica dos testes fica em um diretório temporário, fora de OUTPUT_DIR
+os.environ.setdefault("HISTORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="precogas-"), "historico.sqlite3"))
+# Planilhas baixadas nos testes (e o último dado válido buscado no cold start) também
+os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp(prefix="precogas-dados-"))
+
+@pytest.fixture(autouse=True)
+def limpar_cache_em_memoria():
+    """Cada teste começa com o L1 do cache da ANP vazio (os caminhos apontam para o tmp_path de outro teste)."""
+    from app.services.downloader import cache_anp
+
+    cache_anp.descartar_local()
+    yield
+    cache_anp.descartar_local()
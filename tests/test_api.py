@@ -1,13 +1,30 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import pytest
+from datetime import datetime
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from app.main import app
+from app.services.refresher import atualizador
+from tests.test_extractor import criar_planilha_estados
 from fastapi import status # Importar status
+from app.core.config import settings
 
 client = TestClient(app)
 
-@patch("app.main.baixar_arquivo")
-@patch("app.main.extrair_dados")
-def test_obter_precos_sucesso(mock_extrair, mock_baixar):
+@pytest.fixture(autouse=True)
+def limpar_snapshot():
+    """Garante que cada teste comece sem snapshot publicado (cold start)."""
+    atualizador.limpar()
+    yield
+    atualizador.limpar()
+
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+def test_obter_precos_sucesso(mock_extrair, mock_conjuntos, mock_baixar):
     """
     Testa o endpoint /precos com sucesso.
     Verifica se a API retorna o JSON formatado corretamente quando
@@ -22,10 +39,13 @@ def test_obter_precos_sucesso(mock_extrair, mock_baixar):
     )
 
     mock_extrair.return_value = {
-        "dataInicial": "01/01/2025",
-        "dataFinal": "07/01/2025",
-        "precoMedioRevenda": 5.99
+        ("DISTRITO FEDERAL", "GASOLINA COMUM"): {
+            "dataInicial": "01/01/2025",
+            "dataFinal": "07/01/2025",
+            "precoMedioRevenda": 5.99
+        }
     }
+    mock_conjuntos.return_value = {"padrao": mock_extrair.return_value[("DISTRITO FEDERAL", "GASOLINA COMUM")]}
 
     response = client.get("/precos")
 
@@ -33,8 +53,39 @@ def test_obter_precos_sucesso(mock_extrair, mock_baixar):
     data = response.json()
     assert data["precoMedioRevenda"] == 5.99
     assert data["dataInicial"] == "01/01/2025"
+    assert response.headers["x-snapshot-stale"] == "false"
+    assert "stale-if-error=" in response.headers["cache-control"]
+
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+def test_obter_precos_conjunto_nomeado(mock_extrair, mock_conjuntos, mock_baixar):
+    """
+    Testa que `/precos?conjunto=<nome>` serve um conjunto nomeado de `etl_rules.yaml`
+    a partir do snapshot, com ETag própria, e 404 para um conjunto desconhecido.
+    """
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): {"dataInicial": "01/01/2025", "dataFinal": "07/01/2025", "precoMedioRevenda": 5.99}}
+    mock_conjuntos.return_value = {
+        "padrao": mock_extrair.return_value[("DISTRITO FEDERAL", "GASOLINA COMUM")],
+        "etanol_df": {"dataInicial": "01/01/2025", "dataFinal": "07/01/2025", "precoMedioRevenda": 4.29},
+    }
+
+    padrao = client.get("/precos")
+    response = client.get("/precos", params={"conjunto": "etanol_df"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["precoMedioRevenda"] == 4.29
+    assert response.headers["etag"] != padrao.headers["etag"]
+    revalidacao = client.get("/precos", params={"conjunto": "etanol_df"}, headers={"If-None-Match": response.headers["etag"]})
+    assert revalidacao.status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get("/precos", params={"conjunto": "padrao"}).json()["precoMedioRevenda"] == 5.99
 
-@patch("app.main.baixar_arquivo")
+    desconhecido = client.get("/precos", params={"conjunto": "inexistente"})
+    assert desconhecido.status_code == status.HTTP_404_NOT_FOUND
+    assert "inexistente" in desconhecido.json()["erro"]
+
+@patch("app.services.refresher.baixar_arquivo_async")
 def test_obter_precos_falha_download(mock_baixar):
     """
     Testa o comportamento da API quando o download falha.
@@ -48,6 +99,160 @@ def test_obter_precos_falha_download(mock_baixar):
     assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE # A API agora retorna 503
     assert "erro" in response.json()
     assert response.json()["erro"] == "Arquivo não encontrado no site da ANP"
+    assert int(response.headers["retry-after"]) > 0
+
+    # Cache negativo: a falha recente é devolvida sem nova tentativa na ANP
+    assert client.get("/precos").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    mock_baixar.assert_awaited_once()
+
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+def test_obter_precos_serve_snapshot_sem_acessar_anp(mock_extrair, mock_conjuntos, mock_baixar):
+    """
+    Testa que, com um snapshot publicado, o endpoint não aciona download nem extração,
+    e que uma falha posterior da ANP não derruba o endpoint (o dado defasado vai com
+    `no-cache`, para não ficar em caches como se fosse atual).
+    """
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): {"dataInicial": "01/01/2025", "dataFinal": "07/01/2025", "precoMedioRevenda": 5.99}}
+    mock_conjuntos.return_value = {"padrao": mock_extrair.return_value[("DISTRITO FEDERAL", "GASOLINA COMUM")]}
+
+    assert client.get("/precos").status_code == status.HTTP_200_OK
+
+    # ANP fora do ar: o ciclo falha, mas o snapshot anterior continua publicado
+    mock_baixar.return_value = (None, None, None, None)
+    asyncio.run(atualizador.atualizar())
+
+    response = client.get("/precos")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["precoMedioRevenda"] == 5.99
+    assert response.headers["x-snapshot-stale"] == "true"
+    assert response.headers["cache-control"].startswith("public, no-cache")
+    assert "max-age" not in response.headers["cache-control"]
+    assert mock_baixar.call_count == 2
+    assert mock_extrair.call_count == 1
+
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+def test_obter_precos_por_estado_e_produto(mock_extrair, mock_conjuntos, mock_baixar):
+    """
+    Testa a consulta parametrizada servida pelo índice do snapshot, com
+    normalização de estado/produto e 404 para pares inexistentes.
+    """
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    mock_extrair.return_value = {
+        ("DISTRITO FEDERAL", "GASOLINA COMUM"): {"dataInicial": "01/01/2025", "dataFinal": "07/01/2025", "precoMedioRevenda": 5.99},
+        ("BAHIA", "ETANOL HIDRATADO"): {"dataInicial": "01/01/2025", "dataFinal": "07/01/2025", "precoMedioRevenda": 4.19},
+    }
+    mock_conjuntos.return_value = {"padrao": mock_extrair.return_value[("DISTRITO FEDERAL", "GASOLINA COMUM")]}
+
+    response = client.get("/precos/ bahia /Etanol Hidratado")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["precoMedioRevenda"] == 4.19
+
+    response = client.get("/precos/BAHIA/GNV")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert "erro" in response.json()
+    assert mock_extrair.call_count == 1
+
+@patch("app.services.refresher.calcular_hash_arquivo", return_value="ab" * 32)
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+def test_obter_precos_etag_e_304(mock_extrair, mock_conjuntos, mock_baixar, mock_hash):
+    """
+    Testa que /precos envia ETag da versão (planilha + regras) e cabeçalhos de cache,
+    e que um If-None-Match correspondente recebe 304 sem corpo.
+    """
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): {"dataInicial": "01/01/2025", "dataFinal": "07/01/2025", "precoMedioRevenda": 5.99}}
+    mock_conjuntos.return_value = {"padrao": mock_extrair.return_value[("DISTRITO FEDERAL", "GASOLINA COMUM")]}
+
+    response = client.get("/precos")
+    etag = response.headers["etag"]
+    assert response.status_code == status.HTTP_200_OK
+    assert etag.startswith('"abababababababab-')
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert "expires" in response.headers
+
+    response = client.get("/precos", headers={"If-None-Match": f'W/"outra", {etag}'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+@patch("app.services.refresher.baixar_arquivo_async")
+def test_exportar_precos_ndjson_gzip_e_csv(mock_baixar, tmp_path):
+    """
+    Testa que /precos/export transmite toda a aba normalizada da planilha do snapshot,
+    em NDJSON comprimido (cliente aceita gzip) e em CSV, em blocos de EXPORT_BATCH_ROWS linhas.
+    """
+    planilha = criar_planilha_estados(tmp_path / "resumo_semanal.xlsx", [
+        [datetime(2025, 11, 30), datetime(2025, 12, 6), " distrito federal ", "GASOLINA COMUM", 6.42],
+        [datetime(2025, 11, 30), datetime(2025, 12, 6), "BAHIA", "etanol hidratado", "4,19"],
+        [datetime(2025, 11, 30), datetime(2025, 12, 6), "BAHIA", "GNV", "-"],
+    ])
+    mock_baixar.return_value = ("http://fake.url/resumo_semanal.xlsx", None, None, planilha)
+
+    with patch.object(settings, "EXPORT_BATCH_ROWS", 2):
+        with client.stream("GET", "/precos/export", headers={"Accept-Encoding": "gzip"}) as response:
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.headers["content-type"] == "application/x-ndjson"
+            assert 'filename="resumo_semanal.ndjson"' in response.headers["content-disposition"]
+            corpo = gzip.decompress(b"".join(response.iter_raw()))
+        linhas = [json.loads(linha) for linha in corpo.splitlines()]
+        assert linhas[0] == {"estado": "DISTRITO FEDERAL", "produto": "GASOLINA COMUM", "dataInicial": "2025-11-30T00:00:00", "dataFinal": "2025-12-06T00:00:00", "precoMedioRevenda": 6.42}
+        assert [linha["precoMedioRevenda"] for linha in linhas] == [6.42, 4.19, None]
+
+        response = client.get("/precos/export?formato=csv", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "content-encoding" not in response.headers
+    assert response.text.splitlines() == [
+        "estado,produto,dataInicial,dataFinal,precoMedioRevenda",
+        "DISTRITO FEDERAL,GASOLINA COMUM,2025-11-30T00:00:00,2025-12-06T00:00:00,6.42",
+        "BAHIA,ETANOL HIDRATADO,2025-11-30T00:00:00,2025-12-06T00:00:00,4.19",
+        "BAHIA,GNV,2025-11-30T00:00:00,2025-12-06T00:00:00,",
+    ]
+
+@patch("app.services.refresher.baixar_arquivo_async")
+def test_exportar_precos_parquet(mock_baixar, tmp_path):
+    """
+    Testa que o Parquet transmitido (um row group por bloco) é um arquivo válido, com
+    todas as linhas da aba e o schema tipado (datas e preço).
+    """
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    linhas = [[datetime(2025, 11, 30), datetime(2025, 12, 6), estado, "GASOLINA COMUM", 6.0 + i / 100] for i, estado in enumerate(["DISTRITO FEDERAL", "BAHIA", "GOIAS", "PARANA", "PIAUI"])]
+    planilha = criar_planilha_estados(tmp_path / "resumo_semanal.xlsx", linhas)
+    mock_baixar.return_value = ("http://fake.url/resumo_semanal.xlsx", None, None, planilha)
+
+    with patch.object(settings, "EXPORT_BATCH_ROWS", 2):
+        response = client.get("/precos/export?formato=parquet", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "content-encoding" not in response.headers
+    arquivo = pq.ParquetFile(pa.BufferReader(response.content))
+    assert arquivo.metadata.num_row_groups == 3
+    tabela = pq.read_table(pa.BufferReader(response.content))
+    assert tabela.num_rows == 5
+    assert tabela.schema.names == ["estado", "produto", "dataInicial", "dataFinal", "precoMedioRevenda"]
+    assert tabela.schema.field("dataInicial").type == pa.date32()
+    assert tabela.column("precoMedioRevenda").to_pylist() == [6.0, 6.01, 6.02, 6.03, 6.04]
+
+@patch("app.services.export.importlib.util.find_spec", return_value=None)
+def test_exportar_precos_parquet_sem_pyarrow(_):
+    """
+    Testa que o Parquet, sem o pyarrow instalado, responde 501 (sem acessar a ANP) e que
+    formatos desconhecidos são rejeitados na validação.
+    """
+    response = client.get("/precos/export?formato=parquet")
+    assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+    assert "pyarrow" in response.json()["erro"]
+
+    response = client.get("/precos/export?formato=xlsx")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 def test_metrics_endpoint():
     """
@@ -63,3 +268,35 @@ def test_metrics_endpoint():
     assert "# TYPE http_requests_total counter" in response.text
     assert "# HELP http_response_time_seconds HTTP Response Time" in response.text
     assert "# TYPE http_response_time_seconds histogram" in response.text
+    assert "# TYPE precos_refresh_duration_seconds histogram" in response.text
+    assert "precos_snapshot_age_seconds" in response.text
+
+@patch("app.services.refresher.ingerir_planilha")
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+def test_ultimo_dado_valido_em_disco_nao_e_cacheado_como_atual(mock_extrair, mock_conjuntos, mock_baixar, mock_ingerir, tmp_path):
+    """
+    Testa que, com a ANP fora do ar no cold start, a planilha antiga servida do disco
+    vai marcada como defasada e com `no-cache` (e não com `max-age` até domingo).
+    """
+    conteudo = b"planilha_de_2024"
+    planilha = tmp_path / "resumo_semanal_lpc_2024-01-07_2024-01-13.xlsx"
+    planilha.write_bytes(conteudo)
+    (tmp_path / f"{planilha.name}.meta.json").write_text(json.dumps({
+        "url": f"http://fake.url/{planilha.name}", "sha256": hashlib.sha256(conteudo).hexdigest(), "tamanho": len(conteudo),
+    }))
+    dados = {"dataInicial": datetime(2024, 1, 7), "dataFinal": datetime(2024, 1, 13), "precoMedioRevenda": 5.49}
+    mock_baixar.return_value = (None, None, None, None)
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): dados}
+    mock_conjuntos.return_value = {"padrao": dados}
+
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path):
+        response = client.get("/precos")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["precoMedioRevenda"] == 5.49
+    assert response.headers["x-snapshot-stale"] == "true"
+    assert response.headers["cache-control"].startswith("public, no-cache")
+    # Mesmo sem a marcação de defasado, a validade da planilha de 2024 já terminou
+    assert atualizador.snapshot.resposta.expira_em <= datetime.now().timestamp() + 5
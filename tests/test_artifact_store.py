@@ -0,0 +1,67 @@
+import hashlib
+import json
+from unittest.mock import patch
+from app.services import downloader
+from app.services.artifact_store import ArmazemArtefatos
+from app.services.downloader import arquivo_integro
+
+def publicar(diretorio, nome: str, conteudo: bytes):
+    """Publica `conteudo` como o download da planilha `nome` (alias + metadados)."""
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    temporario = diretorio / f".{nome}.part"
+    temporario.write_bytes(conteudo)
+    ArmazemArtefatos(diretorio).publicar(temporario, sha256, diretorio / nome)
+    (diretorio / f"{nome}.meta.json").write_text(json.dumps({"url": f"http://fake.url/{nome}", "sha256": sha256, "tamanho": len(conteudo)}))
+    return sha256
+
+def test_conteudo_republicado_com_outro_nome_nao_ocupa_espaco_novo(tmp_path):
+    """
+    Testa que o mesmo conteúdo sob dois nomes vira um único objeto (hard links) e que
+    uma planilha corrompida é detectada e descartada, sem chegar ao extrator.
+    """
+    sha256 = publicar(tmp_path, "resumo_semanal_2025-12-06.xlsx", b"planilha")
+    publicar(tmp_path, "resumo_semanal_2025-12-06_v2.xlsx", b"planilha")
+
+    primeira, segunda = tmp_path / "resumo_semanal_2025-12-06.xlsx", tmp_path / "resumo_semanal_2025-12-06_v2.xlsx"
+    assert primeira.stat().st_ino == segunda.stat().st_ino
+    assert [caminho.name for caminho in (tmp_path / "objetos").glob("*.xlsx")] == [f"{sha256}.xlsx"]
+    assert arquivo_integro(segunda)
+
+    # Corrupção com o mesmo tamanho: o objeto também não confere e é removido
+    downloader._HASHES_ARQUIVOS.clear()
+    primeira.write_bytes(b"PLANILHA")
+    assert not arquivo_integro(primeira)
+    assert not primeira.exists()
+    assert not (tmp_path / "objetos" / f"{sha256}.xlsx").exists()
+
+def test_manutencao_comprime_frias_e_respeita_orcamento(tmp_path):
+    """
+    Testa que a manutenção comprime objetos frios (restaurados com o SHA-256 conferido
+    no próximo acesso) e remove os menos usados acima do orçamento em bytes.
+    """
+    armazem = ArmazemArtefatos(tmp_path)
+    with patch("app.services.artifact_store.time.time", return_value=1_000_000.0):
+        antiga = publicar(tmp_path, "semana_1.xlsx", b"a" * 100)
+    with patch("app.services.artifact_store.time.time", return_value=1_500_000.0):
+        publicar(tmp_path, "semana_2.xlsx", b"b" * 100)
+        atual = publicar(tmp_path, "semana_3.xlsx", b"c" * 100)
+
+    with patch.object(downloader.settings, "ARTIFACT_COMPRESS_AFTER_DAYS", 3), \
+         patch.object(downloader.settings, "ARTIFACT_MAX_BYTES", 0), \
+         patch("app.services.artifact_store.time.time", return_value=1_600_000.0):
+        armazem.manutencao({atual})
+
+    assert not (tmp_path / "semana_1.xlsx").exists()
+    assert (tmp_path / "objetos" / f"{antiga}.xlsx.gz").exists()
+    assert (tmp_path / "semana_3.xlsx").exists()  # protegida
+    assert arquivo_integro(tmp_path / "semana_1.xlsx")
+    assert (tmp_path / "semana_1.xlsx").read_bytes() == b"a" * 100
+
+    # Orçamento para dois objetos: sai o menos usado recentemente (semana_2)
+    with patch.object(downloader.settings, "ARTIFACT_MAX_BYTES", 200):
+        total = armazem.manutencao({atual})
+
+    assert total == 200
+    assert not (tmp_path / "semana_2.xlsx").exists()
+    assert not (tmp_path / "semana_2.xlsx.meta.json").exists()
+    assert (tmp_path / "semana_1.xlsx").exists() and (tmp_path / "semana_3.xlsx").exists()
@@ -0,0 +1,79 @@
+from datetime import date, datetime
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.batch import resolver_lote, semanas_do_indice
+from app.services.history import HistoricoPrecos
+from app.services.refresher import atualizador
+
+client = TestClient(app)
+
+INDICE = {
+    ("DISTRITO FEDERAL", "GASOLINA COMUM"): {"dataInicial": datetime(2025, 12, 7), "dataFinal": datetime(2025, 12, 13), "precoMedioRevenda": 6.39},
+    ("BAHIA", "GASOLINA COMUM"): {"dataInicial": datetime(2025, 12, 7), "dataFinal": datetime(2025, 12, 13), "precoMedioRevenda": 6.1},
+}
+
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.extrair_conjuntos", return_value={"padrao": INDICE[("DISTRITO FEDERAL", "GASOLINA COMUM")]})
+@patch("app.services.refresher.extrair_indice", return_value=INDICE)
+def test_lote_resolve_semana_atual_e_historico_em_ordem(mock_indice, mock_conjuntos, mock_baixar, tmp_path):
+    """
+    Testa que o lote cruza as consultas com a semana atual e com a série histórica,
+    preservando a ordem do pedido e devolvendo erros por item.
+    """
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    historico = HistoricoPrecos(tmp_path / "historico.sqlite3")
+    historico.registrar_semana([{
+        "estado": "DISTRITO FEDERAL", "produto": "GASOLINA COMUM",
+        "data_inicial": date(2025, 11, 30), "data_final": date(2025, 12, 6), "preco_medio": 6.2,
+    }], "hash-anterior", "anterior.xlsx")
+    atualizador.limpar()
+
+    with patch("app.main.historico", historico):
+        response = client.post("/precos/batch", json=[
+            {"estado": "bahia", "produto": "gasolina comum"},
+            {"estado": "DISTRITO FEDERAL", "produto": "GASOLINA COMUM", "semana": "2025-12-03"},
+            {"estado": "DISTRITO FEDERAL", "produto": "GNV", "semana": "2025-12-10"},
+            {"estado": "DISTRITO FEDERAL", "produto": "GASOLINA COMUM", "semana": "2025-11-01"},
+            {"estado": "DISTRITO FEDERAL", "produto": "GASOLINA COMUM", "semana": "2025-12-10"},
+        ])
+    atualizador.limpar()
+    historico.fechar()
+
+    assert response.status_code == 200
+    itens = response.json()
+    assert [item.get("precoMedioRevenda") for item in itens] == [6.1, 6.2, None, None, 6.39]
+    assert itens[0]["semana"] == "2025-12-07"
+    assert itens[1]["dataInicial"].startswith("2025-11-30")
+    assert "erro" in itens[2] and "erro" in itens[3]
+
+def test_lote_acima_do_limite_e_rejeitado():
+    """
+    Testa que lotes acima de MAX_CONSULTAS_LOTE são rejeitados na validação.
+    """
+    response = client.post("/precos/batch", json=[{"estado": "BAHIA", "produto": "GNV"}] * 1001)
+    assert response.status_code == 422
+
+def test_lote_vazio_e_rejeitado(tmp_path):
+    """
+    Testa que um lote vazio é rejeitado na validação (422) e que `resolver_lote` o aceita sem erro.
+    """
+    from tests.test_shared_snapshot import criar_snapshot
+
+    assert client.post("/precos/batch", json=[]).status_code == 422
+    assert resolver_lote([], criar_snapshot(5.99, "v1"), HistoricoPrecos(tmp_path / "historico.sqlite3")) == []
+
+def test_semanas_do_indice_memoizadas_por_snapshot():
+    """
+    Testa que a conversão do índice para DataFrame é feita uma vez por snapshot
+    (e refeita para um snapshot novo), sem cache global entre snapshots.
+    """
+    from tests.test_shared_snapshot import criar_snapshot
+
+    with patch("app.services.batch.semanas_do_indice", wraps=semanas_do_indice) as mock_converter:
+        primeiro, segundo = criar_snapshot(5.99, "v1"), criar_snapshot(6.19, "v2")
+        assert primeiro.semanas is primeiro.semanas
+        assert segundo.semanas["preco_medio"].max() == 6.19
+        assert primeiro.semanas["preco_medio"].max() == 5.99
+
+    assert mock_converter.call_count == 2
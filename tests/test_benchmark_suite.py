@@ -0,0 +1,24 @@
+from benchmarks.suite import comparar
+
+def test_comparar_detecta_regressao_acima_do_limite():
+    """
+    Testa que apenas métricas piores que o baseline além do limite (e da folga absoluta) são regressões.
+    """
+    baseline = {
+        "extrair_dados/estados/latencia_ms": 100.0,
+        "extrair_indice/estados/latencia_ms": 100.0,
+        "download/estados/latencia_ms": 1.0,
+        "extrair_dados/estados/pico_mib": 4.0,
+    }
+    atual = {
+        "extrair_dados/estados/latencia_ms": 140.0,  # +40%: regressão
+        "extrair_indice/estados/latencia_ms": 120.0,  # +20%: dentro do limite
+        "download/estados/latencia_ms": 2.5,  # +150%, mas abaixo da folga absoluta
+        "extrair_dados/estados/pico_mib": 3.0,  # melhorou
+        "extrair_dados/nova/latencia_ms": 999.0,  # sem baseline
+    }
+
+    regressoes = comparar(atual, baseline, limite=0.25)
+
+    assert len(regressoes) == 1
+    assert regressoes[0].startswith("extrair_dados/estados/latencia_ms")
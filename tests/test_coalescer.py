@@ -0,0 +1,59 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from app.services.coalescer import Coalescedor, lock_distribuido, COALESCED_WAITERS_TOTAL
+
+def test_coalescedor_executa_uma_vez_por_chave():
+    """
+    Testa que chamadas concorrentes para a mesma chave compartilham uma única execução
+    e que as chamadas que aguardaram são contabilizadas.
+    """
+    execucoes = []
+
+    async def baixar():
+        execucoes.append(1)
+        await asyncio.sleep(0.05)
+        return "resumo_semanal.xlsx"
+
+    async def cenario():
+        coalescedor = Coalescedor("teste")
+        resultados = await asyncio.gather(*(coalescedor.executar("semana-1", baixar) for _ in range(10)))
+        # Após a conclusão, uma nova chamada executa novamente
+        await coalescedor.executar("semana-1", baixar)
+        return resultados
+
+    antes = COALESCED_WAITERS_TOTAL.labels(operacao="teste")._value.get()
+    resultados = asyncio.run(cenario())
+
+    assert resultados == ["resumo_semanal.xlsx"] * 10
+    assert len(execucoes) == 2
+    assert COALESCED_WAITERS_TOTAL.labels(operacao="teste")._value.get() - antes == 9
+
+def test_lock_distribuido_renova_lease():
+    """
+    Testa que o lock distribuído renova o lease durante operações longas e é liberado ao final.
+    """
+    mock_redis = MagicMock()
+    mock_lock = mock_redis.lock.return_value
+    mock_lock.acquire = AsyncMock(side_effect=[False, True])
+    mock_lock.reacquire = AsyncMock()
+    mock_lock.release = AsyncMock()
+
+    async def cenario():
+        async with lock_distribuido(mock_redis, "lock:semana-1", lease=0.06, espera_maxima=1) as adquirido:
+            await asyncio.sleep(0.1)
+        return adquirido
+
+    assert asyncio.run(cenario()) is True
+    mock_redis.lock.assert_called_once_with("lock:semana-1", timeout=0.06, thread_local=False)
+    assert mock_lock.reacquire.await_count >= 2
+    mock_lock.release.assert_awaited_once()
+
+def test_lock_distribuido_sem_redis():
+    """
+    Testa que, sem Redis, o bloco protegido executa normalmente (sem exclusividade).
+    """
+    async def cenario():
+        async with lock_distribuido(None, "lock:semana-1", lease=30, espera_maxima=60) as adquirido:
+            return adquirido
+
+    assert asyncio.run(cenario()) is False
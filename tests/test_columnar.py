@@ -0,0 +1,84 @@
+import numpy as np
+import openpyxl
+from datetime import datetime
+from unittest.mock import patch
+from app.services import columnar
+from app.services.columnar import carregar_tabela, converter_planilha, diretorio_colunar, remover_conversao, valor_python
+
+def criar_planilha(destino, preco):
+    """Cria uma planilha com título, cabeçalho na linha 3 e duas linhas de dados."""
+    workbook = openpyxl.Workbook()
+    aba = workbook.active
+    aba.title = "ESTADOS"
+    aba.append(["TÍTULO"])
+    aba.append([])
+    aba.append(["DATA INICIAL", " ESTADOS ", "PRODUTO", "PREÇO MÉDIO REVENDA", None])
+    aba.append([datetime(2025, 12, 7), "DISTRITO FEDERAL", "GASOLINA COMUM", preco, None])
+    aba.append([])
+    aba.append([None, "GOIAS", "GASOLINA COMUM", None, None])
+    workbook.save(destino)
+    return destino
+
+def test_converter_planilha_gera_colunas_tipadas_e_memory_mapped(tmp_path):
+    """
+    Testa que a conversão gera um schema tipado e que a tabela é aberta com memory-mapping.
+    """
+    planilha = criar_planilha(tmp_path / "semana.xlsx", 6.39)
+
+    diretorio = converter_planilha(planilha, "a" * 64, "ESTADOS", 2)
+    tabela = carregar_tabela(planilha, "a" * 64, "ESTADOS", 2)
+
+    assert diretorio == diretorio_colunar(planilha, "a" * 64)
+    assert tabela.linhas == 2
+    assert set(tabela.colunas) == {"DATA INICIAL", "ESTADOS", "PRODUTO", "PREÇO MÉDIO REVENDA"}
+    assert tabela.colunas["DATA INICIAL"].dtype == np.dtype("datetime64[s]")
+    assert tabela.colunas["PREÇO MÉDIO REVENDA"].dtype == np.float64
+    assert tabela.colunas["ESTADOS"].dtype.kind == "U"
+    assert isinstance(tabela.colunas["PRODUTO"], np.memmap)
+    assert valor_python(tabela.colunas["DATA INICIAL"][0]) == datetime(2025, 12, 7)
+    assert valor_python(tabela.colunas["DATA INICIAL"][1]) is None
+    assert np.isnan(tabela.colunas["PREÇO MÉDIO REVENDA"][1])
+
+def test_converter_planilha_uma_vez_por_conteudo(tmp_path):
+    """
+    Testa que a conversão só lê o .xlsx quando a cópia colunar está ausente ou desatualizada,
+    e que conversões de conteúdos anteriores são removidas.
+    """
+    planilha = criar_planilha(tmp_path / "semana.xlsx", 6.39)
+    converter_planilha(planilha, "a" * 64, "ESTADOS", 2)
+
+    with patch("openpyxl.load_workbook") as mock_load:
+        converter_planilha(planilha, "a" * 64, "ESTADOS", 2)
+        mock_load.assert_not_called()
+
+    # Novo conteúdo (outro hash): a cópia anterior está desatualizada
+    assert carregar_tabela(planilha, "b" * 64, "ESTADOS", 2) is None
+    criar_planilha(planilha, 7.01)
+    converter_planilha(planilha, "b" * 64, "ESTADOS", 2)
+
+    assert [d.name for d in tmp_path.glob("*.colunas")] == [diretorio_colunar(planilha, "b" * 64).name]
+    assert carregar_tabela(planilha, "b" * 64, "ESTADOS", 2).colunas["PREÇO MÉDIO REVENDA"][0] == 7.01
+
+def test_tabelas_abertas_limitadas_e_fechadas_ao_remover(tmp_path):
+    """
+    Testa que as tabelas mantidas abertas são limitadas (LRU) e que a remoção ou a
+    substituição de uma conversão também a retira do processo.
+    """
+    planilhas = [criar_planilha(tmp_path / f"semana_{i}.xlsx", 6.0 + i) for i in range(3)]
+    for i, planilha in enumerate(planilhas):
+        converter_planilha(planilha, str(i) * 64, "ESTADOS", 2)
+    diretorios = [diretorio_colunar(planilha, str(i) * 64) for i, planilha in enumerate(planilhas)]
+
+    with patch.object(columnar.settings, "COLUMNAR_MAX_OPEN_TABLES", 2), patch.dict(columnar._TABELAS_ABERTAS, clear=True):
+        for i, planilha in enumerate(planilhas):
+            carregar_tabela(planilha, str(i) * 64, "ESTADOS", 2)
+        assert list(columnar._TABELAS_ABERTAS) == diretorios[1:]
+
+        # Uma nova conversão da mesma planilha remove a anterior do disco e do processo
+        converter_planilha(planilhas[2], "f" * 64, "ESTADOS", 2)
+        assert list(columnar._TABELAS_ABERTAS) == [diretorios[1]]
+        assert not diretorios[2].exists()
+
+        remover_conversao(diretorios[1])
+        assert not columnar._TABELAS_ABERTAS
+        assert not diretorios[1].exists()
@@ -1,93 +1,284 @@
-from unittest.mock import patch, MagicMock, mock_open
+import asyncio
+import hashlib
+import json
+import os
+import ssl
+import threading
+import httpx
+from unittest.mock import patch, AsyncMock, MagicMock
 from datetime import datetime
-from app.services.downloader import baixar_arquivo
+from app.services import downloader
+from app.services.circuit_breaker import ABERTO, Disjuntor
+from app.services.downloader import baixar_arquivo, baixar_arquivo_async, encontrar_url_mais_recente_async, ler_metadados
+from app.services.redis_client import cliente_redis
+
+URL_PLANILHA = "https://www.gov.br/anp/pt-br/assuntos/precos/2025/resumo_semanal_lpc-5.xlsx"
+
+HTML_COM_LINK = f"""
+<html>
+    <body>
+        <a href="{URL_PLANILHA}">Planilha Semanal</a>
+    </body>
+</html>
+"""
+
+def criar_cliente_mock(handler) -> httpx.AsyncClient:
+    """Cria um cliente httpx cujas requisições são respondidas por `handler`."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def criar_redis_falso() -> MagicMock:
+    """Cliente Redis assíncrono falso: cache vazio e lock sempre adquirido."""
+    redis_falso = MagicMock()
+    redis_falso.get = AsyncMock(return_value=None)
+    redis_falso.setex = AsyncMock()
+    redis_falso.publish = AsyncMock()
+    lock = redis_falso.lock.return_value
+    lock.acquire = AsyncMock(return_value=True)
+    lock.reacquire = AsyncMock()
+    lock.release = AsyncMock()
+    return redis_falso
 
 @patch("app.services.downloader.get_current_time")
-@patch("app.services.downloader.requests.Session")
-@patch("app.services.downloader.OUTPUT_DIR") # Mocka a variável global OUTPUT_DIR diretamente
-@patch("app.services.downloader.redis_client")
-def test_baixar_arquivo_sucesso(mock_redis, mock_output_dir, mock_session, mock_get_time):
+@patch.object(cliente_redis, "obter")
+def test_baixar_arquivo_sucesso(mock_obter, mock_get_time, tmp_path):
     """
     Testa o fluxo completo de download com sucesso (HTTP 200).
-    Verifica se o arquivo é salvo usando pathlib e se a lógica de scraping é chamada.
+    Verifica se o arquivo é salvo no OUTPUT_DIR e se o cache é atualizado.
     """
     # Mock do tempo
     mock_get_time.return_value = datetime(2025, 12, 9, 12, 0, 0)
+    # Garante que não acha nada no cache
+    mock_redis = mock_obter.return_value = criar_redis_falso()
 
-    # Quando fazemos OUTPUT_DIR / "nome", ele chama __truediv__
-    mock_file_path = MagicMock()
-    mock_output_dir.__truediv__.return_value = mock_file_path
-
-    # Garante que não acha nada no cache nem no disco
-    mock_file_path.exists.return_value = False
-
-    if mock_redis:
-        mock_redis.get.return_value = None
-
-    # Configura o Mock da Sessão
-    session_instance = mock_session.return_value
-
-    # Precisamos simular duas chamadas ao session.get:
     # 1. A chamada ao scraper (retorna HTML com link)
     # 2. A chamada de download do arquivo (retorna binário)
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == URL_PLANILHA:
+            return httpx.Response(200, content=b"conteudo_falso_excel")
+        return httpx.Response(200, text=HTML_COM_LINK)
 
-    mock_response_html = MagicMock()
-    mock_response_html.status_code = 200
-    mock_response_html.text = """
-    <html>
-        <body>
-            <a href="https://www.gov.br/anp/pt-br/assuntos/precos/2025/resumo_semanal_lpc-5.xlsx">Planilha Semanal</a>
-        </body>
-    </html>
-    """
-
-    mock_response_file = MagicMock()
-    mock_response_file.status_code = 200
-    mock_response_file.content = b"conteudo_falso_excel"
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            return await baixar_arquivo_async(cliente)
 
-    # Define o side_effect para retornar sequencialmente
-    session_instance.get.side_effect = [mock_response_html, mock_response_file]
+    # A gravação e o fsync (planilha e .meta.json) não podem rodar no event loop
+    threads_fsync = []
+    fsync_real = os.fsync
 
-    # Mock do open() chamado no objeto Path do arquivo
-    m = mock_open()
-    mock_file_path.open = m
+    def fsync_registrado(fd):
+        threads_fsync.append(threading.current_thread())
+        fsync_real(fd)
 
-    # Executa
-    url, data_inicio, data_fim, caminho = baixar_arquivo()
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path), \
+         patch("app.services.downloader.os.fsync", fsync_registrado):
+        url, data_inicio, data_fim, caminho = asyncio.run(cenario())
 
     # Verificações
-    assert url == "https://www.gov.br/anp/pt-br/assuntos/precos/2025/resumo_semanal_lpc-5.xlsx"
+    assert len(threads_fsync) == 2
+    assert threading.main_thread() not in threads_fsync
+    assert url == URL_PLANILHA
     # As datas agora são None porque vêm do extractor
     assert data_inicio is None
     assert data_fim is None
-    assert caminho is not None
+    assert caminho == tmp_path / "resumo_semanal_lpc-5.xlsx"
+    assert caminho.read_bytes() == b"conteudo_falso_excel"
+    mock_redis.setex.assert_awaited_once()
+    # Metadados gravados junto com a planilha e nenhum temporário remanescente
+    metadados = ler_metadados(caminho)
+    assert metadados["tamanho"] == len(b"conteudo_falso_excel")
+    assert metadados["sha256"] == hashlib.sha256(b"conteudo_falso_excel").hexdigest()
+    assert not list(tmp_path.glob("*.part"))
 
-    # Garante que tentou criar o diretório no OUTPUT_DIR
-    mock_output_dir.mkdir.assert_called()
-    # Garante que tentou escrever o arquivo
-    m.assert_called()
-    m().write.assert_called_with(b"conteudo_falso_excel")
+def test_baixar_arquivo_falha_scraper(tmp_path):
+    """
+    Testa o comportamento quando o scraper não encontra nenhum link válido
+    (usando a versão síncrona, que cria seu próprio cliente).
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        # Retorna HTML sem links .xlsx
+        return httpx.Response(200, text="<html><body>Nenhum link aqui</body></html>")
+
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path), \
+         patch("app.services.downloader.criar_cliente_http", lambda verify=True: criar_cliente_mock(handler)):
+        url, data_inicio, data_fim, caminho = baixar_arquivo()
 
-@patch("app.services.downloader.requests.Session")
-@patch("app.services.downloader.OUTPUT_DIR")
-@patch("app.services.downloader.redis_client")
-def test_baixar_arquivo_falha_scraper(mock_redis, mock_output_dir, mock_session):
+    assert url is None
+    assert caminho is None
+
+@patch("app.services.downloader.asyncio.sleep", new_callable=AsyncMock)
+def test_baixar_arquivo_retries_e_fallback_ssl(mock_sleep, tmp_path):
     """
-    Testa o comportamento quando o scraper não encontra nenhum link válido.
+    Testa a política de retries (status 5xx) no scraping e o fallback sem
+    verificação SSL no download da planilha.
     """
-    mock_file_path = MagicMock()
-    mock_output_dir.__truediv__.return_value = mock_file_path
+    respostas_pagina = iter([httpx.Response(503), httpx.Response(502), httpx.Response(200, text=HTML_COM_LINK)])
 
-    session_instance = mock_session.return_value
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == URL_PLANILHA:
+            raise httpx.ConnectError("falha no handshake") from ssl.SSLCertVerificationError("certificate verify failed")
+        return next(respostas_pagina)
 
-    # Retorna HTML sem links .xlsx
-    mock_response_html = MagicMock()
-    mock_response_html.status_code = 200
-    mock_response_html.text = "<html><body>Nenhum link aqui</body></html>"
+    def handler_inseguro(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"conteudo_sem_ssl")
 
-    session_instance.get.return_value = mock_response_html
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            return await baixar_arquivo_async(cliente)
 
-    url, data_inicio, data_fim, caminho = baixar_arquivo()
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path), \
+         patch("app.services.downloader.criar_cliente_http", lambda verify=True: criar_cliente_mock(handler_inseguro)):
+        url, _, _, caminho = asyncio.run(cenario())
+
+    assert url == URL_PLANILHA
+    assert caminho.read_bytes() == b"conteudo_sem_ssl"
+    # Dois retries na página: backoff 0s e depois 1s (mesma fórmula do urllib3)
+    assert [c.args[0] for c in mock_sleep.await_args_list] == [0.0, 1.0]
+
+@patch("app.services.downloader.calcular_tempo_ate_proximo_domingo", return_value=3600)
+@patch.object(cliente_redis, "obter")
+def test_baixar_arquivo_revalidacao_condicional(mock_obter, mock_ttl, tmp_path):
+    """
+    Testa que, com uma cópia íntegra em disco (mas sem entrada no Redis), o download
+    é condicional e um 304 reaproveita o arquivo sem nova transferência.
+    """
+    mock_redis = mock_obter.return_value = criar_redis_falso()
+    conteudo = b"planilha_da_semana"
+    (tmp_path / "resumo_semanal_lpc-5.xlsx").write_bytes(conteudo)
+    (tmp_path / "resumo_semanal_lpc-5.xlsx.meta.json").write_text(json.dumps({
+        "url": URL_PLANILHA, "etag": '"v1"', "last_modified": "Sun, 07 Dec 2025 10:00:00 GMT",
+        "sha256": hashlib.sha256(conteudo).hexdigest(), "tamanho": len(conteudo),
+    }))
+    headers_recebidos = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == URL_PLANILHA:
+            headers_recebidos.update(request.headers)
+            return httpx.Response(304)
+        return httpx.Response(200, text=HTML_COM_LINK)
+
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            return await baixar_arquivo_async(cliente)
+
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path):
+        _, _, _, caminho = asyncio.run(cenario())
+
+    assert headers_recebidos["if-none-match"] == '"v1"'
+    assert headers_recebidos["if-modified-since"] == "Sun, 07 Dec 2025 10:00:00 GMT"
+    assert caminho.read_bytes() == conteudo
+    mock_redis.setex.assert_awaited_once_with("arquivo_precos:resumo_semanal_lpc-5.xlsx", 3600, str(caminho))
+
+def test_baixar_arquivo_incompleto_nao_e_publicado(tmp_path):
+    """
+    Testa que um download truncado (menos bytes que o Content-Length) não é publicado,
+    e que um arquivo parcial de uma execução anterior não é tratado como cache válido.
+    """
+    # Gravação parcial anterior, sem metadados
+    (tmp_path / "resumo_semanal_lpc-5.xlsx").write_bytes(b"parcial")
+
+    class StreamTruncado(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"so_metade"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == URL_PLANILHA:
+            return httpx.Response(200, headers={"Content-Length": "100"}, stream=StreamTruncado())
+        return httpx.Response(200, text=HTML_COM_LINK)
+
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            return await baixar_arquivo_async(cliente)
+
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path):
+        url, _, _, caminho = asyncio.run(cenario())
 
-    assert url is None
     assert caminho is None
+    assert (tmp_path / "resumo_semanal_lpc-5.xlsx").read_bytes() == b"parcial"
+    assert not list(tmp_path.glob("*.part"))
+
+def test_busca_ordena_por_data_e_revalida_com_etag():
+    """
+    Testa que a planilha mais recente é escolhida pela data no nome (não pela posição
+    na página), que a URL fica em cache pelo TTL e que, depois dele, a página é
+    revalidada com If-None-Match (304 mantém a URL sem transferir o HTML).
+    """
+    base = "https://www.gov.br/anp/arquivos"
+    html = f"""
+        <a href="{base}/resumo_semanal_lpc_2025-11-23_2025-11-29.xlsx">semana anterior</a>
+        <a href="{base}/resumo_semanal_lpc_2025-11-30_2025-12-06.xlsx">semana atual</a>
+        <a href="{base}/resumo_semanal_sem_data.xlsx">sem data</a>
+    """
+    requisicoes = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requisicoes.append(request)
+        if request.headers.get("if-none-match") == '"pagina-v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=html, headers={"ETag": '"pagina-v1"'})
+
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            primeira = await encontrar_url_mais_recente_async(cliente)
+            em_cache = await encontrar_url_mais_recente_async(cliente)
+            # TTL vencido: a próxima chamada revalida a página
+            downloader.cache_anp.descartar_local(downloader.CHAVE_URL_RECENTE)
+            revalidada = await encontrar_url_mais_recente_async(cliente)
+            return primeira, em_cache, revalidada
+
+    downloader.limpar_cache_busca()
+    try:
+        with patch.object(downloader.settings, "SCRAPE_CACHE_SECONDS", 300):
+            primeira, em_cache, revalidada = asyncio.run(cenario())
+    finally:
+        downloader.limpar_cache_busca()
+
+    assert primeira == em_cache == revalidada == f"{base}/resumo_semanal_lpc_2025-11-30_2025-12-06.xlsx"
+    assert len(requisicoes) == 2
+    assert requisicoes[1].headers["if-none-match"] == '"pagina-v1"'
+
+def test_busca_interrompe_varredura_apos_lista_de_planilhas():
+    """
+    Testa que a varredura em streaming para de ler a página pouco depois da lista de planilhas.
+    """
+    blocos_lidos = []
+
+    class PaginaLonga(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield f'<a href="{URL_PLANILHA}">Planilha</a>'.encode()
+            for i in range(100):
+                blocos_lidos.append(i)
+                yield b"<p>" + b"x" * 16 * 1024 + b"</p>"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=PaginaLonga())
+
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            return await encontrar_url_mais_recente_async(cliente)
+
+    assert asyncio.run(cenario()) == URL_PLANILHA
+    assert len(blocos_lidos) < 10
+
+@patch("app.services.downloader.asyncio.sleep", new_callable=AsyncMock)
+def test_disjuntor_anp_falha_rapido_apos_erros_consecutivos(mock_sleep):
+    """
+    Testa que, após falhas consecutivas, a busca na ANP falha imediatamente (sem requisição).
+    """
+    requisicoes = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requisicoes.append(request)
+        raise httpx.ConnectTimeout("ANP fora do ar")
+
+    async def cenario():
+        async with criar_cliente_mock(handler) as cliente:
+            return [await encontrar_url_mais_recente_async(cliente) for _ in range(3)]
+
+    with patch.object(downloader, "disjuntor_anp", Disjuntor("anp-teste", limite_falhas=2, recuperacao=60)):
+        resultados = asyncio.run(cenario())
+        estado = downloader.disjuntor_anp.estado
+
+    assert resultados == [None, None, None]
+    assert estado == ABERTO
+    # Duas buscas com todas as tentativas (1 + 3 retries cada); a terceira nem chega à rede
+    assert len(requisicoes) == 8
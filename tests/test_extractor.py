@@ -1,6 +1,29 @@
+import openpyxl
+import os
 import pandas as pd
+import pytest
+import yaml
+from datetime import datetime
 from unittest.mock import patch
-from app.services.extractor import extrair_dados
+from app.services import extractor
+from app.services.extractor import (
+    chave_padrao, compilar_plano, extrair_conjuntos, extrair_dados, extrair_dados_pandas, extrair_dados_streaming,
+    extrair_indice, ingerir_planilha, limpar_cache_resultados, versao_regras, _extrair_dados_planilha,
+)
+
+def criar_planilha_estados(destino, linhas):
+    """Cria uma planilha .xlsx real com a aba ESTADOS no layout da ANP (cabeçalho na linha 10)."""
+    workbook = openpyxl.Workbook()
+    aba = workbook.active
+    aba.title = "ESTADOS"
+    aba.append(["AGÊNCIA NACIONAL DO PETRÓLEO"])
+    for _ in range(8):
+        aba.append([])
+    aba.append(["DATA INICIAL", "DATA FINAL", " ESTADOS ", "PRODUTO", "PREÇO MÉDIO REVENDA"])
+    for linha in linhas:
+        aba.append(linha)
+    workbook.save(destino)
+    return destino
 
 # Mock do objeto ExcelFile e do DataFrame
 @patch("pandas.ExcelFile")
@@ -72,3 +95,235 @@ def test_extrair_dados_arquivo_invalido():
     # A função captura Exception e retorna None
     resultado = extrair_dados("caminho/nao_existe.xlsx")
     assert resultado is None
+
+@patch("app.services.extractor.calcular_tempo_ate_proximo_domingo", return_value=3600)
+@patch("pandas.ExcelFile")
+def test_extrair_dados_usa_cache_de_resultados(mock_excel_file, mock_ttl, tmp_path):
+    """
+    Testa que a mesma planilha (nome + conteúdo) só é processada uma vez,
+    e que uma alteração no conteúdo invalida o resultado cacheado.
+    """
+    limpar_cache_resultados()
+    arquivo = tmp_path / "resumo_semanal.xlsx"
+    arquivo.write_bytes(b"versao-1")
+
+    mock_instance = mock_excel_file.return_value
+    mock_instance.sheet_names = ["ESTADOS"]
+    mock_instance.parse.return_value = pd.DataFrame({
+        "ESTADOS": ["DISTRITO FEDERAL"],
+        "PRODUTO": ["GASOLINA COMUM"],
+        "DATA INICIAL": ["2025-01-01"],
+        "DATA FINAL": ["2025-01-07"],
+        "PREÇO MÉDIO REVENDA": [5.50]
+    })
+
+    primeiro = extrair_dados(arquivo)
+    segundo = extrair_dados(arquivo)
+
+    assert primeiro == segundo
+    assert mock_instance.parse.call_count == 1
+
+    # Novo conteúdo (ex: republicação) gera nova chave de cache
+    arquivo.write_bytes(b"versao-2-diferente")
+    extrair_dados(arquivo)
+    assert mock_instance.parse.call_count == 2
+    limpar_cache_resultados()
+
+def test_motores_streaming_e_pandas_retornam_o_mesmo_resultado(tmp_path):
+    """
+    Testa que o motor streaming (read-only, parada antecipada) produz o mesmo
+    resultado que o motor pandas em uma planilha real.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [inicio, fim, "BAHIA", "GASOLINA COMUM", 6.1],
+        [inicio, fim, "DISTRITO FEDERAL", "ETANOL HIDRATADO", 4.2],
+        [inicio, fim, "Distrito Federal", "Gasolina Comum", "6,39"],
+        [inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 9.99],
+    ])
+
+    resultado_streaming = extrair_dados_streaming(arquivo)
+    resultado_pandas = extrair_dados_pandas(arquivo)
+
+    assert resultado_streaming == resultado_pandas
+    assert resultado_streaming == {"dataInicial": inicio, "dataFinal": fim, "precoMedioRevenda": 6.39}
+
+@patch("app.services.extractor.calcular_tempo_ate_proximo_domingo", return_value=3600)
+@patch("app.services.extractor._conjuntos_pandas", return_value={"padrao": {"precoMedioRevenda": 1.0}})
+@patch("openpyxl.load_workbook", side_effect=KeyError("xl/sharedStrings.xml"))
+def test_motor_streaming_faz_fallback_para_pandas(mock_load, mock_pandas, mock_ttl, tmp_path):
+    """
+    Testa que uma falha inesperada no motor streaming aciona o motor pandas.
+    """
+    limpar_cache_resultados()
+    arquivo = tmp_path / "estranha.xlsx"
+    arquivo.write_bytes(b"conteudo")
+
+    assert extrair_dados(arquivo) == {"precoMedioRevenda": 1.0}
+    assert mock_pandas.call_args.args[0] == arquivo
+    limpar_cache_resultados()
+
+def test_planilha_ingerida_e_lida_da_copia_colunar(tmp_path):
+    """
+    Testa que, após a ingestão, a extração usa a cópia colunar sem abrir o .xlsx
+    e retorna o mesmo resultado dos motores que leem a planilha.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [inicio, fim, "BAHIA", "GASOLINA COMUM", 6.1],
+        [inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39],
+    ])
+    esperado = extrair_dados_streaming(arquivo)
+
+    assert ingerir_planilha(arquivo) is not None
+
+    with patch("app.services.extractor._conjuntos_streaming") as mock_streaming, \
+         patch("app.services.extractor._conjuntos_pandas") as mock_pandas:
+        resultado = _extrair_dados_planilha(arquivo)
+        mock_streaming.assert_not_called()
+        mock_pandas.assert_not_called()
+
+    assert resultado == {"padrao": esperado}
+
+def test_indice_cobre_todos_os_pares_e_coincide_com_a_extracao(tmp_path):
+    """
+    Testa que o índice (estado, produto) cobre todos os pares da aba com chaves
+    normalizadas, que é igual com e sem a cópia colunar e que o par configurado
+    coincide com o resultado da extração.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [inicio, fim, " bahia ", "GASOLINA COMUM", 6.1],
+        [inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39],
+        [inicio, fim, "DISTRITO FEDERAL", "ETANOL HIDRATADO", "4,5"],
+        [inicio, fim, "DISTRITO FEDERAL", "GLP", "sem preço"],
+    ])
+    limpar_cache_resultados()
+    sem_copia_colunar = extrair_indice(arquivo)
+    limpar_cache_resultados()
+    ingerir_planilha(arquivo)
+    indice = extrair_indice(arquivo)
+
+    assert indice == sem_copia_colunar
+    assert set(indice) == {("BAHIA", "GASOLINA COMUM"), ("DISTRITO FEDERAL", "GASOLINA COMUM"), ("DISTRITO FEDERAL", "ETANOL HIDRATADO")}
+    assert indice[("DISTRITO FEDERAL", "ETANOL HIDRATADO")]["precoMedioRevenda"] == 4.5
+    assert indice[chave_padrao()] == extrair_dados_streaming(arquivo)
+    limpar_cache_resultados()
+
+def test_indice_e_motores_usam_a_mesma_normalizacao(tmp_path):
+    """
+    Testa que o índice (/precos) e os motores de extração (`extrair_dados`) escolhem a
+    mesma linha: estado/produto com espaços nas bordas e caixa mista casam nos dois
+    caminhos, e linhas com preço inválido são ignoradas nos dois.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [inicio, fim, " distrito federal ", "GASOLINA COMUM", "-"],
+        [inicio, fim, "Distrito Federal ", " gasolina comum", "6,39"],
+        [inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 9.99],
+    ])
+    esperado = {"dataInicial": inicio, "dataFinal": fim, "precoMedioRevenda": 6.39}
+
+    limpar_cache_resultados()
+    assert extrair_indice(arquivo)[chave_padrao()] == esperado
+    assert _extrair_dados_planilha(arquivo, motor="streaming") == {"padrao": esperado}
+    assert _extrair_dados_planilha(arquivo, motor="pandas") == {"padrao": esperado}
+    ingerir_planilha(arquivo)
+    assert _extrair_dados_planilha(arquivo) == {"padrao": esperado}
+    limpar_cache_resultados()
+
+@patch("app.services.extractor.calcular_tempo_ate_proximo_domingo", return_value=3600)
+def test_indice_e_conjuntos_compartilham_o_cache_de_resultados(mock_ttl, tmp_path):
+    """
+    Testa que o índice e os conjuntos extraídos de uma planilha ficam na mesma entrada
+    do cache de resultados e que consultas seguintes não releem a aba.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [[inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39]])
+    limpar_cache_resultados()
+    indice = extrair_indice(arquivo)
+    conjuntos = extrair_conjuntos(arquivo)
+
+    with patch("app.services.extractor.abrir_tabela") as mock_abrir, \
+         patch("app.services.extractor._extrair_dados_planilha") as mock_extrair:
+        assert extrair_indice(arquivo) is indice
+        assert extrair_conjuntos(arquivo) == conjuntos
+        mock_abrir.assert_not_called()
+        mock_extrair.assert_not_called()
+    assert len(extractor._CACHE_RESULTADOS) == 1
+    limpar_cache_resultados()
+
+REGRAS_YAML = """
+anp:
+  sheet_name: "ESTADOS"
+  header_row: 9
+  filters: {estado_col: "ESTADOS", estado_val: "DISTRITO FEDERAL", produto_col: "PRODUTO", produto_val: "GASOLINA COMUM"}
+  conjuntos:
+    etanol_df:
+      filters: {produto_val: "%s"}
+"""
+
+def test_plano_aplica_conjuntos_nomeados_em_uma_passada(tmp_path):
+    """
+    Testa que o plano compilado aplica todos os conjuntos na mesma leitura da aba, com
+    os mesmos resultados nos motores streaming, pandas e colunar, e que regras inválidas
+    são rejeitadas na compilação.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39],
+        [inicio, fim, "DISTRITO FEDERAL", "ETANOL HIDRATADO", "4,5"],
+    ])
+    plano = compilar_plano(yaml.safe_load(REGRAS_YAML % "etanol hidratado"))
+
+    assert list(plano.conjuntos) == ["padrao", "etanol_df"]
+    assert plano.conjuntos["etanol_df"].prod_val == "ETANOL HIDRATADO"
+    assert plano.conjuntos["etanol_df"].est_val == "DISTRITO FEDERAL"
+
+    esperado = {
+        "padrao": {"dataInicial": inicio, "dataFinal": fim, "precoMedioRevenda": 6.39},
+        "etanol_df": {"dataInicial": inicio, "dataFinal": fim, "precoMedioRevenda": 4.5},
+    }
+    with patch.object(extractor, "plano_regras", return_value=plano):
+        assert _extrair_dados_planilha(arquivo, motor="streaming") == esperado
+        assert _extrair_dados_planilha(arquivo, motor="pandas") == esperado
+        ingerir_planilha(arquivo)
+        assert _extrair_dados_planilha(arquivo) == esperado
+
+    with pytest.raises(ValueError):
+        compilar_plano({"anp": {"header_row": -1}})
+    with pytest.raises(ValueError):
+        compilar_plano({"anp": {"conjuntos": {"outro": {"sheet_name": "MUNICIPIOS"}}}})
+
+@patch("app.services.extractor.calcular_tempo_ate_proximo_domingo", return_value=3600)
+def test_regras_recarregadas_a_quente_invalidam_resultados(mock_ttl, tmp_path):
+    """
+    Testa que uma alteração no YAML troca o plano sem reinício, muda a versão das
+    regras (e a chave do cache de resultados) e que um YAML inválido mantém o plano anterior.
+    """
+    inicio, fim = datetime(2025, 12, 7), datetime(2025, 12, 13)
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [inicio, fim, "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39],
+        [inicio, fim, "DISTRITO FEDERAL", "ETANOL HIDRATADO", 4.5],
+        [inicio, fim, "DISTRITO FEDERAL", "DIESEL S10", 6.1],
+    ])
+    regras = tmp_path / "etl_rules.yaml"
+    regras.write_text(REGRAS_YAML % "ETANOL HIDRATADO", encoding="utf-8")
+
+    limpar_cache_resultados()
+    with patch.object(extractor, "CONFIG_PATH", regras), \
+         patch.object(extractor, "_REGRAS", None), \
+         patch.object(extractor.settings, "ETL_CONFIG_RELOAD_SECONDS", 1e-9):
+        versao = versao_regras()
+        assert extrair_dados(arquivo, "etanol_df")["precoMedioRevenda"] == 4.5
+
+        regras.write_text(REGRAS_YAML % "DIESEL S10", encoding="utf-8")
+        os.utime(regras, ns=(0, 1))
+        assert versao_regras() != versao
+        assert extrair_dados(arquivo, "etanol_df")["precoMedioRevenda"] == 6.1
+        assert extrair_conjuntos(arquivo)["padrao"]["precoMedioRevenda"] == 6.39
+
+        nova_versao = versao_regras()
+        regras.write_text("anp: {header_row: -1}", encoding="utf-8")
+        assert versao_regras() == nova_versao
+    limpar_cache_resultados()
@@ -1,70 +1,148 @@
-import requests
+import asyncio
+import httpx
 import redis
+import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock, MagicMock
 from app.main import app
+from app.services.downloader import SEARCH_URL
+from app.services.health import verificador
+from app.services.redis_client import cliente_redis
 
 client = TestClient(app)
 
-@patch("app.main.requests.head")
-@patch("app.main.redis_client") # Alvo do mock é agora a referência em app.main
-def test_health_check_ok(mock_redis_client, mock_requests_head):
+@pytest.fixture
+def mock_redis_client():
+    """Redis habilitado, com um cliente assíncrono falso no lugar do pool real."""
+    redis_falso = MagicMock()
+    redis_falso.ping = AsyncMock(return_value=True)
+    with patch("app.services.redis_client.settings.REDIS_ENABLED", True), \
+         patch.object(cliente_redis, "obter", return_value=redis_falso):
+        yield redis_falso
+    cliente_redis.disjuntor.registrar_sucesso()
+
+@pytest.fixture(autouse=True)
+def limpar_cache_health():
+    """Garante que cada teste execute as verificações (sem resultado em cache)."""
+    verificador.limpar()
+    yield
+    verificador.limpar()
+
+def criar_cliente_anp(status_code: int = 200, requisicoes: list | None = None) -> httpx.AsyncClient:
+    """Cliente httpx que responde à página de busca da ANP com `status_code`."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        if requisicoes is not None:
+            requisicoes.append(request)
+        return httpx.Response(status_code)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def test_health_live_sem_io():
+    """
+    Testa que /health/live responde sem consultar dependências.
+    """
+    with patch("app.services.health.verificador.verificar") as mock_verificar:
+        response = client.get("/health/live")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "UP"}
+    mock_verificar.assert_not_called()
+
+def test_health_ready_ok_e_cache(mock_redis_client):
     """
-    Testa o endpoint /health quando a conexão com a internet e o Redis estão OK.
+    Testa /health/ready com ANP e Redis OK, e que sondas seguintes usam o resultado em cache.
     """
-    mock_requests_head.return_value.raise_for_status.return_value = None
-    mock_redis_client.ping.return_value = True # Garante que ping retorne True
+    requisicoes = []
 
-    response = client.get("/health")
+    with patch("app.services.health.downloader.obter_cliente_http", lambda: criar_cliente_anp(200, requisicoes)):
+        response = client.get("/health/ready")
+        for _ in range(5):
+            assert client.get("/health").status_code == 200
 
     assert response.status_code == 200
     assert response.json()["status"] == "UP"
-    assert response.json()["checks"]["internet_connection"] == "OK"
+    assert response.json()["checks"]["anp_connection"] == "OK"
     assert response.json()["checks"]["redis_connection"] == "OK"
+    assert [(r.method, str(r.url)) for r in requisicoes] == [("HEAD", SEARCH_URL)]
+    mock_redis_client.ping.assert_awaited_once()
 
-@patch("app.main.requests.head")
-@patch("app.main.redis_client")
-def test_health_check_fail_internet(mock_redis_client, mock_requests_head):
+def test_health_ready_fail_anp(mock_redis_client):
     """
-    Testa o endpoint /health quando a conexão com a internet falha.
+    Testa /health/ready quando a ANP está inacessível.
     """
-    mock_requests_head.side_effect = requests.exceptions.RequestException("Internet down")
-    mock_redis_client.ping.return_value = True # Garante que ping retorne True
 
-    response = client.get("/health")
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("ANP down")
+
+    with patch("app.services.health.downloader.obter_cliente_http", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))):
+        response = client.get("/health/ready")
 
     assert response.status_code == 503
     assert response.json()["status"] == "DOWN"
-    assert "FAIL" in response.json()["checks"]["internet_connection"]
+    assert "FAIL" in response.json()["checks"]["anp_connection"]
     assert response.json()["checks"]["redis_connection"] == "OK"
 
-@patch("app.main.requests.head")
-@patch("app.main.redis_client")
-def test_health_check_fail_redis(mock_redis_client, mock_requests_head):
+def test_health_ready_fail_redis(mock_redis_client):
     """
-    Testa o endpoint /health quando a conexão com o Redis falha.
+    Testa /health/ready quando a conexão com o Redis falha.
     """
-    mock_requests_head.return_value.raise_for_status.return_value = None
     mock_redis_client.ping.side_effect = redis.exceptions.ConnectionError("Redis down")
 
-    response = client.get("/health")
+    with patch("app.services.health.downloader.obter_cliente_http", lambda: criar_cliente_anp(200)):
+        response = client.get("/health/ready")
 
     assert response.status_code == 503
     assert response.json()["status"] == "DOWN"
-    assert response.json()["checks"]["internet_connection"] == "OK"
+    assert response.json()["checks"]["anp_connection"] == "OK"
     assert "FAIL" in response.json()["checks"]["redis_connection"]
 
-@patch("app.main.requests.head")
-@patch("app.main.redis_client", None) # Mocks app.main.redis_client para ser None
-def test_health_check_redis_not_initialized(mock_requests_head):
+@patch("app.services.health.settings")
+def test_health_ready_timeout_e_redis_desabilitado(mock_settings):
     """
-    Testa o endpoint /health quando o cliente Redis não foi inicializado (startup fail).
+    Testa que uma verificação lenta é interrompida pelo timeout e que o Redis
+    desabilitado (REDIS_ENABLED=false) é apenas um aviso.
     """
-    mock_requests_head.return_value.raise_for_status.return_value = None
+    mock_settings.HEALTH_CHECK_TIMEOUT_SECONDS = 0.05
+    mock_settings.HEALTH_CACHE_SECONDS = 10
 
-    response = client.get("/health")
+    async def head_lento(url):
+        await asyncio.sleep(1)
+
+    cliente_lento = MagicMock()
+    cliente_lento.head = head_lento
+    with patch("app.services.health.downloader.obter_cliente_http", lambda: cliente_lento):
+        response = client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["anp_connection"] == "FAIL: timeout"
+    assert "WARNING" in response.json()["checks"]["redis_connection"]
+
+def test_health_legado_redis_indisponivel_e_aviso(mock_redis_client):
+    """
+    Testa que /health mantém o payload original e responde 200 com aviso quando só o Redis falha.
+    """
+    mock_redis_client.ping.side_effect = redis.exceptions.ConnectionError("Redis down")
+
+    with patch("app.services.health.downloader.obter_cliente_http", lambda: criar_cliente_anp(200)):
+        response = client.get("/health")
 
     assert response.status_code == 200
     assert response.json()["status"] == "UP"
+    assert set(response.json()["checks"]) == {"internet_connection", "redis_connection", "api_service"}
     assert response.json()["checks"]["internet_connection"] == "OK"
     assert "WARNING" in response.json()["checks"]["redis_connection"]
+
+def test_health_legado_fail_internet(mock_redis_client):
+    """
+    Testa que /health responde 503 quando a conectividade (ANP) falha.
+    """
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("ANP down")
+
+    with patch("app.services.health.downloader.obter_cliente_http", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))):
+        response = client.get("/health")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "DOWN"
+    assert "FAIL" in response.json()["checks"]["internet_connection"]
+    assert response.json()["checks"]["redis_connection"] == "OK"
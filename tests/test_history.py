@@ -0,0 +1,92 @@
+from datetime import date, datetime
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.extractor import ingerir_planilha
+from app.services.history import HistoricoPrecos, codificar_cursor, decodificar_cursor
+from tests.test_extractor import criar_planilha_estados
+
+client = TestClient(app)
+
+def linha(estado, produto, data_inicial, preco):
+    return {"estado": estado, "produto": produto, "data_inicial": data_inicial, "data_final": None, "preco_medio": preco}
+
+def test_historico_registra_uma_vez_e_consulta_intervalo(tmp_path):
+    """
+    Testa que cada planilha é registrada uma única vez e que a consulta por
+    intervalo filtra por data, estado e produto, em ordem cronológica.
+    """
+    historico = HistoricoPrecos(tmp_path / "historico.sqlite3")
+    semana_1 = [linha("DISTRITO FEDERAL", "GASOLINA COMUM", date(2025, 11, 30), 6.2), linha("BAHIA", "GASOLINA COMUM", date(2025, 11, 30), 6.0)]
+    semana_2 = [linha("DISTRITO FEDERAL", "GASOLINA COMUM", date(2025, 12, 7), 6.39)]
+
+    assert historico.registrar_semana(semana_1, "hash-1", "semana_1.xlsx") == 2
+    assert historico.registrar_semana(semana_1, "hash-1", "semana_1.xlsx") == 0
+    assert historico.registrar_semana(semana_2, "hash-2", "semana_2.xlsx") == 1
+
+    itens = historico.consultar(date(2025, 11, 1), date(2025, 12, 31), estado="DISTRITO FEDERAL", produto="GASOLINA COMUM")
+    assert [(i["dataInicial"], i["precoMedioRevenda"]) for i in itens] == [("2025-11-30T00:00:00", 6.2), ("2025-12-07T00:00:00", 6.39)]
+    assert len(historico.consultar(date(2025, 12, 1), date(2025, 12, 31))) == 1
+    # Keyset: a página seguinte começa logo após a chave do último item
+    primeira = historico.consultar(date(2025, 11, 1), date(2025, 12, 31), limite=1)
+    assert primeira[0]["estado"] == "BAHIA"
+    apos = decodificar_cursor(codificar_cursor(primeira[-1]))
+    assert apos == ("2025-11-30", "BAHIA", "GASOLINA COMUM")
+    assert [(i["estado"], i["dataInicial"]) for i in historico.consultar(date(2025, 11, 1), date(2025, 12, 31), apos=apos)] == [
+        ("DISTRITO FEDERAL", "2025-11-30T00:00:00"), ("DISTRITO FEDERAL", "2025-12-07T00:00:00"),
+    ]
+    # Um cursor anterior a `inicio` não amplia o intervalo
+    assert [i["dataInicial"] for i in historico.consultar(date(2025, 12, 1), date(2025, 12, 31), apos=apos)] == ["2025-12-07T00:00:00"]
+    assert decodificar_cursor("nao-e-um-cursor") is None
+    historico.fechar()
+
+def test_endpoint_historico_pagina_semanas_ingeridas(tmp_path):
+    """
+    Testa que a ingestão alimenta a série histórica e que /precos/historico pagina o resultado.
+    """
+    historico = HistoricoPrecos(tmp_path / "historico.sqlite3")
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [datetime(2025, 12, 7), datetime(2025, 12, 13), "BAHIA", "GASOLINA COMUM", 6.1],
+        [datetime(2025, 12, 7), datetime(2025, 12, 13), "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39],
+        [datetime(2025, 12, 7), datetime(2025, 12, 13), "DISTRITO FEDERAL", "ETANOL HIDRATADO", 4.5],
+    ])
+
+    with patch("app.services.extractor.historico", historico), patch("app.main.historico", historico):
+        assert ingerir_planilha(arquivo) is not None
+        pagina_1 = client.get("/precos/historico", params={"inicio": "2025-12-01", "fim": "2025-12-31", "tamanho_pagina": 2}).json()
+        pagina_2 = client.get("/precos/historico", params={"inicio": "2025-12-01", "fim": "2025-12-31", "tamanho_pagina": 2, "cursor": pagina_1["proximoCursor"]}).json()
+        cursor_invalido = client.get("/precos/historico", params={"inicio": "2025-12-01", "fim": "2025-12-31", "cursor": "x"})
+        filtrado = client.get("/precos/historico", params={"inicio": "2025-12-01", "fim": "2025-12-31", "estado": "distrito federal ", "produto": "gasolina comum"}).json()
+        invertido = client.get("/precos/historico", params={"inicio": "2025-12-31", "fim": "2025-12-01"})
+
+    assert len(pagina_1["itens"]) == 2 and pagina_1["proximoCursor"]
+    assert len(pagina_2["itens"]) == 1 and pagina_2["proximoCursor"] is None
+    assert {i["produto"] for i in pagina_1["itens"] + pagina_2["itens"]} == {"GASOLINA COMUM", "ETANOL HIDRATADO"}
+    assert len({(i["estado"], i["produto"]) for i in pagina_1["itens"] + pagina_2["itens"]}) == 3
+    assert cursor_invalido.status_code == 422
+    assert filtrado["itens"] == [{
+        "estado": "DISTRITO FEDERAL", "produto": "GASOLINA COMUM",
+        "dataInicial": "2025-12-07T00:00:00", "dataFinal": "2025-12-13T00:00:00", "precoMedioRevenda": 6.39,
+    }]
+    assert invertido.status_code == 422
+    historico.fechar()
+
+def test_historico_registrado_sem_copia_colunar(tmp_path):
+    """
+    Testa que a série histórica é alimentada mesmo com COLUMNAR_ENABLED desligado, com as
+    datas no mesmo formato de /precos.
+    """
+    historico = HistoricoPrecos(tmp_path / "historico.sqlite3")
+    arquivo = criar_planilha_estados(tmp_path / "estados.xlsx", [
+        [datetime(2025, 12, 7), datetime(2025, 12, 13), "DISTRITO FEDERAL", "GASOLINA COMUM", 6.39],
+    ])
+
+    with patch("app.services.extractor.historico", historico), \
+         patch("app.services.extractor.settings.COLUMNAR_ENABLED", False):
+        assert ingerir_planilha(arquivo) is None
+
+    itens = historico.consultar(date(2025, 12, 1), date(2025, 12, 31))
+    assert [(i["dataInicial"], i["dataFinal"]) for i in itens] == [
+        (datetime(2025, 12, 7).isoformat(), datetime(2025, 12, 13).isoformat()),
+    ]
+    historico.fechar()
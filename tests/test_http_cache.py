@@ -0,0 +1,66 @@
+import gzip
+import json
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from unittest.mock import MagicMock
+from app.services.http_cache import aceita_gzip, preparar_resposta, responder
+
+def criar_request(headers: dict) -> MagicMock:
+    """Requisição mínima com os cabeçalhos informados (nomes em minúsculas)."""
+    request = MagicMock()
+    request.headers = headers
+    return request
+
+def test_resposta_pre_serializada_e_gzip_opcional():
+    """
+    Testa que o corpo é serializado uma vez (datas em ISO 8601), que o gzip só é
+    guardado quando reduz o tamanho e que ele só é enviado a quem o aceita.
+    """
+    pequena = preparar_resposta({"dataInicial": datetime(2025, 12, 7), "precoMedioRevenda": 6.39}, "v1", 3600)
+    assert json.loads(pequena.corpo) == {"dataInicial": "2025-12-07T00:00:00", "precoMedioRevenda": 6.39}
+    assert pequena.etag == '"v1"'
+    assert pequena.corpo_gzip is None
+
+    grande = preparar_resposta({"itens": [{"estado": "DISTRITO FEDERAL", "preco": 6.39}] * 50}, None, 3600)
+    assert gzip.decompress(grande.corpo_gzip) == grande.corpo
+
+    comprimida = responder(criar_request({"accept-encoding": "gzip, br"}), grande)
+    assert comprimida.headers["content-encoding"] == "gzip"
+    assert comprimida.body == grande.corpo_gzip
+
+    sem_gzip = responder(criar_request({}), grande)
+    assert "content-encoding" not in sem_gzip.headers
+    assert sem_gzip.body == grande.corpo
+    assert 3590 <= int(sem_gzip.headers["cache-control"].split(",")[1].split("=")[1]) <= 3600
+
+def test_resposta_defasada_exige_revalidacao():
+    """
+    Testa que um dado defasado não é anunciado como atual: `no-cache` e `Expires` no
+    instante da resposta, mantendo a ETag para revalidação com 304.
+    """
+    resposta = preparar_resposta({"precoMedioRevenda": 6.39}, "v1", 3600)
+
+    defasada = responder(criar_request({}), resposta, defasado=True)
+    revalidada = responder(criar_request({"if-none-match": '"v1"'}), resposta, defasado=True)
+
+    assert defasada.headers["cache-control"].startswith("public, no-cache")
+    assert "max-age" not in defasada.headers["cache-control"]
+    assert abs(parsedate_to_datetime(defasada.headers["expires"]).timestamp() - time.time()) < 5
+    assert revalidada.status_code == 304
+
+def test_aceita_gzip_respeita_q_values():
+    """
+    Testa que `gzip;q=0` recusa a compressão e que o curinga só vale sem menção explícita a gzip.
+    """
+    assert aceita_gzip("gzip, deflate, br")
+    assert aceita_gzip("br;q=1.0, GZIP;q=0.5")
+    assert aceita_gzip("*")
+    assert not aceita_gzip("gzip;q=0, br")
+    assert not aceita_gzip("gzip; q=0.000")
+    assert not aceita_gzip("*, gzip;q=0")
+    assert not aceita_gzip("identity")
+    assert not aceita_gzip(None)
+
+    grande = preparar_resposta({"itens": [{"estado": "DISTRITO FEDERAL", "preco": 6.39}] * 50}, None, 3600)
+    assert "content-encoding" not in responder(criar_request({"accept-encoding": "gzip;q=0"}), grande).headers
@@ -0,0 +1,33 @@
+import os
+from benchmarks.bench_startup import medir_importacao, medir_primeiro_byte, porta_livre
+
+# Limite de regressão para `import app.main` (o melhor de algumas medições, em segundos).
+# Sem as dependências pesadas, o import leva cerca de 0,5 s; antes, mais de 1 s.
+ORCAMENTO_IMPORT_SEGUNDOS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "1.0"))
+# Limite para o primeiro byte de /health/live após iniciar o uvicorn (o melhor de duas medições).
+# Hoje leva cerca de 1,6 s; antes das otimizações de inicialização, cerca de 3 s.
+ORCAMENTO_PRIMEIRO_BYTE_SEGUNDOS = float(os.environ.get("TTFB_BUDGET_SECONDS", "2.5"))
+
+def test_importar_app_nao_carrega_dependencias_pesadas():
+    """
+    Testa que importar a aplicação não carrega pandas, NumPy, openpyxl, PyYAML nem o redis-py.
+    """
+    _, _, carregados = medir_importacao()
+
+    assert carregados == []
+
+def test_importar_app_dentro_do_orcamento():
+    """
+    Testa que o tempo de import de app.main (medido com -X importtime) está dentro do orçamento.
+    """
+    melhor = min(medir_importacao()[0] for _ in range(3))
+
+    assert 0 < melhor < ORCAMENTO_IMPORT_SEGUNDOS, f"import app.main levou {melhor:.2f}s (orçamento: {ORCAMENTO_IMPORT_SEGUNDOS}s)"
+
+def test_primeiro_byte_dentro_do_orcamento():
+    """
+    Testa que o primeiro byte de /health/live, contado a partir do início do uvicorn, está dentro do orçamento.
+    """
+    melhor = min(medir_primeiro_byte(porta_livre()) for _ in range(2))
+
+    assert 0 < melhor < ORCAMENTO_PRIMEIRO_BYTE_SEGUNDOS, f"primeiro byte de /health/live em {melhor:.2f}s (orçamento: {ORCAMENTO_PRIMEIRO_BYTE_SEGUNDOS}s)"
@@ -0,0 +1,77 @@
+import io
+import json
+import logging
+import sys
+import structlog.contextvars
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.logger import adicionar_callsite, configure_structlog, encerrar_logging, setup_logger
+
+client = TestClient(app)
+
+def test_callsite_apenas_em_avisos_e_erros():
+    """
+    Testa que arquivo, linha e função de origem só são adicionados a WARNING ou acima.
+    """
+    assert adicionar_callsite(None, "info", {"event": "x"}) == {"event": "x"}
+
+    evento = adicionar_callsite(None, "warning", {"event": "x"})
+    assert evento["filename"] == "test_logger.py"
+    assert evento["func_name"] == "test_callsite_apenas_em_avisos_e_erros"
+
+def test_logs_escritos_pela_thread_do_listener_em_json():
+    """
+    Testa o modo fila: os eventos são renderizados em JSON e escritos pelo listener,
+    que é esvaziado ao encerrar o logging.
+    """
+    saida = io.StringIO()
+    try:
+        with patch.object(sys, "stdout", saida):
+            configure_structlog()
+            setup_logger("teste.fila").warning("Evento de teste", preco=5.99)
+            encerrar_logging()
+    finally:
+        configure_structlog()
+
+    evento = json.loads(saida.getvalue().splitlines()[-1])
+    assert evento["event"] == "Evento de teste"
+    assert evento["preco"] == 5.99
+    assert evento["level"] == "warning"
+    assert evento["filename"] == "test_logger.py"
+
+def test_registro_da_biblioteca_padrao_mantem_trace_id_da_requisicao():
+    """
+    Testa que um registro do logging padrão (ex: uvicorn), renderizado na thread do
+    listener, mantém o trace_id e a origem da thread que o registrou.
+    """
+    saida = io.StringIO()
+    try:
+        with patch.object(sys, "stdout", saida):
+            configure_structlog()
+            with structlog.contextvars.bound_contextvars(trace_id="abc-123"):
+                logging.getLogger("teste.biblioteca").warning("Aviso de biblioteca: %s", "ANP")
+            encerrar_logging()
+    finally:
+        configure_structlog()
+
+    evento = json.loads(saida.getvalue().splitlines()[-1])
+    assert evento["event"] == "Aviso de biblioteca: ANP"
+    assert evento["trace_id"] == "abc-123"
+    assert evento["filename"] == "test_logger.py"
+    assert evento["func_name"] == "test_registro_da_biblioteca_padrao_mantem_trace_id_da_requisicao"
+
+def test_amostragem_dos_logs_de_requisicao(caplog):
+    """
+    Testa que, com LOG_REQUEST_SAMPLE_RATE=0, os eventos de início/fim da requisição não são registrados.
+    """
+    def eventos_de_requisicao():
+        return [r.msg["event"] for r in caplog.records if isinstance(r.msg, dict) and r.msg.get("event", "").endswith("requisição")]
+
+    with patch("app.services.logger.settings.LOG_REQUEST_SAMPLE_RATE", 0.0):
+        assert client.get("/health/live").status_code == 200
+    assert eventos_de_requisicao() == []
+
+    with patch("app.services.logger.settings.LOG_REQUEST_SAMPLE_RATE", 1.0):
+        client.get("/health/live")
+    assert eventos_de_requisicao() == ["Iniciando requisição", "Finalizando requisição"]
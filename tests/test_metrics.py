@@ -0,0 +1,40 @@
+import subprocess
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.metrics import REQUESTS_TOTAL, ROTA_DESCONHECIDA
+
+client = TestClient(app)
+
+def contagem(endpoint: str, status_code: int) -> float:
+    return REQUESTS_TOTAL.labels(method="GET", endpoint=endpoint, status_code=status_code)._value.get()
+
+def test_metricas_http_rotuladas_pelo_template_da_rota():
+    """
+    Testa que o rótulo `endpoint` é o template da rota, e que URLs desconhecidas
+    (ex: scanners) compartilham um único rótulo em vez de criar séries novas.
+    """
+    antes_rota, antes_desconhecida = contagem("/health/live", 200), contagem(ROTA_DESCONHECIDA, 404)
+
+    client.get("/health/live")
+    for caminho in ("/wp-admin/setup.php", "/.env", "/xyz/123"):
+        assert client.get(caminho).status_code == 404
+
+    assert contagem("/health/live", 200) - antes_rota == 1
+    assert contagem(ROTA_DESCONHECIDA, 404) - antes_desconhecida == 3
+    assert 'endpoint="/wp-admin/setup.php"' not in client.get("/metrics").text
+
+def test_metricas_agregadas_entre_processos(tmp_path):
+    """
+    Testa o modo multiprocesso: contadores de processos diferentes são somados no /metrics.
+    """
+    codigo = (
+        "from app.services.metrics import DOWNLOAD_BYTES_TOTAL, gerar_metricas; "
+        "DOWNLOAD_BYTES_TOTAL.inc(100); print(gerar_metricas().decode())"
+    )
+    ambiente = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PATH": ""}
+    for _ in range(2):
+        saida = subprocess.run([sys.executable, "-c", codigo], env=ambiente, cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True).stdout
+
+    assert "precos_download_bytes_total 200.0" in saida
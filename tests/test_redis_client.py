@@ -0,0 +1,65 @@
+import asyncio
+import redis
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.services.circuit_breaker import Disjuntor, FECHADO, ABERTO, MEIO_ABERTO
+from app.services.redis_client import ClienteRedis, INDISPONIVEL
+
+def test_disjuntor_abre_testa_e_fecha():
+    """
+    Testa que o disjuntor abre após o limite de falhas, libera uma única chamada de
+    teste após a recuperação, dobra o backoff se ela falhar e fecha quando ela funciona.
+    """
+    disjuntor = Disjuntor("teste", limite_falhas=2, recuperacao=10, recuperacao_maxima=15)
+
+    with patch("app.services.circuit_breaker.time.monotonic", return_value=100.0) as relogio:
+        disjuntor.registrar_falha()
+        assert disjuntor.estado == FECHADO
+        disjuntor.registrar_falha()
+        assert disjuntor.estado == ABERTO
+        assert disjuntor.permite() is False
+
+        # Passada a recuperação: uma chamada de teste, que falha e dobra o backoff (limitado a 15s)
+        relogio.return_value = 110.0
+        assert disjuntor.permite() is True
+        assert disjuntor.estado == MEIO_ABERTO
+        disjuntor.registrar_falha()
+        assert disjuntor.estado == ABERTO
+        relogio.return_value = 124.0
+        assert disjuntor.permite() is False
+
+        relogio.return_value = 125.0
+        assert disjuntor.permite() is True
+        disjuntor.registrar_sucesso()
+        assert disjuntor.estado == FECHADO
+        assert disjuntor.permite() is True
+
+def test_cliente_redis_indisponivel_nao_tenta_com_circuito_aberto():
+    """
+    Testa que o cliente não conecta no import, que falhas de conexão retornam o valor
+    padrão e que, com o circuito aberto, o Redis não é mais consultado.
+    """
+    cliente = ClienteRedis()
+    assert cliente._cliente is None
+
+    redis_falso = MagicMock()
+    redis_falso.get = AsyncMock(side_effect=redis.exceptions.ConnectionError("Redis down"))
+    with patch("app.services.redis_client.settings.REDIS_ENABLED", True), \
+         patch.object(cliente, "obter", return_value=redis_falso):
+        for _ in range(5):
+            assert asyncio.run(cliente.executar(lambda r: r.get("chave"), padrao=INDISPONIVEL)) is INDISPONIVEL
+
+        assert cliente.disjuntor.estado == ABERTO
+        assert cliente.disponivel() is None
+    # Só as chamadas até o limite de falhas chegaram ao Redis
+    assert redis_falso.get.await_count == 3
+
+@patch("app.services.redis_client.settings.REDIS_ENABLED", False)
+def test_cliente_redis_desabilitado():
+    """
+    Testa que, com o Redis desabilitado, as operações retornam o padrão sem criar cliente.
+    """
+    cliente = ClienteRedis()
+
+    assert asyncio.run(cliente.executar(lambda r: r.get("chave"), padrao="padrao")) == "padrao"
+    assert cliente.obter() is None
+    assert cliente._cliente is None
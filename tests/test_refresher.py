@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from app.services.refresher import AtualizadorPrecos, ERRO_EXTRACAO, validade_dados
+
+@patch("app.services.refresher.extrair_conjuntos", return_value={"padrao": {"precoMedioRevenda": 5.99}})
+@patch("app.services.refresher.extrair_indice")
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.settings")
+def test_agendador_publica_snapshot(mock_settings, mock_baixar, mock_extrair, mock_conjuntos):
+    """
+    Testa que o agendador iniciado em segundo plano publica um snapshot imutável.
+    """
+    mock_settings.REFRESH_ENABLED = True
+    mock_settings.REFRESH_INTERVAL_SECONDS = 3600
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): {"precoMedioRevenda": 5.99}}
+
+    async def cenario():
+        atualizador = AtualizadorPrecos()
+        atualizador.iniciar()
+        for _ in range(100):
+            if atualizador.snapshot is not None:
+                break
+            await asyncio.sleep(0.01)
+        await atualizador.parar()
+        return atualizador
+
+    atualizador = asyncio.run(cenario())
+
+    assert atualizador.snapshot is not None
+    assert atualizador.snapshot.resultado["precoMedioRevenda"] == 5.99
+    assert atualizador.idade_snapshot() < 5
+    try:
+        atualizador.snapshot.resultado["precoMedioRevenda"] = 0
+        assert False, "O snapshot publicado deveria ser somente leitura"
+    except TypeError:
+        pass
+
+@patch("app.services.refresher.extrair_conjuntos", return_value=None)
+@patch("app.services.refresher.extrair_indice", return_value=None)
+@patch("app.services.refresher.baixar_arquivo_async")
+@patch("app.services.refresher.settings")
+def test_agendador_desabilitado_e_falha_de_extracao(mock_settings, mock_baixar, mock_extrair, mock_conjuntos):
+    """
+    Testa que o agendador não inicia quando desabilitado e que uma falha de
+    extração é reportada sem publicar snapshot.
+    """
+    mock_settings.REFRESH_ENABLED = False
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+
+    async def cenario():
+        atualizador = AtualizadorPrecos()
+        atualizador.iniciar()
+        assert atualizador._tarefa is None
+        return atualizador, await atualizador.obter_snapshot()
+
+    atualizador, snapshot = asyncio.run(cenario())
+
+    assert snapshot is None
+    assert atualizador.ultimo_erro == ERRO_EXTRACAO
+
+@patch("app.services.refresher.ingerir_planilha")
+@patch("app.services.refresher.extrair_conjuntos", return_value={"padrao": {"precoMedioRevenda": 6.09}})
+@patch("app.services.refresher.extrair_indice")
+@patch("app.services.refresher.baixar_arquivo_async")
+def test_cold_start_serve_ultimo_dado_valido_em_disco(mock_baixar, mock_extrair, mock_conjuntos, mock_ingerir, tmp_path):
+    """
+    Testa que, com a ANP fora do ar, o cold start serve a planilha íntegra mais recente
+    em disco (defasada) e que a revalidação em segundo plano que falhou não é repetida
+    durante a janela do cache negativo.
+    """
+    conteudo = b"planilha_da_semana_anterior"
+    planilha = tmp_path / "resumo_semanal_lpc_2025-11-30_2025-12-06.xlsx"
+    planilha.write_bytes(conteudo)
+    (tmp_path / f"{planilha.name}.meta.json").write_text(json.dumps({
+        "url": f"http://fake.url/{planilha.name}", "sha256": hashlib.sha256(conteudo).hexdigest(), "tamanho": len(conteudo),
+    }))
+    mock_baixar.return_value = (None, None, None, None)
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): {"precoMedioRevenda": 6.09}}
+
+    async def cenario():
+        atualizador = AtualizadorPrecos()
+        primeiro = await atualizador.obter_snapshot()
+        await atualizador._revalidacao  # revalidação em segundo plano (falha: ANP fora do ar)
+        segundo = await atualizador.obter_snapshot()
+        return atualizador, primeiro, segundo
+
+    with patch("app.services.downloader.OUTPUT_DIR", tmp_path):
+        atualizador, primeiro, segundo = asyncio.run(cenario())
+
+    assert primeiro is segundo
+    assert primeiro.resultado["precoMedioRevenda"] == 6.09
+    assert primeiro.url == f"http://fake.url/{planilha.name}"
+    assert atualizador.defasado
+    assert atualizador.tentar_novamente_em() > 0
+    mock_baixar.assert_awaited_once()
+
+@patch("app.services.refresher.versao_regras")
+@patch("app.services.refresher.extrair_conjuntos")
+@patch("app.services.refresher.extrair_indice")
+@patch("app.services.refresher.baixar_arquivo_async")
+def test_regras_alteradas_remontam_snapshot_sem_acessar_anp(mock_baixar, mock_extrair, mock_conjuntos, mock_versao):
+    """
+    Testa que, quando `etl_rules.yaml` muda, o snapshot é remontado em segundo plano a
+    partir da planilha já baixada (com os novos conjuntos nomeados), sem acessar a ANP.
+    """
+    mock_baixar.return_value = ("http://fake.url/file.xlsx", None, None, "./dados_anp/file.xlsx")
+    mock_extrair.return_value = {("DISTRITO FEDERAL", "GASOLINA COMUM"): {"precoMedioRevenda": 5.99}}
+    mock_conjuntos.return_value = {"padrao": {"precoMedioRevenda": 5.99}}
+    mock_versao.return_value = "regras-1"
+
+    async def cenario():
+        atualizador = AtualizadorPrecos()
+        primeiro = await atualizador.atualizar()
+        mock_versao.return_value = "regras-2"
+        mock_conjuntos.return_value = {"padrao": {"precoMedioRevenda": 5.99}, "etanol_df": {"precoMedioRevenda": 4.29}, "vazio": None}
+        servido = await atualizador.obter_snapshot()  # o snapshot atual segue servido durante a remontagem
+        await atualizador._reaplicacao
+        assert await atualizador.obter_snapshot() is atualizador.snapshot
+        assert atualizador._reaplicacao.done()  # mesmas regras: nenhuma nova remontagem
+        return primeiro, servido, atualizador.snapshot
+
+    primeiro, servido, novo = asyncio.run(cenario())
+
+    assert servido is primeiro
+    assert primeiro.versao_regras == "regras-1" and not primeiro.conjuntos
+    assert novo.versao_regras == "regras-2"
+    assert json.loads(novo.conjuntos["etanol_df"].corpo)["precoMedioRevenda"] == 4.29
+    assert "vazio" not in novo.conjuntos
+    assert novo.atualizado_em == primeiro.atualizado_em
+    mock_baixar.assert_awaited_once()
+
+@patch("app.services.refresher.calcular_tempo_ate_proximo_domingo", return_value=5 * 24 * 3600)
+def test_validade_segue_a_semana_da_planilha(_):
+    """
+    Testa que a validade (Cache-Control/Expires) vai até a próxima publicação, mas nunca
+    além da semana seguinte à da planilha: uma planilha antiga já nasce expirada.
+    """
+    hoje = datetime.now()
+
+    assert validade_dados({"dataFinal": datetime(2024, 1, 13)}) == 0
+    # Semana encerrada ontem: a próxima planilha sai em até 7 dias; o agendamento (5 dias) vale
+    assert validade_dados({"dataFinal": hoje - timedelta(days=1)}) == 5 * 24 * 3600
+    # Semana encerrada há 6 dias: restam no máximo 2 dias
+    assert validade_dados({"dataFinal": hoje - timedelta(days=6)}) <= 2 * 24 * 3600
+    assert validade_dados({"dataFinal": "07/01/2025"}) == 5 * 24 * 3600
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
+from unittest.mock import patch
+from app.services.http_cache import preparar_resposta
+from app.services.refresher import AtualizadorPrecos, SnapshotPrecos
+from app.services.shared_snapshot import ArmazenamentoSnapshot
+
+CHAVE = ("DISTRITO FEDERAL", "GASOLINA COMUM")
+
+def criar_snapshot(preco: float, versao: str) -> SnapshotPrecos:
+    dados = {"dataInicial": datetime(2025, 12, 7), "dataFinal": datetime(2025, 12, 13), "precoMedioRevenda": preco}
+    return SnapshotPrecos(
+        url="http://fake.url/file.xlsx",
+        caminho_arquivo=Path("./dados_anp/file.xlsx"),
+        resultado=MappingProxyType(dados),
+        atualizado_em=time.time(),
+        indice=MappingProxyType({CHAVE: MappingProxyType(dados), ("BAHIA", "ETANOL HIDRATADO"): MappingProxyType({**dados, "precoMedioRevenda": 4.1})}),
+        resposta=preparar_resposta(dados, versao, 3600),
+        conjuntos=MappingProxyType({"etanol_ba": preparar_resposta({**dados, "precoMedioRevenda": 4.1}, f"{versao}-etanol_ba", 3600)}),
+        versao_regras="regras-1",
+    )
+
+def test_publicar_e_carregar_troca_versao_atomicamente(tmp_path):
+    """
+    Testa que um leitor mapeia exatamente a versão publicada (corpo, ETag e índice)
+    e só vê a próxima versão depois da troca do ponteiro.
+    """
+    escritor, leitor = ArmazenamentoSnapshot(tmp_path), ArmazenamentoSnapshot(tmp_path)
+    assert leitor.carregar() is None
+
+    v1 = criar_snapshot(5.99, "v1")
+    escritor.publicar(v1)
+    campos = leitor.carregar()
+
+    assert bytes(campos["resposta"].corpo) == v1.resposta.corpo
+    assert isinstance(campos["resposta"].corpo, memoryview)
+    assert campos["resposta"].etag == '"v1"'
+    assert campos["resultado"]["precoMedioRevenda"] == 5.99
+    assert campos["resultado"]["dataInicial"] == datetime(2025, 12, 7)
+    assert campos["indice"][("BAHIA", "ETANOL HIDRATADO")]["precoMedioRevenda"] == 4.1
+    assert campos["conjuntos"]["etanol_ba"].etag == '"v1-etanol_ba"'
+    assert bytes(campos["conjuntos"]["etanol_ba"].corpo) == v1.conjuntos["etanol_ba"].corpo
+    assert campos["versao_regras"] == "regras-1"
+    assert leitor.carregar() is None  # nada mudou
+
+    escritor.publicar(criar_snapshot(6.19, "v2"))
+    campos_v2 = leitor.carregar()
+
+    assert campos_v2["resposta"].etag == '"v2"'
+    assert campos_v2["resultado"]["precoMedioRevenda"] == 6.19
+    # O mapeamento da versão anterior continua legível após a remoção do arquivo
+    assert bytes(campos["resposta"].corpo) == v1.resposta.corpo
+    assert len(list(tmp_path.glob("snapshot-*.bin"))) == 1
+
+def test_lideranca_exclusiva_entre_workers(tmp_path):
+    """
+    Testa que apenas um worker assume a atualização e que outro assume após a liberação.
+    """
+    primeiro, segundo = ArmazenamentoSnapshot(tmp_path), ArmazenamentoSnapshot(tmp_path)
+
+    assert primeiro.assumir_lideranca()
+    assert not segundo.assumir_lideranca()
+
+    primeiro.liberar_lideranca()
+    assert segundo.assumir_lideranca()
+    segundo.liberar_lideranca()
+
+@patch("app.services.refresher.baixar_arquivo_async")
+def test_worker_seguidor_serve_snapshot_compartilhado(mock_baixar, tmp_path):
+    """
+    Testa que um worker sem a liderança serve o snapshot publicado sem baixar a planilha.
+    """
+    ArmazenamentoSnapshot(tmp_path).publicar(criar_snapshot(5.99, "v1"))
+    seguidor = AtualizadorPrecos(ArmazenamentoSnapshot(tmp_path))
+
+    snapshot = asyncio.run(seguidor.obter_snapshot())
+
+    assert snapshot.resultado["precoMedioRevenda"] == 5.99
+    assert snapshot.resposta.etag == '"v1"'
+    mock_baixar.assert_not_called()
+
+@patch("app.services.refresher.settings")
+@patch("app.services.refresher.ultima_planilha_valida", return_value=None)
+@patch("app.services.refresher.baixar_arquivo_async")
+def test_seguidor_sem_snapshot_aguarda_o_lider(mock_baixar, _, mock_settings, tmp_path):
+    """
+    Testa que, no cold start, um worker seguidor não baixa nem publica a planilha: ele
+    aguarda a versão publicada pelo líder.
+    """
+    mock_settings.SNAPSHOT_POLL_SECONDS = 0.01
+    mock_settings.SNAPSHOT_WAIT_SECONDS = 5
+    mock_settings.NEGATIVE_CACHE_SECONDS = 0
+    armazenamento_lider, armazenamento_seguidor = ArmazenamentoSnapshot(tmp_path), ArmazenamentoSnapshot(tmp_path)
+    lider, seguidor = AtualizadorPrecos(armazenamento_lider), AtualizadorPrecos(armazenamento_seguidor)
+    assert armazenamento_lider.assumir_lideranca()
+
+    async def cenario():
+        espera = asyncio.create_task(seguidor.obter_snapshot())
+        await asyncio.sleep(0.05)
+        assert not espera.done()
+        await lider._publicar(criar_snapshot(5.99, "v1"))
+        return await asyncio.wait_for(espera, 5)
+
+    try:
+        snapshot = asyncio.run(cenario())
+    finally:
+        armazenamento_lider.liberar_lideranca()
+
+    assert snapshot.resposta.etag == '"v1"'
+    assert not seguidor.defasado
+    assert not armazenamento_seguidor.lider
+    mock_baixar.assert_not_called()
+    # Um snapshot montado por um seguidor nunca é publicado
+    asyncio.run(seguidor._publicar(criar_snapshot(6.19, "v2")))
+    assert armazenamento_seguidor.carregar(forcar=True)["resposta"].etag == '"v1"'
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+from prometheus_client import REGISTRY
+from app.core.config import settings
+from app.services.redis_client import cliente_redis
+from app.services.tiered_cache import CacheDoisNiveis
+
+def criar_redis_falso(valores: dict) -> MagicMock:
+    """Cliente Redis assíncrono falso sobre um dicionário."""
+    redis_falso = MagicMock()
+    redis_falso.get = AsyncMock(side_effect=valores.get)
+    redis_falso.setex = AsyncMock(side_effect=lambda chave, ttl, valor: valores.__setitem__(chave, valor) or True)
+    redis_falso.publish = AsyncMock()
+    return redis_falso
+
+def contagem(cache: str, camada: str, resultado: str) -> float:
+    return REGISTRY.get_sample_value(
+        "precos_cache_tier_requests_total", {"cache": cache, "camada": camada, "resultado": resultado}
+    ) or 0.0
+
+@patch.object(cliente_redis, "obter")
+def test_l1_atende_sem_ida_ao_redis_com_ttl_por_chave(mock_obter):
+    """
+    Testa que o L1 atende as consultas repetidas (inclusive ausências) e respeita o TTL
+    informado para a chave, voltando ao Redis depois dele.
+    """
+    redis_falso = mock_obter.return_value = criar_redis_falso({"planilha": "/dados/planilha.xlsx"})
+    cache = CacheDoisNiveis("teste_ttl")
+
+    async def cenario(instante):
+        with patch("app.services.tiered_cache.time.monotonic", return_value=instante):
+            return await cache.obter("planilha", ttl=3600), await cache.obter("ausente")
+
+    assert asyncio.run(cenario(0.0)) == ("/dados/planilha.xlsx", None)
+    assert asyncio.run(cenario(1.0)) == ("/dados/planilha.xlsx", None)
+    assert redis_falso.get.await_count == 2  # uma vez cada chave
+
+    # Ausência vence em CACHE_NEGATIVE_TTL_SECONDS; o valor, no TTL da chave (ex: domingo à meia-noite)
+    asyncio.run(cenario(60.0))
+    assert [c.args[0] for c in redis_falso.get.await_args_list[2:]] == ["ausente"]
+    asyncio.run(cenario(3601.0))
+    assert redis_falso.get.await_args_list[-2].args[0] == "planilha"
+
+    assert contagem("teste_ttl", "l1", "hit") == 2
+    assert contagem("teste_ttl", "l1", "negativo") == 1
+    assert contagem("teste_ttl", "l2", "miss") == 3
+
+@patch.object(cliente_redis, "obter")
+def test_gravacao_invalida_l1_das_outras_replicas(mock_obter):
+    """
+    Testa que uma gravação publica a invalidação e que as outras réplicas (e não a
+    que publicou) descartam a cópia local, lendo o valor novo do Redis.
+    """
+    valores = {"anp:url_recente": "semana_1.xlsx"}
+    redis_falso = mock_obter.return_value = criar_redis_falso(valores)
+    replica_a, replica_b = CacheDoisNiveis("teste_pubsub"), CacheDoisNiveis("teste_pubsub")
+
+    async def cenario():
+        assert await replica_b.obter("anp:url_recente") == "semana_1.xlsx"
+        assert await replica_a.definir("anp:url_recente", "semana_2.xlsx", 300)
+        mensagem = redis_falso.publish.await_args.args[1]
+        replica_a.aplicar_invalidacao(mensagem)
+        replica_b.aplicar_invalidacao(mensagem)
+        return await replica_a.obter("anp:url_recente"), await replica_b.obter("anp:url_recente")
+
+    assert asyncio.run(cenario()) == ("semana_2.xlsx", "semana_2.xlsx")
+    assert json.loads(redis_falso.publish.await_args.args[1])["chave"] == "anp:url_recente"
+    assert len(replica_a) == len(replica_b) == 1
+    # A réplica A manteve a própria cópia; a B precisou voltar ao Redis
+    assert redis_falso.get.await_count == 2
+
+@patch.object(cliente_redis, "obter", return_value=None)
+def test_l1_limitado_sem_redis(_):
+    """
+    Testa que, sem Redis, o L1 atende sozinho e descarta as entradas menos usadas acima da capacidade.
+    """
+    cache = CacheDoisNiveis("teste_lru")
+
+    async def cenario():
+        for chave in ("a", "b", "c"):
+            await cache.definir(chave, chave.upper(), 60)
+        await cache.obter("a")  # "a" passa a ser a mais recente
+        await cache.definir("d", "D", 60)
+        return [await cache.obter(chave, padrao="indisponivel") for chave in "abcd"]
+
+    with patch.object(settings, "CACHE_L1_MAX_ENTRIES", 3):
+        assert asyncio.run(cenario()) == ["A", "indisponivel", "C", "D"]
+
+@patch.object(settings, "REDIS_BREAKER_RESET_SECONDS", 0)
+@patch.object(settings, "REDIS_ENABLED", True)
+@patch.object(cliente_redis, "obter")
+def test_escuta_aplica_invalidacao_de_outra_replica_e_resiste_a_erros(mock_obter):
+    """
+    Testa a escuta do canal: a invalidação publicada por outra réplica descarta a cópia
+    local, e um erro inesperado (ou uma mensagem malformada) não encerra a escuta: a
+    assinatura é refeita e as invalidações seguintes continuam sendo aplicadas.
+    """
+    valores = {"anp:url_recente": "semana_1.xlsx"}
+    redis_falso = mock_obter.return_value = criar_redis_falso(valores)
+    mensagens: asyncio.Queue = asyncio.Queue()
+
+    async def proxima_mensagem(**_):
+        item = await mensagens.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    pubsub = redis_falso.pubsub.return_value
+    pubsub.subscribe = AsyncMock()
+    pubsub.aclose = AsyncMock()
+    pubsub.get_message = AsyncMock(side_effect=proxima_mensagem)
+    replica_a, replica_b = CacheDoisNiveis("teste_escuta"), CacheDoisNiveis("teste_escuta")
+
+    async def aguardar(condicao):
+        for _ in range(200):
+            if condicao():
+                return
+            await asyncio.sleep(0.005)
+        raise AssertionError("condição não atingida")
+
+    async def cenario():
+        replica_b.iniciar()
+        await aguardar(lambda: pubsub.subscribe.await_count == 1)
+        assert await replica_b.obter("anp:url_recente") == "semana_1.xlsx"
+
+        # Gravação na réplica A: a mensagem chega à B pela escuta
+        await replica_a.definir("anp:url_recente", "semana_2.xlsx", 300)
+        await mensagens.put({"type": "message", "data": redis_falso.publish.await_args.args[1]})
+        await aguardar(lambda: len(replica_b) == 0)
+        assert await replica_b.obter("anp:url_recente") == "semana_2.xlsx"
+
+        # Mensagem malformada é ignorada; erro inesperado faz a escuta reassinar o canal
+        await mensagens.put({"type": "message", "data": "[1, 2]"})
+        await mensagens.put(RuntimeError("falha inesperada"))
+        await aguardar(lambda: pubsub.subscribe.await_count == 2)
+        assert not replica_b._tarefa.done()
+
+        await replica_a.definir("anp:url_recente", "semana_3.xlsx", 300)
+        assert await replica_b.obter("anp:url_recente") == "semana_3.xlsx"  # L1 descartado na reassinatura
+        await replica_a.definir("anp:url_recente", "semana_4.xlsx", 300)
+        await mensagens.put({"type": "message", "data": redis_falso.publish.await_args.args[1]})
+        await aguardar(lambda: len(replica_b) == 0)
+        await replica_b.parar()
+
+    asyncio.run(cenario())
+
+    assert pubsub.aclose.await_count >= 2
+    assert replica_b._tarefa is None
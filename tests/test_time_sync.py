@@ -1,40 +1,125 @@
-from unittest.mock import patch, MagicMock
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
 from datetime import datetime
-from app.services.time_sync import get_current_time
+from app.services.time_sync import RelogioSincronizado, get_current_time, CLOCK_SYNC_FAILURES_TOTAL
 import ntplib
 
 @patch("app.services.time_sync.ntplib.NTPClient")
-def test_get_current_time_ntp_success(mock_ntp_client):
+def test_relogio_aplica_offset_ntp(mock_ntp_client):
     """
-    Testa se a função retorna o horário do NTP corretamente.
+    Testa se a sincronização guarda o offset do NTP e se a leitura o aplica sem nova consulta.
     """
-    # Configura o Mock do cliente e resposta NTP
-    mock_client_instance = mock_ntp_client.return_value
-    mock_response = MagicMock()
-    # Timestamp arbitrário (ex: 2025-12-09 12:00:00 UTC)
-    mock_response.tx_time = 1765281600
-    mock_client_instance.request.return_value = mock_response
+    # Relógio local 1 hora atrasado em relação ao servidor
+    mock_ntp_client.return_value.request.return_value.offset = 3600.0
+    relogio = RelogioSincronizado()
 
-    current_time = get_current_time()
+    assert relogio.sincronizar("ntp.teste") is True
+    mock_ntp_client.return_value.request.assert_called_once()
 
-    # Verifica se retornou um objeto datetime
-    assert isinstance(current_time, datetime)
-    # Verifica se a data corresponde (aproximadamente, considerando fuso local)
-    # Como o timestamp é fixo, podemos verificar.
-    # Mas como a função converte para local, pode variar dependendo da máquina rodando o teste.
-    # O importante é que não falhou e veio do timestamp.
+    atraso = (relogio.agora() - datetime.now()).total_seconds()
+    assert abs(atraso - 3600) < 1
+    assert relogio.idade_sincronizacao() < 1
+    # A leitura não consulta o servidor novamente
+    mock_ntp_client.return_value.request.assert_called_once()
 
 @patch("app.services.time_sync.ntplib.NTPClient")
-def test_get_current_time_fallback(mock_ntp_client):
+def test_relogio_falha_mantem_relogio_local(mock_ntp_client):
     """
-    Testa o fallback para datetime.now() em caso de erro no NTP.
+    Testa o fallback para o relógio local (offset zero) em caso de erro no NTP.
     """
-    mock_client_instance = mock_ntp_client.return_value
-    mock_client_instance.request.side_effect = ntplib.NTPException("Erro de conexão")
+    mock_ntp_client.return_value.request.side_effect = ntplib.NTPException("Erro de conexão")
+    relogio = RelogioSincronizado()
+    falhas_antes = CLOCK_SYNC_FAILURES_TOTAL._value.get()
+
+    assert relogio.sincronizar("ntp.teste") is False
+    assert CLOCK_SYNC_FAILURES_TOTAL._value.get() - falhas_antes == 1
+    assert relogio.idade_sincronizacao() == float("inf")
+    # Deve retornar um datetime válido (local) mesmo com erro
+    assert abs((datetime.now() - relogio.agora()).total_seconds()) < 1
 
+@patch("app.services.time_sync.ntplib.NTPClient")
+def test_get_current_time_nao_faz_io(mock_ntp_client):
+    """
+    Testa que a API naive-local continua disponível e não consulta o NTP.
+    """
     current_time = get_current_time()
 
-    # Deve retornar um datetime válido (local) mesmo com erro
     assert isinstance(current_time, datetime)
-    # Deve estar próximo do agora (delta pequeno)
-    assert (datetime.now() - current_time).total_seconds() < 1
+    assert current_time.tzinfo is None
+    mock_ntp_client.assert_not_called()
+
+def test_get_current_time_server_obsoleto():
+    """
+    Testa que o parâmetro `server` continua aceito (obsoleto, sem consultar o NTP).
+    """
+    with patch("app.services.time_sync.ntplib.NTPClient") as mock_ntp_client, pytest.warns(DeprecationWarning):
+        current_time = get_current_time("pool.ntp.org")
+
+    assert isinstance(current_time, datetime)
+    mock_ntp_client.assert_not_called()
+
+def test_relogio_sem_sincronizacao_usa_relogio_local():
+    """
+    Testa que, antes da primeira sincronização, a leitura é o `time.time()` atual
+    (e não uma extrapolação do instante de criação do relógio).
+    """
+    relogio = RelogioSincronizado()
+
+    with patch("app.services.time_sync.time.time", return_value=2_000_000_000.0):
+        assert relogio.agora_epoch() == 2_000_000_000.0
+
+@patch("app.services.time_sync.medir_offset_ntp", side_effect=[OSError("sem rede"), 2.0])
+@patch("app.services.time_sync.settings")
+def test_sincronizacao_periodica_tenta_novamente_apos_falha(mock_settings, mock_medir):
+    """
+    Testa o loop em segundo plano: após uma falha, nova tentativa em até 60s; após o
+    sucesso, o offset é aplicado e a próxima sincronização segue o intervalo configurado.
+    """
+    mock_settings.CLOCK_SYNC_ENABLED = True
+    mock_settings.NTP_SERVER = "ntp.teste"
+    mock_settings.NTP_TIMEOUT_SECONDS = 1.0
+    mock_settings.NTP_SYNC_INTERVAL_SECONDS = 3600
+    esperas = []
+    dormir = asyncio.sleep
+
+    async def sleep_falso(segundos):
+        esperas.append(segundos)
+        await dormir(0)
+
+    async def cenario():
+        relogio = RelogioSincronizado()
+        with patch("app.services.time_sync.asyncio.sleep", sleep_falso):
+            relogio.iniciar()
+            tarefa = relogio._tarefa
+            relogio.iniciar()  # já em execução: não cria outra tarefa
+            assert relogio._tarefa is tarefa
+            for _ in range(100):
+                if len(esperas) >= 2:
+                    break
+                await dormir(0.01)
+            await relogio.parar()
+        return relogio
+
+    relogio = asyncio.run(cenario())
+
+    assert esperas[:2] == [60, 3600]
+    assert relogio.offset == 2.0
+    assert relogio.idade_sincronizacao() < 5
+    assert abs(relogio.agora_epoch() - time.time() - 2.0) < 1
+    assert relogio._tarefa is None
+
+@patch("app.services.time_sync.settings")
+def test_sincronizacao_desabilitada(mock_settings):
+    """
+    Testa que, com `CLOCK_SYNC_ENABLED` desligado, nenhuma tarefa é criada e `parar` é inócuo.
+    """
+    mock_settings.CLOCK_SYNC_ENABLED = False
+    relogio = RelogioSincronizado()
+
+    relogio.iniciar()
+    asyncio.run(relogio.parar())
+
+    assert relogio._tarefa is None
+    assert relogio.idade_sincronizacao() == float("inf")